@@ -1,6 +1,9 @@
 """
 Customer Support Insight - Main Streamlit App
 """
+import sys
+sys.path.append('src')
+
 import streamlit as st
 
 st.set_page_config(
@@ -34,22 +37,17 @@ Click the "Load Sample Dataset" button in the Upload page to try it out!
 """)
 
 # Quick stats (if data exists)
-try:
-    import sys
-    sys.path.append('src')
-    from database.connection import get_db_manager
-    from sqlalchemy import text
-    
-    db = get_db_manager()
+@st.cache_data(ttl=60, show_spinner=False)
+def load_quick_stats():
+    """Ticket/upload counts, cached so reruns don't hit the database"""
+    # Imported here so the home page renders before SQLAlchemy is loaded
+    from utils.resources import get_cached_db_manager
+    from etl.loader import get_quick_stats
     
-    with db.get_connection() as conn:
-        # Get ticket count
-        result = conn.execute(text("SELECT COUNT(*) FROM tickets"))
-        ticket_count = result.fetchone()[0]
-        
-        # Get upload count
-        result = conn.execute(text("SELECT COUNT(*) FROM uploads"))
-        upload_count = result.fetchone()[0]
+    return get_quick_stats(get_cached_db_manager())
+
+try:
+    ticket_count, upload_count = load_quick_stats()
     
     if ticket_count > 0:
         st.divider()
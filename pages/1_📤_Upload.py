@@ -2,19 +2,29 @@
 Upload page for InsightHub
 """
 import streamlit as st
-import pandas as pd
+import time
 import sys
 sys.path.append('src')
 
-from database.connection import get_db_manager
-from utils.validators import validate_ticket_data
-from etl.transform import transform_tickets, prepare_for_database
-from etl.loader import (
-    create_upload_record, 
-    load_tickets_to_db, 
-    mark_upload_processed,
-    get_all_uploads
+from utils.resources import get_cached_db_manager
+from utils.validators import (
+    validate_sample,
+    validate_staged_upload,
+    start_full_validation,
+    get_cached_validation
 )
+from etl.jobs import enqueue_upload, get_upload_status, get_memory_report
+from etl.staging import (
+    stage_upload,
+    stage_file,
+    read_preview
+)
+from etl.profiler import get_upload_profile, profile_summary
+from etl.loader import get_all_uploads
+from utils.lazy import lazy_import
+
+# Loaded on first use to keep it off the page startup path
+pd = lazy_import('pandas')
 
 st.set_page_config(
     page_title="Upload Data",
@@ -26,10 +36,27 @@ st.title("📤 Upload Ticket Data")
 st.markdown("Upload your customer support tickets in CSV or Excel format")
 
 # Initialize session state
-if 'uploaded_data' not in st.session_state:
-    st.session_state.uploaded_data = None
+# Only a small handle to the staged file lives in the session; the data
+# itself is spilled to disk and shared between sessions
+if 'staged_upload' not in st.session_state:
+    st.session_state.staged_upload = None
 if 'upload_id' not in st.session_state:
     st.session_state.upload_id = None
+if 'validating' not in st.session_state:
+    st.session_state.validating = None
+if 'sample_validation' not in st.session_state:
+    st.session_state.sample_validation = {}
+
+# Set when a background task is still running and the page should rerun
+poll_status = False
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def load_profile(handle):
+    return get_upload_profile(handle)
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def load_preview(handle):
+    return read_preview(handle, 10)
 
 # Sidebar info
 with st.sidebar:
@@ -54,9 +81,9 @@ with st.sidebar:
     st.header("📊 Sample Data")
     if st.button("Load Sample Dataset"):
         try:
-            sample_df = pd.read_csv('data/samples/tickets_sample.csv')
-            st.session_state.uploaded_data = sample_df
-            st.success(f"✅ Loaded {len(sample_df)} sample tickets!")
+            handle = stage_file('data/samples/tickets_sample.csv')
+            st.session_state.staged_upload = handle
+            st.success(f"✅ Loaded {handle['row_count']} sample tickets!")
             st.rerun()
         except Exception as e:
             st.error(f"Error loading sample: {e}")
@@ -72,64 +99,105 @@ uploaded_file = st.file_uploader(
 
 if uploaded_file is not None:
     try:
-        # Read file
-        if uploaded_file.name.endswith('.csv'):
-            df = pd.read_csv(uploaded_file)
-        else:
-            df = pd.read_excel(uploaded_file)
+        handle = st.session_state.staged_upload
+        
+        # The uploader hands back the same file on every rerun; only stage it once
+        if (handle is None
+                or handle['filename'] != uploaded_file.name
+                or handle.get('source_size') != uploaded_file.size):
+            with st.spinner("Staging file..."):
+                handle = stage_upload(uploaded_file.getvalue(), uploaded_file.name)
+                handle['source_size'] = uploaded_file.size
+            st.session_state.staged_upload = handle
         
-        st.session_state.uploaded_data = df
-        st.success(f"✅ File loaded: **{uploaded_file.name}** ({len(df)} rows)")
+        st.success(f"✅ File loaded: **{handle['filename']}** ({handle['row_count']} rows)")
         
     except Exception as e:
         st.error(f"❌ Error reading file: {e}")
 
 # If data is loaded, show validation and preview
-if st.session_state.uploaded_data is not None:
-    df = st.session_state.uploaded_data
+if st.session_state.staged_upload is not None:
+    handle = st.session_state.staged_upload
+    
+    # One profiling pass per file, shared by every session and rerun
+    with st.spinner("Profiling data..."):
+        profile = load_profile(handle)
     
     st.divider()
     st.subheader("2️⃣ Validate Data")
     
     # Validate button
     if st.button("🔍 Validate Data", type="primary"):
-        with st.spinner("Validating..."):
-            is_valid, report = validate_ticket_data(df)
+        st.session_state.validating = handle['key']
+    
+    if st.session_state.validating == handle['key']:
+        full_result = get_cached_validation(handle)
+        
+        if full_result is None:
+            # Instant verdict from a sample while the full check runs in the background
+            sample_result = st.session_state.sample_validation.get(handle['key'])
+            if sample_result is None:
+                sample_result = validate_sample(handle)
+                st.session_state.sample_validation = {handle['key']: sample_result}
+            run = start_full_validation(handle)
+            
+            if sample_result['is_valid']:
+                st.success(f"✅ Sample of {sample_result['sample_size']:,} rows looks valid")
+            else:
+                st.error("❌ Sample shows validation errors")
+            
+            estimates = pd.DataFrame([
+                {
+                    'Check': key,
+                    'Severity': est['severity'],
+                    'Sample Rate %': round(est['rate'] * 100, 2),
+                    '95% Range %': f"{est['rate_low'] * 100:.2f} - {est['rate_high'] * 100:.2f}",
+                    'Estimated Rows': est['estimated_rows']
+                }
+                for key, est in sample_result['estimates'].items()
+            ])
+            st.dataframe(estimates, use_container_width=True, hide_index=True)
             
-            if is_valid:
+            if run['status'] == 'failed':
+                st.error(f"❌ Full validation failed: {run['error']}")
+            else:
+                st.progress(
+                    min(run['rows_done'] / max(run['row_count'], 1), 1.0),
+                    text=f"Full validation: {run['rows_done']:,} / {run['row_count']:,} rows"
+                )
+                issues = {k: v for k, v in run['counts'].items() if k != 'rows' and v}
+                if issues:
+                    st.caption("Issues found so far: " + ", ".join(f"{k}: {v:,}" for k, v in issues.items()))
+                poll_status = True
+        else:
+            if full_result['is_valid']:
                 st.success("✅ Validation passed!")
             else:
                 st.error("❌ Validation failed - please fix errors before uploading")
             
             # Show report
-            st.text(report)
+            st.text(full_result['report'])
     
     st.divider()
     st.subheader("3️⃣ Preview Data")
     
     col1, col2, col3 = st.columns(3)
     with col1:
-        st.metric("Total Rows", len(df))
+        st.metric("Total Rows", handle['row_count'])
     with col2:
-        st.metric("Total Columns", len(df.columns))
+        st.metric("Total Columns", len(handle['columns']))
     with col3:
-        if 'created_at' in df.columns:
-            date_range = pd.to_datetime(df['created_at'])
-            days = (date_range.max() - date_range.min()).days
+        created_at = next((c for c in profile['columns'] if c['column'] == 'created_at'), None)
+        if created_at and created_at['min'] and created_at['max']:
+            days = (pd.Timestamp(created_at['max']) - pd.Timestamp(created_at['min'])).days
             st.metric("Date Range", f"{days} days")
     
     # Show data preview
-    st.dataframe(df.head(10), use_container_width=True)
+    st.dataframe(load_preview(handle), use_container_width=True)
     
     # Column info
     with st.expander("📋 Column Information"):
-        col_info = pd.DataFrame({
-            'Column': df.columns,
-            'Type': df.dtypes.values,
-            'Missing': df.isna().sum().values,
-            'Missing %': (df.isna().sum() / len(df) * 100).round(2).values
-        })
-        st.dataframe(col_info, use_container_width=True)
+        st.dataframe(profile_summary(profile), use_container_width=True, hide_index=True)
     
     st.divider()
     st.subheader("4️⃣ Upload to Database")
@@ -140,63 +208,78 @@ if st.session_state.uploaded_data is not None:
     )
     
     if st.button("🚀 Upload to Database", type="primary"):
-        # Validate first
-        is_valid, report = validate_ticket_data(df)
+        # Validate first (reuses the result if this file was already validated)
+        with st.spinner("Validating..."):
+            validation = validate_staged_upload(handle)
         
-        if not is_valid:
+        if not validation['is_valid']:
             st.error("❌ Please fix validation errors before uploading")
-            st.text(report)
+            st.text(validation['report'])
         else:
             try:
-                with st.spinner("Uploading to database..."):
-                    # Get database connection
-                    db = get_db_manager()
-                    
-                    # Create upload record
-                    filename = uploaded_file.name if uploaded_file else "sample_data.csv"
-                    upload_id = create_upload_record(
-                        db, 
-                        filename, 
-                        len(df), 
-                        user_notes
-                    )
-                    
-                    # Transform data
-                    transformed_df = transform_tickets(df)
-                    
-                    # Prepare for database
-                    db_df = prepare_for_database(transformed_df, upload_id)
-                    
-                    # Load to database
-                    load_tickets_to_db(db, db_df, upload_id)
-                    
-                    # Mark as processed
-                    mark_upload_processed(db, upload_id)
-                    
-                    st.session_state.upload_id = upload_id
-                    
-                st.success(f"✅ Successfully uploaded {len(df)} tickets!")
-                st.info(f"Upload ID: {upload_id}")
-                
-                # Show next steps
-                st.markdown("""
-                ### ✨ Next Steps:
-                1. Go to **🎯 Themes** page to discover themes
-                2. View **⚡ Severity & Priority** for analysis
-                3. Export results from **💾 Export** page
-                """)
-                
+                # Processing happens in a background worker; just queue it
+                # (DuckDB has no workers: the upload is processed right here)
+                db = get_cached_db_manager()
+                inline = db.dialect == 'duckdb'
+                with st.spinner("Processing..." if inline else "Queuing..."):
+                    upload_id, job_id = enqueue_upload(db, handle, user_notes, profile=profile)
+                st.session_state.upload_id = upload_id
+                if not inline:
+                    st.success(f"✅ Upload queued (Upload ID: {upload_id})")
             except Exception as e:
                 st.error(f"❌ Upload failed: {e}")
                 import traceback
                 st.code(traceback.format_exc())
 
+# Status of the most recent upload from this session
+if st.session_state.upload_id is not None:
+    st.divider()
+    st.subheader("⏳ Processing Status")
+    
+    try:
+        db = get_cached_db_manager()
+        status = get_upload_status(db, st.session_state.upload_id)
+        
+        if status is None:
+            st.warning("Upload record not found")
+        elif status['status'] == 'completed':
+            st.success(f"✅ Successfully uploaded {status['row_count']} tickets!")
+            st.info(f"Upload ID: {st.session_state.upload_id}")
+            
+            memory = get_memory_report(db, st.session_state.upload_id)
+            if memory:
+                with st.expander("🧠 Memory by column"):
+                    memory_mb = pd.DataFrame(memory).set_index('column').astype(float) / 1024 ** 2
+                    st.dataframe(memory_mb.round(2), use_container_width=True)
+                    st.caption("MB per column as read from the file, after cleaning, and as loaded")
+            
+            # Show next steps
+            st.markdown("""
+            ### ✨ Next Steps:
+            1. Go to **🎯 Themes** page to discover themes
+            2. View **⚡ Severity & Priority** for analysis
+            3. Export results from **💾 Export** page
+            """)
+        elif status['status'] == 'failed':
+            st.error(f"❌ Upload failed: {status['error_message']}")
+        else:
+            st.progress(
+                min(float(status['progress']), 1.0),
+                text=f"Upload {st.session_state.upload_id}: {status['status']}"
+            )
+            st.caption("Processing runs in the background - you can keep working or close this tab.")
+            
+            st.button("🔄 Refresh status")
+            poll_status = st.checkbox("Auto-refresh", value=True)
+    except Exception as e:
+        st.error(f"Error loading upload status: {e}")
+
 # Show upload history
 st.divider()
 st.subheader("📚 Upload History")
 
 try:
-    db = get_db_manager()
+    db = get_cached_db_manager()
     uploads = get_all_uploads(db)
     
     if uploads:
@@ -211,11 +294,17 @@ try:
                 "filename": "Filename",
                 "row_count": st.column_config.NumberColumn("Rows", format="%d"),
                 "uploaded_at": st.column_config.DatetimeColumn("Uploaded At"),
-                "processed": st.column_config.CheckboxColumn("Processed")
+                "processed": st.column_config.CheckboxColumn("Processed"),
+                "status": "Status"
             }
         )
     else:
         st.info("No uploads yet. Upload your first dataset above!")
         
 except Exception as e:
-    st.error(f"Error loading upload history: {e}")
\ No newline at end of file
+    st.error(f"Error loading upload history: {e}")
+
+# Keep polling while this session's upload is still being processed
+if poll_status:
+    time.sleep(2)
+    st.rerun()
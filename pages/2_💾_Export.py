@@ -0,0 +1,98 @@
+"""
+Export page for InsightHub
+"""
+import streamlit as st
+import os
+import sys
+sys.path.append('src')
+
+from utils.config import EXPORT_DOWNLOAD_MAX_MB
+from utils.resources import get_cached_db_manager
+from etl.loader import get_all_uploads
+from etl.export import EXPORT_FORMATS, export_to_directory
+
+st.set_page_config(
+    page_title="Export Results",
+    page_icon="💾",
+    layout="wide"
+)
+
+st.title("💾 Export Results")
+st.markdown("Download enriched tickets with theme, severity and priority")
+
+if 'export_file' not in st.session_state:
+    st.session_state.export_file = None
+
+try:
+    db = get_cached_db_manager()
+    uploads = get_all_uploads(db)
+except Exception as e:
+    st.error(f"Error connecting to database: {e}")
+    st.stop()
+
+st.subheader("1️⃣ Filters")
+
+col1, col2 = st.columns(2)
+with col1:
+    upload_options = {"All uploads": None}
+    upload_options.update({
+        f"#{u['upload_id']} - {u['filename']}": u['upload_id'] for u in uploads
+    })
+    upload_label = st.selectbox("Upload", list(upload_options))
+    theme = st.text_input("Theme (exact name, optional)")
+
+with col2:
+    use_dates = st.checkbox("Filter by date")
+    date_range = st.date_input("Created between", value=[], disabled=not use_dates)
+    min_severity = st.slider("Minimum severity", 1, 5, 1)
+
+st.subheader("2️⃣ Format")
+fmt = st.radio(
+    "File format",
+    list(EXPORT_FORMATS),
+    format_func=lambda f: {'csv': 'CSV', 'csv.gz': 'CSV (gzip)', 'parquet': 'Parquet'}[f],
+    horizontal=True
+)
+
+if st.button("📦 Prepare Export", type="primary"):
+    filters = {'upload_id': upload_options[upload_label]}
+    if theme:
+        filters['theme'] = theme
+    if min_severity > 1:
+        filters['min_severity'] = min_severity
+    if use_dates and len(date_range) == 2:
+        import datetime
+        filters['start_date'] = date_range[0]
+        filters['end_date'] = date_range[1] + datetime.timedelta(days=1)
+
+    try:
+        with st.spinner("Exporting..."):
+            path, rows = export_to_directory(db, fmt=fmt, **filters)
+        st.session_state.export_file = {'path': path, 'rows': rows}
+    except Exception as e:
+        st.error(f"❌ Export failed: {e}")
+
+export_file = st.session_state.export_file
+if export_file and os.path.exists(export_file['path']):
+    st.divider()
+    st.subheader("3️⃣ Download")
+
+    size_mb = os.path.getsize(export_file['path']) / 1024 ** 2
+    st.success(f"✅ Exported {export_file['rows']:,} tickets ({size_mb:.1f} MB)")
+
+    # st.download_button reads the whole file into server memory (and keeps it
+    # in the media file manager), so only exports under the cap are offered
+    if size_mb <= EXPORT_DOWNLOAD_MAX_MB:
+        with open(export_file['path'], 'rb') as f:
+            st.download_button(
+                "⬇️ Download",
+                data=f,
+                file_name=os.path.basename(export_file['path']),
+                mime="application/octet-stream"
+            )
+    else:
+        st.warning(
+            f"This export is larger than the {EXPORT_DOWNLOAD_MAX_MB} MB browser download limit. "
+            f"It has been written on the server at `{os.path.abspath(export_file['path'])}`. "
+            "Narrow the filters or choose a compressed format to download it here."
+        )
@@ -0,0 +1,86 @@
+"""
+Trends dashboard for InsightHub
+"""
+import streamlit as st
+import datetime
+import sys
+sys.path.append('src')
+
+from utils.config import CHART_MAX_POINTS
+from utils.resources import get_cached_db_manager
+from etl.loader import get_all_uploads
+from visualization.timeseries import get_time_bounds, get_volume_series, get_theme_totals
+from visualization.charts import volume_figure, theme_totals_figure
+
+st.set_page_config(
+    page_title="Trends",
+    page_icon="📈",
+    layout="wide"
+)
+
+st.title("📈 Ticket Trends")
+st.markdown("Ticket volume over time, aggregated in the database for the selected range")
+
+
+# Chart data is keyed on the viewport, so panning back to a range is instant
+@st.cache_data(ttl=300, show_spinner=False)
+def load_volume(_db, start, end, upload_id, by_theme):
+    return get_volume_series(
+        _db, start, end, upload_id=upload_id, by_theme=by_theme, max_points=CHART_MAX_POINTS
+    )
+
+
+@st.cache_data(ttl=300, show_spinner=False)
+def load_theme_totals(_db, start, end, upload_id):
+    return get_theme_totals(_db, start, end, upload_id=upload_id)
+
+
+try:
+    db = get_cached_db_manager()
+    uploads = get_all_uploads(db)
+except Exception as e:
+    st.error(f"Error connecting to database: {e}")
+    st.stop()
+
+upload_options = {"All uploads": None}
+upload_options.update({
+    f"#{u['upload_id']} - {u['filename']}": u['upload_id'] for u in uploads
+})
+
+col1, col2, col3 = st.columns([2, 2, 1])
+with col1:
+    upload_id = upload_options[st.selectbox("Upload", list(upload_options))]
+
+first, last = get_time_bounds(db, upload_id)
+if first is None:
+    st.info("No tickets yet. Upload data on the 📤 Upload page.")
+    st.stop()
+
+with col2:
+    date_range = st.date_input(
+        "Created between",
+        value=(first.date(), last.date()),
+        min_value=first.date(),
+        max_value=last.date()
+    )
+with col3:
+    by_theme = st.toggle("Split by theme")
+
+if len(date_range) != 2:
+    st.stop()
+
+start = datetime.datetime.combine(date_range[0], datetime.time.min)
+end = datetime.datetime.combine(date_range[1] + datetime.timedelta(days=1), datetime.time.min)
+
+with st.spinner("Aggregating..."):
+    volume, bucket_label = load_volume(db, start, end, upload_id, by_theme)
+    totals = load_theme_totals(db, start, end, upload_id)
+
+if volume.empty:
+    st.info("No tickets in the selected range.")
+    st.stop()
+
+st.plotly_chart(volume_figure(volume, bucket_label), use_container_width=True)
+st.caption(f"{len(volume):,} points · {bucket_label} buckets · budget {CHART_MAX_POINTS:,}")
+
+st.plotly_chart(theme_totals_figure(totals), use_container_width=True)
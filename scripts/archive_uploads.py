@@ -0,0 +1,40 @@
+"""
+Move uploads past the retention period to the Parquet archive
+
+Usage:
+    python scripts/archive_uploads.py                      # use ARCHIVE_RETENTION_DAYS
+    python scripts/archive_uploads.py --retention-days 90
+    python scripts/archive_uploads.py --dry-run            # list candidates only
+"""
+import sys
+sys.path.append('src')
+
+import argparse
+import logging
+
+from database.connection import get_db_manager
+from etl.archive import get_archive_candidates, archive_old_uploads
+from utils.config import ARCHIVE_RETENTION_DAYS
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Archive old uploads to Parquet")
+    parser.add_argument('--retention-days', type=int, default=ARCHIVE_RETENTION_DAYS,
+                        help="Archive uploads older than this many days")
+    parser.add_argument('--dry-run', action='store_true', help="Only list uploads that would be archived")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    db = get_db_manager()
+
+    if args.dry_run:
+        candidates = get_archive_candidates(db, args.retention_days)
+        print(f"{len(candidates)} uploads older than {args.retention_days} days: {candidates}")
+        return
+
+    results = archive_old_uploads(db, args.retention_days)
+    print(f"Archived {sum(results.values()):,} tickets from {len(results)} uploads")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+Benchmark: streaming anomaly state update vs. recomputing over full history
+
+Simulates a sequence of uploads of synthetic tickets (fixed size each) and
+times, per upload:
+  - incremental: aggregate only the new tickets and advance the stored
+    EWMA state (analysis.anomalies.advance_states)
+  - full:        aggregate all tickets so far and recompute the EWMA of every
+    series from the beginning
+The incremental cost should stay flat while the full recompute grows with
+history. Runs in-process; no database required.
+
+Usage:
+    python scripts/benchmark_anomalies.py
+    python scripts/benchmark_anomalies.py --uploads 50 --tickets 50000
+"""
+import sys
+sys.path.append('src')
+
+import time
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from analysis.anomalies import advance_states, KEY_COLUMNS, STATE_COLUMNS
+from utils.config import ANOMALY_DIMENSIONS, ANOMALY_EWMA_ALPHA
+
+DIMENSION_SIZES = {'theme': 40, 'channel': 5, 'product': 12}
+
+
+def make_upload(rng, index, n_tickets, days, spikes):
+    """Synthetic tickets for one upload covering `days` consecutive days"""
+    start = pd.Timestamp('2023-01-01') + pd.Timedelta(days=index * days)
+    day = rng.integers(0, days, n_tickets)
+    frame = pd.DataFrame({
+        'created_date': (start + pd.to_timedelta(day, unit='D')).date,
+        'assigned_theme_name': [f"theme_{t}" for t in rng.zipf(1.6, n_tickets) % DIMENSION_SIZES['theme']],
+        'channel': [f"channel_{c}" for c in rng.integers(0, DIMENSION_SIZES['channel'], n_tickets)],
+        'product': [f"product_{p}" for p in rng.integers(0, DIMENSION_SIZES['product'], n_tickets)]
+    })
+    if index in spikes:
+        # One theme suddenly gets a burst of extra tickets on one day
+        burst = pd.DataFrame({
+            'created_date': [(start + pd.Timedelta(days=days // 2)).date()] * (n_tickets // 20),
+            'assigned_theme_name': 'theme_7',
+            'channel': 'channel_0',
+            'product': 'product_0'
+        })
+        frame = pd.concat([frame, burst], ignore_index=True)
+    return frame
+
+
+def daily_counts(tickets):
+    parts = []
+    for dimension, column in ANOMALY_DIMENSIONS.items():
+        counts = tickets.groupby([column, 'created_date']).size().reset_index(name='ticket_count')
+        counts.columns = ['series_key', 'bucket_date', 'ticket_count']
+        counts.insert(0, 'dimension', dimension)
+        parts.append(counts)
+    return pd.concat(parts, ignore_index=True)
+
+
+def full_recompute(tickets):
+    """Baseline: rebuild every series' EWMA from all history"""
+    counts = daily_counts(tickets)
+    wide = counts.pivot_table(
+        index='bucket_date', columns=KEY_COLUMNS, values='ticket_count', aggfunc='sum', fill_value=0
+    )
+    wide.index = pd.to_datetime(wide.index)
+    wide = wide.asfreq('D', fill_value=0)
+    mean = wide.ewm(alpha=ANOMALY_EWMA_ALPHA, adjust=False).mean()
+    std = wide.ewm(alpha=ANOMALY_EWMA_ALPHA, adjust=False).std()
+    return (wide - mean.shift(1)) / std.shift(1).clip(lower=1.0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark incremental anomaly state updates")
+    parser.add_argument('--uploads', type=int, default=30)
+    parser.add_argument('--tickets', type=int, default=20000, help="Tickets per upload")
+    parser.add_argument('--days', type=int, default=7, help="Days covered by each upload")
+    parser.add_argument('--skip-full', action='store_true', help="Only time the incremental path")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    spikes = set(range(5, args.uploads, 7))
+    states = pd.DataFrame(columns=STATE_COLUMNS)
+    history = []
+    flagged = []
+
+    print(f"{'upload':>6}{'history':>12}{'incremental ms':>17}{'full ms':>10}{'anomalies':>11}")
+    incremental_times, full_times = [], []
+
+    for index in range(args.uploads):
+        tickets = make_upload(rng, index, args.tickets, args.days, spikes)
+        history.append(tickets)
+        history_size = sum(len(t) for t in history)
+
+        started = time.perf_counter()
+        counts = daily_counts(tickets)
+        touched = counts[KEY_COLUMNS].drop_duplicates().merge(states, on=KEY_COLUMNS)
+        result = advance_states(touched, counts)
+        incremental_ms = (time.perf_counter() - started) * 1000
+        incremental_times.append(incremental_ms)
+
+        states = (
+            pd.concat([states, result['states']], ignore_index=True)
+            .drop_duplicates(KEY_COLUMNS, keep='last')
+        )
+        flagged.append(result['anomalies'])
+
+        full_ms = float('nan')
+        if not args.skip_full:
+            started = time.perf_counter()
+            full_recompute(pd.concat(history, ignore_index=True))
+            full_ms = (time.perf_counter() - started) * 1000
+            full_times.append(full_ms)
+
+        print(f"{index:>6}{history_size:>12,}{incremental_ms:>17.1f}{full_ms:>10.1f}{len(result['anomalies']):>11}")
+
+    quarter = max(args.uploads // 4, 1)
+    print(
+        f"\nIncremental: first {quarter} uploads avg {np.mean(incremental_times[:quarter]):.1f} ms, "
+        f"last {quarter} avg {np.mean(incremental_times[-quarter:]):.1f} ms"
+    )
+    if full_times:
+        print(
+            f"Full recompute: first {quarter} uploads avg {np.mean(full_times[:quarter]):.1f} ms, "
+            f"last {quarter} avg {np.mean(full_times[-quarter:]):.1f} ms"
+        )
+
+    anomalies = pd.concat(flagged, ignore_index=True)
+    injected = anomalies[(anomalies['dimension'] == 'theme') & (anomalies['series_key'] == 'theme_7')]
+    print(f"\nInjected spikes: {len([s for s in spikes if s < args.uploads])}, "
+          f"detected on theme_7: {int((injected['direction'] == 'spike').sum())}, "
+          f"total flagged days: {len(anomalies)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+Benchmark: dashboard aggregation latency on PostgreSQL vs. embedded DuckDB
+
+Copies tickets (and upload records) from the PostgreSQL database in
+DATABASE_URL into a DuckDB file. PostgreSQL is only read. The same dashboard
+queries (home page counts, Trends page volume series at several bucket widths,
+theme totals) then run against both backends, and the median latency of each
+is reported. Row counts of the results are compared to catch translation
+differences.
+
+Usage:
+    python scripts/benchmark_backends.py
+    python scripts/benchmark_backends.py --limit 500000 --repeat 10
+    python scripts/benchmark_backends.py --reuse   # keep the DuckDB copy from the last run
+"""
+import sys
+sys.path.append('src')
+
+import time
+import argparse
+import statistics
+
+from database.connection import DatabaseManager
+from database.schema import create_schema, drop_all_tables
+from etl.loader import append_dataframe, get_all_uploads, get_quick_stats
+from visualization.timeseries import BUCKETS, aggregate_ticket_volume, get_time_bounds, get_theme_totals
+
+BUCKETS_BY_LABEL = {bucket['label']: bucket for bucket in BUCKETS}
+
+
+def copy_to_duckdb(source, target, limit=None, chunk_rows=100000):
+    """Copy uploads and tickets from PostgreSQL into a fresh DuckDB schema"""
+    drop_all_tables(target)
+    create_schema(target)
+
+    for df in source.stream_dataframes(
+        "SELECT upload_id, filename, file_size_bytes, uploaded_at, row_count, processed, status FROM uploads"
+    ):
+        append_dataframe(target, df, 'uploads')
+
+    query = "SELECT * FROM tickets ORDER BY created_at"
+    if limit:
+        query += f" LIMIT {int(limit)}"
+    copied = 0
+    started = time.perf_counter()
+    for df in source.stream_dataframes(query, yield_per=chunk_rows):
+        append_dataframe(target, df, 'tickets')
+        copied += len(df)
+        print(f"  copied {copied:,} tickets", end='\r')
+    print(f"  copied {copied:,} tickets in {time.perf_counter() - started:.1f}s")
+    return copied
+
+
+def dashboard_queries(db):
+    """(name, callable) for the queries the dashboard pages run"""
+    return [
+        ('home: quick stats', lambda: get_quick_stats(db)),
+        ('uploads list', lambda: get_all_uploads(db)),
+        ('trends: time bounds', lambda: get_time_bounds(db)),
+        ('volume per hour', lambda: aggregate_ticket_volume(db, BUCKETS_BY_LABEL['1 hour'])),
+        ('volume per 6 hours', lambda: aggregate_ticket_volume(db, BUCKETS_BY_LABEL['6 hours'])),
+        ('volume per day', lambda: aggregate_ticket_volume(db, BUCKETS_BY_LABEL['1 day'])),
+        ('volume per week by theme',
+         lambda: aggregate_ticket_volume(db, BUCKETS_BY_LABEL['1 week'], by_theme=True)),
+        ('theme totals', lambda: get_theme_totals(db))
+    ]
+
+
+def result_size(result):
+    return len(result) if hasattr(result, '__len__') else 1
+
+
+def time_query(func, repeat):
+    """Returns: (median milliseconds, result of the last run); first run is a warm-up"""
+    result = func()
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare dashboard query latency on PostgreSQL and DuckDB")
+    parser.add_argument('--duckdb-path', default='data/benchmark.duckdb')
+    parser.add_argument('--limit', type=int, default=None, help="Copy at most this many tickets")
+    parser.add_argument('--repeat', type=int, default=5, help="Timed runs per query")
+    parser.add_argument('--reuse', action='store_true', help="Skip the copy and use the existing DuckDB file")
+    args = parser.parse_args()
+
+    postgres = DatabaseManager()
+    if postgres.dialect != 'postgresql':
+        print("❌ DATABASE_URL must point at the PostgreSQL database to compare against")
+        sys.exit(1)
+    duck = DatabaseManager(database_url=f"duckdb:///{args.duckdb_path}")
+
+    print("=" * 60)
+    print("DASHBOARD QUERIES: POSTGRESQL VS DUCKDB")
+    print("=" * 60)
+
+    if not args.reuse:
+        print(f"\nCopying tickets to {args.duckdb_path}...")
+        copy_to_duckdb(postgres, duck, args.limit)
+
+    pg_tickets, _ = get_quick_stats(postgres)
+    duck_tickets, _ = get_quick_stats(duck)
+    print(f"\nTickets: PostgreSQL {pg_tickets:,}, DuckDB {duck_tickets:,}")
+    if pg_tickets != duck_tickets:
+        print("⚠️  Backends hold different ticket counts (--limit or stale --reuse); results will differ")
+
+    print(f"\n{'query':<28}{'postgres ms':>13}{'duckdb ms':>11}{'speedup':>9}")
+    mismatches = []
+    for (name, pg_query), (_, duck_query) in zip(dashboard_queries(postgres), dashboard_queries(duck)):
+        pg_ms, pg_result = time_query(pg_query, args.repeat)
+        duck_ms, duck_result = time_query(duck_query, args.repeat)
+        print(f"{name:<28}{pg_ms:>13.1f}{duck_ms:>11.1f}{pg_ms / max(duck_ms, 1e-3):>8.1f}x")
+        if result_size(pg_result) != result_size(duck_result):
+            mismatches.append(f"{name} ({result_size(pg_result)} vs {result_size(duck_result)} rows)")
+
+    print("\n" + "=" * 60)
+    if mismatches and pg_tickets == duck_tickets:
+        print(f"⚠️  Result sizes differ: {', '.join(mismatches)}")
+    else:
+        print("✅ Benchmark complete")
+
+    postgres.close()
+    duck.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Report import-time cost of the app's modules and enforce a startup budget
+
+Each module is imported in a fresh interpreter with `python -X importtime`,
+so results reflect a cold start. Exits with status 1 if any module exceeds
+its budget.
+
+Usage:
+    python scripts/check_import_time.py            # check all budgets
+    python scripts/check_import_time.py --top 15   # show more dependencies
+"""
+import os
+import sys
+import argparse
+import subprocess
+
+# Cumulative cold import budget per module, in milliseconds
+IMPORT_BUDGETS_MS = {
+    'utils.config': 50,
+    'utils.lazy': 10,
+    'database.connection': 400,
+    'database.schema': 400,
+    'etl.jobs': 400,
+    'etl.loader': 800,
+    'etl.staging': 800,
+    'etl.export': 800,
+    'utils.validators': 800,
+    'analysis.trends': 900,
+    'analysis.similarity': 900,
+}
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def measure_import(module):
+    """
+    Import a module in a fresh interpreter
+    Returns: (total_ms, {direct_dependency: cumulative_ms})
+    """
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(
+        [os.path.join(PROJECT_ROOT, 'src'), env.get('PYTHONPATH', '')]
+    ).rstrip(os.pathsep)
+
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        capture_output=True, text=True, env=env, cwd=PROJECT_ROOT
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr.strip().splitlines()[-1]}")
+
+    # Lines look like "import time:  self | cumulative |   nested.module"; nesting
+    # is shown by two spaces per level and children are printed before parents
+    entries = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        _, self_us, cumulative_us, raw_name = line.replace('import time:', '|', 1).split('|')
+        depth = (len(raw_name) - len(raw_name.lstrip()) - 1) // 2
+        entries.append((depth, raw_name.strip(), int(cumulative_us) / 1000))
+
+    # The target is the last top-level entry; its dependencies are the
+    # entries since the previous top-level one (interpreter startup)
+    end = max(i for i, (depth, name, _) in enumerate(entries) if depth == 0 and name == module)
+    start = max([i for i, (depth, _, _) in enumerate(entries[:end]) if depth == 0] + [-1]) + 1
+    dependencies = {name: ms for depth, name, ms in entries[start:end] if depth == 1}
+
+    return entries[end][2], dependencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check module import-time budgets")
+    parser.add_argument('--top', type=int, default=5, help="Heaviest dependencies to list per module")
+    parser.add_argument('modules', nargs='*', help="Modules to check (default: all budgeted modules)")
+    args = parser.parse_args()
+
+    modules = args.modules or list(IMPORT_BUDGETS_MS)
+    over_budget = []
+
+    print("=" * 60)
+    print("IMPORT TIME REPORT")
+    print("=" * 60)
+
+    for module in modules:
+        try:
+            total_ms, dependencies = measure_import(module)
+        except RuntimeError as e:
+            print(f"\n❌ {e}")
+            over_budget.append(module)
+            continue
+
+        budget = IMPORT_BUDGETS_MS.get(module)
+        status = "✅" if budget is None or total_ms <= budget else "❌"
+        budget_text = f" (budget {budget} ms)" if budget is not None else ""
+        print(f"\n{status} {module}: {total_ms:.1f} ms{budget_text}")
+
+        for name, ms in sorted(dependencies.items(), key=lambda item: -item[1])[:args.top]:
+            print(f"     {ms:8.1f} ms  {name}")
+
+        if status == "❌":
+            over_budget.append(module)
+
+    print("\n" + "=" * 60)
+    if over_budget:
+        print(f"❌ Over budget: {', '.join(over_budget)}")
+        sys.exit(1)
+    print("✅ ALL MODULES WITHIN BUDGET")
+
+
+if __name__ == "__main__":
+    main()
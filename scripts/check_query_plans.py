@@ -0,0 +1,184 @@
+"""
+Check that ticket-browser queries use the triage indexes
+
+For every triage view, EXPLAINs the first page and a deep page (cursor taken
+from a row far into the result) and fails if a plan sequentially scans
+tickets or sorts. In that case pagination cost would grow with page depth.
+With --analyze, the queries are also executed and the deep page must not be
+much slower than the first.
+
+Plans on a nearly empty table are not representative (PostgreSQL prefers a
+sequential scan there), so run this against a realistically sized database.
+
+Usage:
+    python scripts/check_query_plans.py
+    python scripts/check_query_plans.py --analyze --depth 50000
+"""
+import sys
+sys.path.append('src')
+
+import json
+import argparse
+
+from sqlalchemy import text
+
+from database.connection import get_db_manager
+from database.schema import HIGH_SEVERITY_INDEX
+from analysis.browse import build_browse_query, encode_cursor
+from utils.config import HIGH_SEVERITY_THRESHOLD
+
+# name -> (sort, filters); filter values are filled from the data
+VIEWS = {
+    'priority': ('priority', {}),
+    'priority by theme': ('priority', {'theme': None}),
+    'priority by upload': ('priority', {'upload_id': None}),
+    'severity': ('severity', {}),
+    'severity by theme': ('severity', {'theme': None}),
+    'high-severity queue': ('newest', {'high_severity_only': True}),
+    'newest': ('newest', {})
+}
+
+# Allowed slowdown of a deep page over the first page (--analyze)
+MAX_DEEP_PAGE_RATIO = 3.0
+MIN_MEASURABLE_MS = 2.0
+
+
+def walk(plan):
+    yield plan
+    for child in plan.get('Plans', []):
+        yield from walk(child)
+
+
+def explain(conn, query, params, analyze):
+    options = "ANALYZE, BUFFERS, FORMAT JSON" if analyze else "FORMAT JSON"
+    raw = conn.execute(text(f"EXPLAIN ({options}) {query}"), params).scalar()
+    result = (json.loads(raw) if isinstance(raw, str) else raw)[0]
+    return result
+
+
+def check_plan(result):
+    """Returns: (problems, index names used)"""
+    problems, indexes = [], []
+    for node in walk(result['Plan']):
+        node_type = node['Node Type']
+        if node_type == 'Seq Scan' and node.get('Relation Name') == 'tickets':
+            problems.append("sequential scan on tickets")
+        if node_type in ('Sort', 'Incremental Sort'):
+            problems.append(f"{node_type.lower()} node")
+        if 'Index Name' in node:
+            indexes.append(node['Index Name'])
+    return problems, indexes
+
+
+def check_high_severity_index(conn):
+    """
+    The partial index must use the configured threshold, or the high-severity
+    queue cannot use it (CREATE INDEX IF NOT EXISTS keeps an older predicate)
+    Returns: problem description or None
+    """
+    predicate = conn.execute(text("""
+        SELECT pg_get_expr(i.indpred, i.indrelid)
+        FROM pg_index i
+        JOIN pg_class c ON c.oid = i.indexrelid
+        WHERE c.relname = :name
+    """), {'name': HIGH_SEVERITY_INDEX}).scalar()
+    if predicate is None:
+        return f"{HIGH_SEVERITY_INDEX} is missing"
+    expected = f"(severity_score >= {int(HIGH_SEVERITY_THRESHOLD)})"
+    if predicate != expected:
+        return (
+            f"{HIGH_SEVERITY_INDEX} is WHERE {predicate}, HIGH_SEVERITY_THRESHOLD needs "
+            f"WHERE {expected}; drop the index and run create_schema again"
+        )
+    return None
+
+
+def fill_filters(conn, filters):
+    filled = dict(filters)
+    if 'theme' in filled:
+        filled['theme'] = conn.execute(text("""
+            SELECT assigned_theme_name FROM tickets
+            WHERE assigned_theme_name IS NOT NULL
+            GROUP BY 1 ORDER BY COUNT(*) DESC LIMIT 1
+        """)).scalar()
+    if 'upload_id' in filled:
+        filled['upload_id'] = conn.execute(text("""
+            SELECT upload_id FROM tickets GROUP BY 1 ORDER BY COUNT(*) DESC LIMIT 1
+        """)).scalar()
+    return filled
+
+
+def deep_cursor(conn, sort, filters, depth):
+    """Cursor pointing `depth` rows into the view (uses OFFSET once, for setup only)"""
+    query, params = build_browse_query(sort, None, 1, **filters)
+    query = query.replace("LIMIT :limit", "OFFSET :offset LIMIT 1")
+    row = conn.execute(text(query), dict(params, offset=depth)).mappings().fetchone()
+    return encode_cursor(sort, row) if row else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="EXPLAIN-check the ticket browser queries")
+    parser.add_argument('--depth', type=int, default=10000, help="Rows to skip for the deep page")
+    parser.add_argument('--analyze', action='store_true', help="Execute queries and compare timings")
+    args = parser.parse_args()
+
+    db = get_db_manager()
+    failures = []
+
+    print("=" * 60)
+    print("TICKET BROWSER QUERY PLANS")
+    print("=" * 60)
+
+    with db.get_connection() as conn:
+        rows = conn.execute(text("SELECT reltuples::BIGINT FROM pg_class WHERE relname = 'tickets'")).scalar()
+        if rows is not None and rows < 10000:
+            print(f"⚠️  tickets has ~{max(rows, 0)} rows; plans on small tables may not use indexes")
+
+        problem = check_high_severity_index(conn)
+        if problem:
+            print(f"\n❌ {problem}")
+            failures.append("high-severity index predicate")
+
+        for name, (sort, filters) in VIEWS.items():
+            filters = fill_filters(conn, filters)
+            if any(value is None for value in filters.values()):
+                print(f"\n⏭️  {name}: no data for filters, skipped")
+                continue
+
+            cursor = deep_cursor(conn, sort, filters, args.depth)
+            pages = [('first page', None)] + ([(f"page at row {args.depth:,}", cursor)] if cursor else [])
+            timings = []
+
+            print(f"\n{name}")
+            if cursor is None:
+                print(f"  ⚠️  fewer than {args.depth:,} rows, deep page skipped")
+            for label, page_cursor in pages:
+                query, params = build_browse_query(sort, page_cursor, **filters)
+                result = explain(conn, query, params, args.analyze)
+                problems, indexes = check_plan(result)
+
+                status = "❌" if problems else "✅"
+                detail = f"via {', '.join(indexes)}" if indexes else "no index"
+                timing = ""
+                if args.analyze:
+                    timings.append(result['Execution Time'])
+                    timing = f" {result['Execution Time']:.2f} ms"
+                print(f"  {status} {label}: {detail}{timing}")
+                for problem in problems:
+                    print(f"       {problem}")
+                if problems:
+                    failures.append(f"{name} ({label})")
+
+            if len(timings) == 2 and timings[1] > max(timings[0] * MAX_DEEP_PAGE_RATIO, MIN_MEASURABLE_MS):
+                print(f"  ❌ deep page {timings[1] / max(timings[0], 1e-3):.1f}x slower than first page")
+                failures.append(f"{name} (deep page timing)")
+
+    print("\n" + "=" * 60)
+    if failures:
+        print(f"❌ Plan checks failed: {', '.join(failures)}")
+        sys.exit(1)
+    print("✅ ALL VIEWS PAGINATE ON INDEXES")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+"""
+Load test: simulate concurrent dashboard sessions against PostgreSQL
+
+Each simulated session is a thread that repeatedly "reruns" a page, running
+the same queries the page runs (without Streamlit's caches), then pauses for
+a think time. All sessions share one DatabaseManager, exactly like sessions
+on a Streamlit server share the cached one. The report shows per-query
+latency percentiles, connection checkout waits, pool occupancy, and
+recommended pool settings.
+
+Usage:
+    python scripts/load_test.py --sessions 25 --duration 60
+    python scripts/load_test.py --sessions 50 --pool-size 10 --max-overflow 20
+    python scripts/load_test.py --sessions 50 --processes 4   # size for 4 app processes
+"""
+import sys
+sys.path.append('src')
+
+import time
+import random
+import argparse
+import threading
+from collections import defaultdict
+
+from database.connection import DatabaseManager
+from database.pool_sizing import summarize, recommend_pool_settings
+from etl.loader import get_all_uploads, get_quick_stats
+from etl.jobs import get_upload_status
+from visualization.timeseries import get_volume_series, get_theme_totals
+from utils.config import DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT
+
+
+def home_page(db, state):
+    return [('quick_stats', lambda: get_quick_stats(db))]
+
+
+def upload_page(db, state):
+    queries = [('upload_history', lambda: get_all_uploads(db))]
+    if state.get('upload_id'):
+        queries.append(('upload_status', lambda: get_upload_status(db, state['upload_id'])))
+    return queries
+
+
+def trends_page(db, state):
+    return [
+        ('upload_history', lambda: get_all_uploads(db)),
+        ('volume_series', lambda: get_volume_series(db, upload_id=state.get('upload_id'))),
+        ('theme_totals', lambda: get_theme_totals(db, upload_id=state.get('upload_id')))
+    ]
+
+
+def export_page(db, state):
+    return [('upload_history', lambda: get_all_uploads(db))]
+
+
+# Page -> relative share of reruns (upload status polling reruns most often)
+PAGE_MIX = {
+    'home': (home_page, 2),
+    'upload': (upload_page, 4),
+    'trends': (trends_page, 3),
+    'export': (export_page, 1)
+}
+
+
+class LoadTest:
+    """Collects timings from session threads"""
+
+    def __init__(self, db, sessions, duration, think_time, ramp_up):
+        self.db = db
+        self.sessions = sessions
+        self.duration = duration
+        self.think_time = think_time
+        self.ramp_up = ramp_up
+        self.latencies = defaultdict(list)
+        self.reruns = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.in_use = []
+        self.lock = threading.Lock()
+        self.stop = threading.Event()
+
+    def _record(self, bucket, key, value):
+        with self.lock:
+            bucket[key].append(value)
+
+    def session(self, index, upload_ids):
+        rng = random.Random(index)
+        pages = list(PAGE_MIX)
+        weights = [PAGE_MIX[p][1] for p in pages]
+        state = {'upload_id': rng.choice(upload_ids) if upload_ids else None}
+
+        # Stagger session start over the ramp-up period
+        if self.stop.wait(self.ramp_up * index / max(self.sessions, 1)):
+            return
+
+        while not self.stop.is_set():
+            page = rng.choices(pages, weights)[0]
+            rerun_started = time.perf_counter()
+            for name, run in PAGE_MIX[page][0](self.db, state):
+                started = time.perf_counter()
+                try:
+                    run()
+                    self._record(self.latencies, name, time.perf_counter() - started)
+                except Exception as e:
+                    with self.lock:
+                        self.errors[f"{name}: {type(e).__name__}"] += 1
+            self._record(self.reruns, page, time.perf_counter() - rerun_started)
+            self.stop.wait(rng.uniform(0.5, 1.5) * self.think_time)
+
+    def monitor(self, interval=0.05):
+        """Sample how many connections are checked out"""
+        while not self.stop.is_set():
+            status = self.db.pool_status()
+            if status is None:
+                return  # Single shared connection, nothing to sample
+            self.in_use.append(status['checked_out'])
+            time.sleep(interval)
+
+    def run(self):
+        upload_ids = [u['upload_id'] for u in get_all_uploads(self.db)]
+        self.db.drain_pool_waits()  # Ignore setup queries
+
+        threads = [threading.Thread(target=self.monitor, daemon=True)]
+        threads += [
+            threading.Thread(target=self.session, args=(i, upload_ids), daemon=True)
+            for i in range(self.sessions)
+        ]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        time.sleep(self.duration)
+        self.stop.set()
+        for thread in threads:
+            thread.join()
+        return time.perf_counter() - started
+
+
+def print_table(title, rows):
+    print(f"\n{title}")
+    print(f"  {'':<16}{'count':>8}{'mean':>10}{'p50':>10}{'p95':>10}{'p99':>10}{'max':>10}   (ms)")
+    for name, stats in rows:
+        print(
+            f"  {name:<16}{stats['count']:>8}{stats['mean']:>10.1f}{stats['p50']:>10.1f}"
+            f"{stats['p95']:>10.1f}{stats['p99']:>10.1f}{stats['max']:>10.1f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate concurrent dashboard sessions")
+    parser.add_argument('--sessions', type=int, default=20, help="Concurrent sessions")
+    parser.add_argument('--duration', type=float, default=60, help="Test length in seconds")
+    parser.add_argument('--think-time', type=float, default=1.0, help="Mean pause between reruns (s)")
+    parser.add_argument('--ramp-up', type=float, default=5.0, help="Seconds to start all sessions")
+    parser.add_argument('--pool-size', type=int, default=DB_POOL_SIZE)
+    parser.add_argument('--max-overflow', type=int, default=DB_MAX_OVERFLOW)
+    parser.add_argument('--pool-timeout', type=int, default=DB_POOL_TIMEOUT)
+    parser.add_argument('--processes', type=int, default=1, help="App processes the database must serve")
+    args = parser.parse_args()
+
+    db = DatabaseManager(
+        pool_size=args.pool_size,
+        max_overflow=args.max_overflow,
+        pool_timeout=args.pool_timeout
+    )
+    db.enable_pool_metrics()
+
+    print(
+        f"Running {args.sessions} sessions for {args.duration:.0f}s "
+        f"(pool_size={args.pool_size}, max_overflow={args.max_overflow})..."
+    )
+    test = LoadTest(db, args.sessions, args.duration, args.think_time, args.ramp_up)
+    elapsed = test.run()
+
+    query_stats = [(name, summarize(samples)) for name, samples in sorted(test.latencies.items())]
+    all_queries = [s for samples in test.latencies.values() for s in samples]
+    waits = summarize(db.drain_pool_waits())
+
+    print_table("Query latency", query_stats + [('ALL', summarize(all_queries))])
+    print_table("Page rerun latency", [(name, summarize(s)) for name, s in sorted(test.reruns.items())])
+    print_table("Connection checkout wait", [('checkout', waits)])
+
+    throughput = len(all_queries) / elapsed
+    print(f"\nThroughput: {throughput:.1f} queries/s over {elapsed:.0f}s")
+    if test.errors:
+        print("Errors:")
+        for name, count in sorted(test.errors.items()):
+            print(f"  {name}: {count}")
+
+    max_connections = int(db.execute_query("SHOW max_connections")[0][0])
+    recommendation = recommend_pool_settings(
+        throughput_qps=throughput,
+        # Time holding a connection = query latency minus time waiting for one
+        mean_hold_seconds=max(
+            (sum(all_queries) / len(all_queries) if all_queries else 0.0) - waits['mean'] / 1000, 0.0
+        ),
+        in_use_samples=test.in_use,
+        wait_p95_ms=waits['p95'],
+        pool_size=args.pool_size,
+        max_overflow=args.max_overflow,
+        processes=args.processes,
+        max_connections=max_connections
+    )
+
+    print("\nRecommended settings (per process):")
+    print(f"  DB_POOL_SIZE={recommendation['pool_size']}")
+    print(f"  DB_MAX_OVERFLOW={recommendation['max_overflow']}")
+    for note in recommendation['notes']:
+        print(f"  - {note}")
+
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""
+Run background workers that process queued uploads
+
+Usage:
+    python scripts/run_worker.py                # one worker
+    python scripts/run_worker.py --workers 4    # pool of 4 worker processes
+"""
+import sys
+sys.path.append('src')
+
+import argparse
+import multiprocessing
+
+
+def worker_main(poll_interval):
+    # Each process builds its own engine; connections are not shared across forks
+    from database.connection import get_db_manager
+    from etl.jobs import run_worker
+
+    try:
+        run_worker(get_db_manager(), poll_interval=poll_interval)
+    except KeyboardInterrupt:
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Process queued upload jobs")
+    parser.add_argument('--workers', type=int, default=1, help="Number of worker processes")
+    parser.add_argument('--poll-interval', type=float, default=2.0, help="Seconds between queue polls")
+    args = parser.parse_args()
+
+    if args.workers == 1:
+        worker_main(args.poll_interval)
+        return
+
+    processes = [
+        multiprocessing.Process(target=worker_main, args=(args.poll_interval,), daemon=True)
+        for _ in range(args.workers)
+    ]
+    for process in processes:
+        process.start()
+
+    print(f"Started {args.workers} workers (Ctrl+C to stop)")
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        for process in processes:
+            process.terminate()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,345 @@
+"""
+Streaming spike and drop detection on daily ticket volume
+
+Each series (a theme, channel or product) keeps a few numbers in
+volume_state: an exponentially weighted mean and variance of its closed
+daily counts, how many days it has seen, and the running count of its
+latest ("open") day. Processing an upload aggregates only that upload's
+tickets, advances the touched series day by day from their open day, and
+scores every day against the state as it was before that day. The cost is
+proportional to the new tickets and days, never to the history size.
+
+Late tickets (dated before a series' open day) cannot revise the EWMA and
+are counted but skipped.
+
+Each dimension of an upload is folded in once (claimed in volume_scans).
+The theme dimension waits until the upload's tickets carry themes, so the
+detector can run right after loading and again after theming.
+"""
+import logging
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+from utils.config import (
+    ANOMALY_DIMENSIONS,
+    ANOMALY_EWMA_ALPHA,
+    ANOMALY_Z_THRESHOLD,
+    ANOMALY_WARMUP_DAYS,
+    ANOMALY_MIN_COUNT,
+    ANOMALY_MIN_STD
+)
+
+logger = logging.getLogger(__name__)
+
+KEY_COLUMNS = ['dimension', 'series_key']
+STATE_COLUMNS = KEY_COLUMNS + ['open_bucket', 'open_count', 'ewma_mean', 'ewma_var', 'n_buckets']
+ANOMALY_COLUMNS = KEY_COLUMNS + ['bucket_date', 'direction', 'observed', 'expected', 'z_score']
+
+
+def _to_days(values):
+    return pd.to_datetime(pd.Series(values)).to_numpy().astype('datetime64[D]')
+
+
+def _to_payload(df, date_column):
+    """JSON records with dates as plain YYYY-MM-DD strings"""
+    return df.assign(**{date_column: df[date_column].astype(str)}).to_json(orient='records')
+
+
+def advance_states(states, counts, alpha=ANOMALY_EWMA_ALPHA, threshold=ANOMALY_Z_THRESHOLD,
+                   warmup=ANOMALY_WARMUP_DAYS, min_count=ANOMALY_MIN_COUNT, min_std=ANOMALY_MIN_STD):
+    """
+    Fold new daily counts into series state and flag anomalous days
+    states: DataFrame with STATE_COLUMNS for (at least) the touched series
+    counts: DataFrame with dimension, series_key, bucket_date, ticket_count
+    Returns: dict with
+        states   - updated rows for every touched series (STATE_COLUMNS)
+        anomalies - flagged days (ANOMALY_COLUMNS)
+        cleared  - (dimension, series_key, bucket_date) of previously open days
+                   that are no longer anomalous
+        late_tickets - tickets skipped because their day was already closed
+    """
+    empty = {
+        'states': pd.DataFrame(columns=STATE_COLUMNS),
+        'anomalies': pd.DataFrame(columns=ANOMALY_COLUMNS),
+        'cleared': pd.DataFrame(columns=KEY_COLUMNS + ['bucket_date']),
+        'late_tickets': 0
+    }
+    if counts.empty:
+        return empty
+
+    series = counts[KEY_COLUMNS].drop_duplicates().merge(states, on=KEY_COLUMNS, how='left')
+    series_index = pd.MultiIndex.from_frame(series[KEY_COLUMNS])
+
+    has_state = series['open_bucket'].notna().to_numpy()
+    open_day = _to_days(series['open_bucket'])
+    count_days = _to_days(counts['bucket_date'])
+    row = series_index.get_indexer(pd.MultiIndex.from_frame(counts[KEY_COLUMNS]))
+    values = counts['ticket_count'].to_numpy(dtype=np.float64)
+
+    end = count_days.max()
+    first_new = np.full(len(series), end)
+    earliest = pd.Series(count_days).groupby(row).min()
+    first_new[earliest.index.to_numpy()] = earliest.to_numpy().astype('datetime64[D]')
+    start = np.where(has_state, open_day, first_new)
+
+    # Series whose open day is after everything in this batch get nothing new
+    late = count_days < start[row]
+    late_tickets = int(values[late].sum())
+    live = start <= end
+    if not live.any():
+        return dict(empty, late_tickets=late_tickets)
+
+    origin = start[live].min()
+    n_days = int((end - origin).astype(np.int64)) + 1
+    start_col = np.where(live, (start - origin).astype(np.int64), n_days)
+
+    grid = np.zeros((len(series), n_days), dtype=np.float64)
+    keep = ~late & live[row]
+    np.add.at(grid, (row[keep], (count_days[keep] - origin).astype(np.int64)), values[keep])
+    carried = has_state & live
+    grid[carried, start_col[carried]] += series['open_count'].to_numpy(dtype=np.float64)[carried]
+
+    mean = series['ewma_mean'].fillna(0).to_numpy(dtype=np.float64)
+    var = series['ewma_var'].fillna(0).to_numpy(dtype=np.float64)
+    n_seen = series['n_buckets'].fillna(0).to_numpy(dtype=np.int64)
+
+    flagged, cleared = [], []
+    for d in range(n_days):
+        active = start_col <= d
+        x = grid[:, d]
+
+        # Score the day against the state before it
+        std = np.maximum(np.sqrt(var), min_std)
+        z = (x - mean) / std
+        scored = active & (n_seen >= warmup)
+        spike = scored & (z >= threshold) & (x >= min_count)
+        drop = scored & (z <= -threshold) & (mean >= min_count)
+        for i in np.flatnonzero(spike | drop):
+            flagged.append((i, d, 'spike' if spike[i] else 'drop', x[i], mean[i], z[i]))
+        # The previously open day may have been flagged on an earlier run
+        for i in np.flatnonzero(carried & (start_col == d) & ~(spike | drop)):
+            cleared.append((i, d))
+
+        # Close every day but the last; the last one stays open for more tickets
+        if d == n_days - 1:
+            break
+        first = active & (n_seen == 0)
+        diff = x - mean
+        increment = alpha * diff
+        mean = np.where(first, x, np.where(active, mean + increment, mean))
+        var = np.where(first, 0.0, np.where(active, (1 - alpha) * (var + diff * increment), var))
+        n_seen = n_seen + active
+
+    def day(d):
+        return pd.Timestamp(origin + np.timedelta64(d, 'D')).date()
+
+    new_states = series.loc[live, KEY_COLUMNS].copy()
+    new_states['open_bucket'] = day(n_days - 1)
+    new_states['open_count'] = grid[live, n_days - 1].astype(np.int64)
+    new_states['ewma_mean'] = mean[live]
+    new_states['ewma_var'] = var[live]
+    new_states['n_buckets'] = n_seen[live]
+
+    anomalies = pd.DataFrame(
+        [
+            (series.at[i, 'dimension'], series.at[i, 'series_key'], day(d), direction,
+             int(observed), float(expected), float(z))
+            for i, d, direction, observed, expected, z in flagged
+        ],
+        columns=ANOMALY_COLUMNS
+    )
+    cleared = pd.DataFrame(
+        [(series.at[i, 'dimension'], series.at[i, 'series_key'], day(d)) for i, d in cleared],
+        columns=KEY_COLUMNS + ['bucket_date']
+    )
+
+    return {
+        'states': new_states.reset_index(drop=True),
+        'anomalies': anomalies,
+        'cleared': cleared,
+        'late_tickets': late_tickets
+    }
+
+
+def get_upload_volume(conn, upload_id, dimensions=ANOMALY_DIMENSIONS):
+    """Daily ticket counts per series for one upload only"""
+    selects = [
+        f"""
+        SELECT '{dimension}' AS dimension, {column} AS series_key, created_date, COUNT(*)
+        FROM tickets
+        WHERE upload_id = :upload_id AND {column} IS NOT NULL AND created_date IS NOT NULL
+        GROUP BY {column}, created_date
+        """
+        for dimension, column in dimensions.items()
+    ]
+    rows = conn.execute(text(" UNION ALL ".join(selects)), {'upload_id': upload_id}).fetchall()
+    return pd.DataFrame(rows, columns=KEY_COLUMNS + ['bucket_date', 'ticket_count'])
+
+
+def load_states(conn, keys):
+    """State rows for the given series"""
+    query = """
+    SELECT s.dimension, s.series_key, s.open_bucket, s.open_count,
+           s.ewma_mean, s.ewma_var, s.n_buckets
+    FROM volume_state s
+    JOIN jsonb_to_recordset(CAST(:payload AS JSONB)) AS k(dimension TEXT, series_key TEXT)
+      ON s.dimension = k.dimension AND s.series_key = k.series_key
+    """
+    rows = conn.execute(text(query), {'payload': keys.to_json(orient='records')}).fetchall()
+    return pd.DataFrame(rows, columns=STATE_COLUMNS)
+
+
+def write_states(conn, states):
+    query = """
+    INSERT INTO volume_state
+        (dimension, series_key, open_bucket, open_count, ewma_mean, ewma_var, n_buckets, updated_at)
+    SELECT v.dimension, v.series_key, v.open_bucket, v.open_count,
+           v.ewma_mean, v.ewma_var, v.n_buckets, CURRENT_TIMESTAMP
+    FROM jsonb_to_recordset(CAST(:payload AS JSONB)) AS v(
+        dimension TEXT, series_key TEXT, open_bucket DATE, open_count INTEGER,
+        ewma_mean FLOAT, ewma_var FLOAT, n_buckets INTEGER
+    )
+    ON CONFLICT (dimension, series_key) DO UPDATE
+    SET open_bucket = EXCLUDED.open_bucket,
+        open_count = EXCLUDED.open_count,
+        ewma_mean = EXCLUDED.ewma_mean,
+        ewma_var = EXCLUDED.ewma_var,
+        n_buckets = EXCLUDED.n_buckets,
+        updated_at = EXCLUDED.updated_at
+    """
+    conn.execute(text(query), {'payload': _to_payload(states, 'open_bucket')})
+
+
+def write_anomalies(conn, anomalies, cleared, upload_id):
+    if not cleared.empty:
+        conn.execute(
+            text("""
+            DELETE FROM anomalies a
+            USING jsonb_to_recordset(CAST(:payload AS JSONB)) AS c(
+                dimension TEXT, series_key TEXT, bucket_date DATE
+            )
+            WHERE a.dimension = c.dimension
+              AND a.series_key = c.series_key
+              AND a.bucket_date = c.bucket_date
+            """),
+            {'payload': _to_payload(cleared, 'bucket_date')}
+        )
+    if anomalies.empty:
+        return
+
+    query = """
+    INSERT INTO anomalies
+        (dimension, series_key, bucket_date, direction, observed, expected, z_score, upload_id)
+    SELECT v.dimension, v.series_key, v.bucket_date, v.direction,
+           v.observed, v.expected, v.z_score, :upload_id
+    FROM jsonb_to_recordset(CAST(:payload AS JSONB)) AS v(
+        dimension TEXT, series_key TEXT, bucket_date DATE, direction TEXT,
+        observed INTEGER, expected FLOAT, z_score FLOAT
+    )
+    ON CONFLICT (dimension, series_key, bucket_date) DO UPDATE
+    SET direction = EXCLUDED.direction,
+        observed = EXCLUDED.observed,
+        expected = EXCLUDED.expected,
+        z_score = EXCLUDED.z_score,
+        upload_id = EXCLUDED.upload_id,
+        detected_at = CURRENT_TIMESTAMP
+    """
+    conn.execute(
+        text(query),
+        {'upload_id': upload_id, 'payload': _to_payload(anomalies, 'bucket_date')}
+    )
+
+
+def ready_dimensions(conn, upload_id, dimensions=ANOMALY_DIMENSIONS):
+    """Dimensions whose values are final; the theme dimension needs themed tickets"""
+    ready = dict(dimensions)
+    if 'theme' in ready:
+        themed = conn.execute(
+            text(f"""
+            SELECT EXISTS (
+                SELECT 1 FROM tickets
+                WHERE upload_id = :upload_id AND {ready['theme']} IS NOT NULL
+            )
+            """),
+            {'upload_id': upload_id}
+        ).scalar()
+        if not themed:
+            del ready['theme']
+    return ready
+
+
+def claim_dimensions(conn, upload_id, dimensions):
+    """
+    Mark dimensions of an upload as scanned
+    Returns: the subset of dimensions not scanned before
+    """
+    if not dimensions:
+        return {}
+    query = """
+    INSERT INTO volume_scans (upload_id, dimension)
+    SELECT :upload_id, d.dimension
+    FROM unnest(CAST(:dimensions AS TEXT[])) AS d(dimension)
+    ON CONFLICT (upload_id, dimension) DO NOTHING
+    RETURNING dimension
+    """
+    rows = conn.execute(text(query), {'upload_id': upload_id, 'dimensions': list(dimensions)})
+    claimed = {row[0] for row in rows}
+    return {dimension: column for dimension, column in dimensions.items() if dimension in claimed}
+
+
+def update_volume_anomalies(db_manager, upload_id):
+    """
+    Fold an upload into the volume state and record anomalies, once per
+    dimension; call again after theming to pick up the theme dimension
+    Returns: dict with dimensions, series, anomalies and late_tickets counts
+             (None if no dimension was left to scan)
+    """
+    db_manager.require_postgresql("Volume anomaly detection")
+    try:
+        with db_manager.get_connection() as conn:
+            # Serialize state updates: two uploads may touch the same series
+            conn.execute(text("SELECT pg_advisory_xact_lock(hashtext('volume_state'))"))
+            dimensions = claim_dimensions(conn, upload_id, ready_dimensions(conn, upload_id))
+            if not dimensions:
+                conn.rollback()
+                logger.info(f"Upload {upload_id}: no dimensions left to fold into volume state")
+                return None
+
+            counts = get_upload_volume(conn, upload_id, dimensions)
+            states = load_states(conn, counts[KEY_COLUMNS].drop_duplicates())
+            result = advance_states(states, counts)
+
+            if not result['states'].empty:
+                write_states(conn, result['states'])
+            write_anomalies(conn, result['anomalies'], result['cleared'], upload_id)
+            conn.commit()
+    except Exception as e:
+        logger.error(f"Failed to update volume anomalies: {e}")
+        raise
+
+    summary = {
+        'dimensions': sorted(dimensions),
+        'series': len(result['states']),
+        'anomalies': len(result['anomalies']),
+        'late_tickets': result['late_tickets']
+    }
+    logger.info(f"Volume state updated from upload {upload_id}: {summary}")
+    return summary
+
+
+def get_recent_anomalies(db_manager, limit=50, dimension=None):
+    """Most recent flagged days, largest deviation first within a day"""
+    query = """
+    SELECT dimension, series_key, bucket_date, direction, observed, expected, z_score, upload_id
+    FROM anomalies
+    """
+    params = {'limit': limit}
+    if dimension:
+        query += " WHERE dimension = :dimension"
+        params['dimension'] = dimension
+    query += " ORDER BY bucket_date DESC, ABS(z_score) DESC LIMIT :limit"
+
+    rows = db_manager.execute_query(query, params)
+    return pd.DataFrame(rows, columns=ANOMALY_COLUMNS + ['upload_id'])
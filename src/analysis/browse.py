@@ -0,0 +1,135 @@
+"""
+Ticket browsing for triage views with keyset pagination
+
+Pages are fetched with WHERE (sort key, ticket_id) > (last row seen) instead
+of OFFSET, so page 1,000 costs the same as page 1: the query walks one of
+the composite indexes (see schema.py, "Triage views") from the cursor
+position and stops after one page. The cursor is an opaque token holding
+the last row's sort key. Only tickets in the table are listed; archived
+uploads are reachable through exports (etl/export.py).
+"""
+import json
+import base64
+import logging
+from datetime import datetime
+
+from sqlalchemy import text
+
+from utils.config import BROWSE_PAGE_SIZE, BROWSE_MAX_PAGE_SIZE, HIGH_SEVERITY_THRESHOLD
+
+logger = logging.getLogger(__name__)
+
+# Sort keys end with ticket_id so every position is unique. All columns of a
+# sort run in one direction, which keeps the keyset a single row comparison.
+SORTS = {
+    'priority': {'columns': ['priority_rank', 'ticket_id'], 'descending': False, 'required': 'priority_rank'},
+    'severity': {'columns': ['severity_score', 'created_at', 'ticket_id'], 'descending': True, 'required': 'severity_score'},
+    'newest': {'columns': ['created_at', 'ticket_id'], 'descending': True, 'required': None}
+}
+
+BROWSE_COLUMNS = [
+    'ticket_id', 'upload_id', 'created_at', 'product', 'channel',
+    'assigned_theme_name', 'severity_score', 'severity_label', 'priority_rank'
+]
+
+# Turn cursor values back into query parameters of the right type
+CURSOR_PARSERS = {
+    'created_at': datetime.fromisoformat
+}
+
+
+def encode_cursor(sort, row):
+    payload = {'sort': sort, 'key': [row[col] for col in SORTS[sort]['columns']]}
+    raw = json.dumps(payload, default=lambda v: v.isoformat()).encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+
+def decode_cursor(sort, cursor):
+    """Returns: list of sort-key values for the row the cursor points at"""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except Exception:
+        raise ValueError("Invalid page cursor")
+    if payload.get('sort') != sort:
+        raise ValueError(f"Cursor belongs to sort '{payload.get('sort')}', not '{sort}'")
+    columns = SORTS[sort]['columns']
+    return [CURSOR_PARSERS.get(col, lambda v: v)(value) for col, value in zip(columns, payload['key'])]
+
+
+def build_browse_query(sort='priority', cursor=None, page_size=BROWSE_PAGE_SIZE, upload_id=None,
+                       theme=None, channel=None, min_severity=None, high_severity_only=False,
+                       preview_chars=200):
+    """
+    Build the page query
+    high_severity_only: restrict to the high-severity queue (uses the partial index)
+    Returns: (query, params)
+    """
+    if sort not in SORTS:
+        raise ValueError(f"Unknown sort: {sort} (choose from {list(SORTS)})")
+    spec = SORTS[sort]
+    columns = spec['columns']
+
+    conditions = []
+    params = {'limit': page_size + 1, 'preview_chars': preview_chars}
+
+    if spec['required']:
+        conditions.append(f"{spec['required']} IS NOT NULL")
+    if upload_id is not None:
+        conditions.append("upload_id = :upload_id")
+        params['upload_id'] = upload_id
+    if theme:
+        conditions.append("assigned_theme_name = :theme")
+        params['theme'] = theme
+    if channel:
+        conditions.append("channel = :channel")
+        params['channel'] = channel
+    if min_severity is not None:
+        conditions.append("severity_score >= :min_severity")
+        params['min_severity'] = min_severity
+    if high_severity_only:
+        # Literal, not a parameter, so the planner can match the partial index
+        conditions.append(f"severity_score >= {int(HIGH_SEVERITY_THRESHOLD)}")
+
+    if cursor:
+        key = decode_cursor(sort, cursor)
+        placeholders = []
+        for i, value in enumerate(key):
+            params[f"k{i}"] = value
+            placeholders.append(f":k{i}")
+        op = '<' if spec['descending'] else '>'
+        conditions.append(f"({', '.join(columns)}) {op} ({', '.join(placeholders)})")
+
+    direction = 'DESC' if spec['descending'] else 'ASC'
+    query = f"""
+    SELECT {', '.join(BROWSE_COLUMNS)}, LEFT(text_content, :preview_chars) AS preview
+    FROM tickets
+    {'WHERE ' + ' AND '.join(conditions) if conditions else ''}
+    ORDER BY {', '.join(f'{col} {direction}' for col in columns)}
+    LIMIT :limit
+    """
+    return query, params
+
+
+def browse_tickets(db_manager, sort='priority', cursor=None, page_size=BROWSE_PAGE_SIZE, **filters):
+    """
+    Fetch one page of tickets
+    filters: upload_id, theme, channel, min_severity, high_severity_only
+    Returns: dict with rows (list of dicts) and next_cursor (None on the last page)
+    """
+    page_size = max(1, min(page_size, BROWSE_MAX_PAGE_SIZE))
+    query, params = build_browse_query(sort, cursor, page_size, **filters)
+
+    try:
+        with db_manager.get_connection() as conn:
+            result = conn.execute(text(query), params)
+            rows = [dict(row) for row in result.mappings()]
+    except Exception as e:
+        logger.error(f"Failed to browse tickets: {e}")
+        raise
+
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    return {
+        'rows': rows,
+        'next_cursor': encode_cursor(sort, rows[-1]) if has_more else None
+    }
@@ -0,0 +1,228 @@
+"""
+Incremental analysis framework
+
+Each analysis stage (severity scoring, theming, ...) records a watermark and,
+per ticket, a hash of its input columns and of the stage parameters. A run
+only reads tickets changed since the watermark whose content hash changed or
+that were never processed; when the parameters change, the watermark is
+ignored and every ticket is revisited once.
+
+The watermark is a transaction id, not a timestamp: triggers stamp every
+ticket insert, and every update of a source column (TICKET_SOURCE_COLUMNS),
+with the writing transaction (tickets.change_txid), and a run records the
+oldest transaction still in progress when it started.
+Everything older had finished by then and was visible to the run, so a load
+that commits after a later one was processed is still picked up next time.
+Stage outputs do not count as changes, so stages read source columns only.
+
+Example:
+    class SeverityStage(AnalysisStage):
+        name = 'severity'
+        input_columns = ['text_content', 'original_priority']
+        output_columns = {'severity_score': 'INTEGER', 'severity_label': 'TEXT'}
+
+        def process(self, df):
+            ...  # return DataFrame with ticket_id + output columns
+
+    run_stage(db_manager, SeverityStage())
+"""
+import json
+import time
+import hashlib
+import logging
+
+from sqlalchemy import text
+
+from database.schema import TICKET_SOURCE_COLUMNS
+from utils.config import STREAM_YIELD_PER
+
+logger = logging.getLogger(__name__)
+
+
+class AnalysisStage:
+    """Base class for a stage that derives ticket columns from input columns"""
+
+    # Unique stage name, used as the key for watermarks and ticket state
+    name = None
+
+    # Ticket columns the stage reads (source columns only, see TICKET_SOURCE_COLUMNS);
+    # a change to any of them triggers reprocessing
+    input_columns = ['text_content']
+
+    # Derived ticket columns the stage writes, mapped to their SQL types
+    output_columns = {}
+
+    def params(self):
+        """Model parameters; changing them reprocesses every ticket"""
+        return {}
+
+    def params_hash(self):
+        payload = json.dumps(self.params(), sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def process(self, df):
+        """
+        Compute derived columns for a batch of tickets
+        df has ticket_id plus input_columns
+        Returns: DataFrame with ticket_id plus output_columns
+        """
+        raise NotImplementedError
+
+
+def _content_hash_sql(columns):
+    """SQL expression hashing the stage inputs (NULL-safe, column-separated)"""
+    parts = ", ".join(f"COALESCE(t.{col}::text, '')" for col in columns)
+    return f"md5(concat_ws(chr(31), {parts}))"
+
+
+def get_watermark(db_manager, stage_name):
+    """Returns: (watermark transaction id, params_hash) for a stage, or (None, None)"""
+    query = "SELECT watermark_txid, params_hash FROM stage_watermarks WHERE stage = :stage"
+    with db_manager.get_connection() as conn:
+        row = conn.execute(text(query), {'stage': stage_name}).fetchone()
+    return (row[0], row[1]) if row else (None, None)
+
+
+def set_watermark(db_manager, stage_name, watermark, params_hash):
+    query = """
+    INSERT INTO stage_watermarks (stage, watermark_txid, params_hash, updated_at)
+    VALUES (:stage, :watermark, :params_hash, CURRENT_TIMESTAMP)
+    ON CONFLICT (stage) DO UPDATE
+    SET watermark_txid = CASE
+            WHEN stage_watermarks.params_hash = EXCLUDED.params_hash
+            THEN GREATEST(stage_watermarks.watermark_txid, EXCLUDED.watermark_txid)
+            ELSE EXCLUDED.watermark_txid
+        END,
+        params_hash = EXCLUDED.params_hash,
+        updated_at = CURRENT_TIMESTAMP
+    """
+    with db_manager.get_connection() as conn:
+        conn.execute(
+            text(query),
+            {'stage': stage_name, 'watermark': watermark, 'params_hash': params_hash}
+        )
+        conn.commit()
+
+
+def snapshot_horizon(db_manager):
+    """
+    Oldest transaction still in progress; every ticket change by an older
+    transaction is committed (or rolled back) and visible to later snapshots
+    """
+    with db_manager.get_connection() as conn:
+        return conn.execute(text("SELECT txid_snapshot_xmin(txid_current_snapshot())")).scalar()
+
+
+def build_pending_query(stage, full_rescan):
+    """SELECT for tickets the stage has not seen in their current form"""
+    content_hash = _content_hash_sql(stage.input_columns)
+    inputs = ", ".join(f"t.{col}" for col in stage.input_columns)
+    watermark_filter = "" if full_rescan else "AND t.change_txid >= :since"
+
+    return f"""
+    SELECT t.ticket_id, {content_hash} AS content_hash, {inputs}
+    FROM tickets t
+    LEFT JOIN ticket_stage_state s
+           ON s.stage = :stage AND s.ticket_id = t.ticket_id
+    WHERE (s.ticket_id IS NULL
+           OR s.params_hash <> :params_hash
+           OR s.content_hash <> {content_hash})
+      {watermark_filter}
+    """
+
+
+def write_stage_results(conn, stage, results, hashes, params_hash):
+    """Batch-update derived columns and ticket state in one statement each"""
+    columns = list(stage.output_columns)
+    assignments = ", ".join(f"{col} = v.{col}" for col in columns)
+    record_type = ", ".join(
+        ["ticket_id TEXT"] + [f"{col} {sql_type}" for col, sql_type in stage.output_columns.items()]
+    )
+
+    update_query = f"""
+    UPDATE tickets t
+    SET {assignments},
+        processed_at = CURRENT_TIMESTAMP
+    FROM jsonb_to_recordset(CAST(:payload AS JSONB)) AS v({record_type})
+    WHERE t.ticket_id = v.ticket_id
+    """
+    conn.execute(
+        text(update_query),
+        {'payload': results[['ticket_id'] + columns].to_json(orient='records', date_format='iso')}
+    )
+
+    state_query = """
+    INSERT INTO ticket_stage_state (stage, ticket_id, content_hash, params_hash, processed_at)
+    SELECT :stage, v.ticket_id, v.content_hash, :params_hash, CURRENT_TIMESTAMP
+    FROM jsonb_to_recordset(CAST(:payload AS JSONB)) AS v(ticket_id TEXT, content_hash TEXT)
+    ON CONFLICT (stage, ticket_id) DO UPDATE
+    SET content_hash = EXCLUDED.content_hash,
+        params_hash = EXCLUDED.params_hash,
+        processed_at = EXCLUDED.processed_at
+    """
+    conn.execute(
+        text(state_query),
+        {'stage': stage.name, 'params_hash': params_hash, 'payload': hashes.to_json(orient='records')}
+    )
+
+
+def run_stage(db_manager, stage, batch_size=STREAM_YIELD_PER):
+    """
+    Process only new or changed tickets for a stage
+    Returns: dict with processed count, batches, full_rescan flag and elapsed seconds
+    """
+    if not stage.name:
+        raise ValueError("Analysis stage must define a name")
+    derived = [col for col in stage.input_columns if col not in TICKET_SOURCE_COLUMNS]
+    if derived:
+        raise ValueError(
+            f"Stage '{stage.name}' reads {derived}; changes to derived columns do not "
+            f"advance tickets.change_txid, so inputs must be among {TICKET_SOURCE_COLUMNS}"
+        )
+    db_manager.require_postgresql("Incremental analysis")
+
+    started = time.perf_counter()
+    params_hash = stage.params_hash()
+    watermark, stored_params_hash = get_watermark(db_manager, stage.name)
+    full_rescan = watermark is None or stored_params_hash != params_hash
+
+    # Taken before the scan, so every change older than it is visible to it;
+    # changes of transactions still running are at or past it and get read
+    # by the next run
+    horizon = snapshot_horizon(db_manager)
+
+    query = build_pending_query(stage, full_rescan)
+    query_params = {'stage': stage.name, 'params_hash': params_hash}
+    if not full_rescan:
+        query_params['since'] = watermark
+
+    processed, batches = 0, 0
+
+    try:
+        for batch in db_manager.stream_dataframes(query, query_params, yield_per=batch_size):
+            results = stage.process(batch[['ticket_id'] + stage.input_columns])
+            with db_manager.get_connection() as conn:
+                write_stage_results(
+                    conn, stage, results, batch[['ticket_id', 'content_hash']], params_hash
+                )
+                conn.commit()
+
+            processed += len(batch)
+            batches += 1
+
+        set_watermark(db_manager, stage.name, horizon, params_hash)
+    except Exception as e:
+        logger.error(f"Incremental stage '{stage.name}' failed: {e}")
+        raise
+
+    elapsed = time.perf_counter() - started
+    logger.info(
+        f"Stage '{stage.name}': processed {processed} tickets in {batches} batches "
+        f"({'full rescan' if full_rescan else 'incremental'}, {elapsed:.1f}s)"
+    )
+    return {
+        'processed': processed,
+        'batches': batches,
+        'full_rescan': full_rescan,
+        'elapsed_seconds': elapsed
+    }
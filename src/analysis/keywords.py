@@ -0,0 +1,279 @@
+"""
+Theme keywords with class-based TF-IDF (c-TF-IDF)
+
+The tickets of an upload are tokenized once into a sparse document-term
+matrix. One sparse product with a theme indicator matrix sums it into term
+counts for every theme at once, and terms are then weighted by how specific
+they are to their theme. The matrix is cached per upload, keyed by a hash of
+the ticket IDs and text hashes (computed in SQL), so extracting again with
+other parameters (top_n, document frequency limits, n-gram length) neither
+re-reads the texts nor re-tokenizes them. Large uploads drop terms below
+KEYWORD_MIN_DF when the matrix is built; the cache records that bound and
+is rebuilt only for a lower min_df. All other limits are applied at
+extraction time.
+"""
+import os
+import json
+import pickle
+import hashlib
+import logging
+
+import numpy as np
+from sqlalchemy import text
+
+from utils.config import (
+    THEME_MODEL_DIR,
+    KEYWORD_TOP_N,
+    KEYWORD_MAX_NGRAM,
+    KEYWORD_MIN_DF,
+    KEYWORD_MAX_DF,
+    KEYWORD_PRUNE_MIN_DOCS
+)
+
+logger = logging.getLogger(__name__)
+
+# Bump when tokenization changes so cached matrices are rebuilt
+TOKENIZER_VERSION = 3
+
+
+def build_term_matrix(texts, max_ngram=KEYWORD_MAX_NGRAM, min_df=1):
+    """
+    Count terms (1..max_ngram word n-grams) in every ticket, keeping terms
+    in at least min_df tickets; extract_keywords applies the other limits
+    Returns: dict with counts (csr, tickets x terms), terms, doc_freq, ngram_len
+    """
+    from sklearn.feature_extraction.text import CountVectorizer
+
+    vectorizer = CountVectorizer(
+        stop_words='english',
+        ngram_range=(1, max_ngram),
+        token_pattern=r"(?u)\b[a-zA-Z][a-zA-Z]+\b",
+        min_df=min_df,
+        dtype=np.int32
+    )
+    try:
+        counts = vectorizer.fit_transform(texts).tocsr()
+    except ValueError as e:
+        # Only stop words, numbers or too-rare terms: no keywords to find
+        if 'empty vocabulary' not in str(e):
+            raise
+        from scipy import sparse
+        return {
+            'counts': sparse.csr_matrix((len(texts), 0), dtype=np.int32),
+            'terms': np.array([], dtype=object),
+            'doc_freq': np.zeros(0, dtype=np.int64),
+            'ngram_len': np.zeros(0, dtype=np.int64)
+        }
+    terms = vectorizer.get_feature_names_out()
+    return {
+        'counts': counts,
+        'terms': terms,
+        'doc_freq': np.asarray((counts > 0).sum(axis=0)).ravel(),
+        'ngram_len': np.char.count(terms.astype(str), ' ') + 1
+    }
+
+
+def class_tfidf(counts, labels, n_classes):
+    """
+    c-TF-IDF weights for all classes at once
+    labels: class index per row of counts
+    Returns: csr matrix (classes x terms); term frequency within the class
+    times log(1 + average class size in words / term frequency over all classes)
+    """
+    from scipy import sparse
+
+    n_docs = counts.shape[0]
+    indicator = sparse.csr_matrix(
+        (np.ones(n_docs, dtype=np.float32), (labels, np.arange(n_docs))),
+        shape=(n_classes, n_docs)
+    )
+    class_counts = (indicator @ counts).astype(np.float32).tocsr()
+
+    class_sizes = np.asarray(class_counts.sum(axis=1)).ravel()
+    term_totals = np.asarray(class_counts.sum(axis=0)).ravel()
+    avg_size = class_sizes.mean() if n_classes else 0.0
+
+    idf = np.log1p(avg_size / np.maximum(term_totals, 1.0)).astype(np.float32)
+    tf = sparse.diags(1.0 / np.maximum(class_sizes, 1.0)).astype(np.float32) @ class_counts
+    return sparse.csr_matrix(tf.multiply(idf[np.newaxis, :]))
+
+
+def top_terms_per_class(scores, terms, top_n=KEYWORD_TOP_N):
+    """Returns: list (one per class) of the top_n terms by score, best first"""
+    keywords = []
+    for row in range(scores.shape[0]):
+        start, end = scores.indptr[row], scores.indptr[row + 1]
+        values, columns = scores.data[start:end], scores.indices[start:end]
+        if len(values) > top_n:
+            best = np.argpartition(-values, top_n)[:top_n]
+        else:
+            best = np.arange(len(values))
+        best = best[np.argsort(-values[best], kind='stable')]
+        keywords.append([str(terms[columns[i]]) for i in best if values[i] > 0])
+    return keywords
+
+
+def extract_keywords(matrix, labels, n_classes, top_n=KEYWORD_TOP_N, min_df=KEYWORD_MIN_DF,
+                     max_df=KEYWORD_MAX_DF, max_ngram=KEYWORD_MAX_NGRAM):
+    """
+    Top keywords per class from a cached term matrix (see build_term_matrix)
+    labels: class index per ticket, -1 for tickets without a class
+    max_df: share of tickets; terms in more tickets are dropped
+    Returns: list of keyword lists, indexed by class
+    """
+    labels = np.asarray(labels)
+    rows = np.flatnonzero(labels >= 0)
+    n_docs = matrix['counts'].shape[0]
+
+    keep = (
+        (matrix['doc_freq'] >= min_df)
+        & (matrix['doc_freq'] <= max(max_df * n_docs, 1))
+        & (matrix['ngram_len'] <= max_ngram)
+    )
+    columns = np.flatnonzero(keep)
+    if len(rows) == 0 or len(columns) == 0:
+        return [[] for _ in range(n_classes)]
+
+    counts = matrix['counts'][rows][:, columns]
+    scores = class_tfidf(counts, labels[rows], n_classes)
+    return top_terms_per_class(scores, matrix['terms'][columns], top_n)
+
+
+def _corpus_hash(rows, max_ngram):
+    digest = hashlib.sha256(f"{TOKENIZER_VERSION}:{max_ngram}".encode())
+    for ticket_id, _, text_hash in rows:
+        digest.update(f"{ticket_id}\x1f{text_hash}\x1e".encode())
+    return digest.hexdigest()
+
+
+def _cache_path(upload_id, cache_dir):
+    return os.path.join(cache_dir, f"keywords_dtm_upload_{upload_id}.pkl")
+
+
+def _build_min_df(n_docs, min_df):
+    """Document frequency bound applied when building a matrix for min_df"""
+    if n_docs < KEYWORD_PRUNE_MIN_DOCS:
+        return 1
+    return max(1, min(min_df, KEYWORD_MIN_DF))
+
+
+def load_term_matrix(db_manager, upload_id, max_ngram=KEYWORD_MAX_NGRAM, cache_dir=THEME_MODEL_DIR,
+                     min_df=KEYWORD_MIN_DF):
+    """
+    Document-term matrix of an upload's tickets, from the cache when the
+    tickets are unchanged and the cached matrix kept every term in min_df
+    or more tickets
+    Returns: (matrix dict, rows as (ticket_id, assigned_theme_id, text_hash), cache_hit)
+    """
+    rows = db_manager.execute_query(
+        """
+        SELECT ticket_id, assigned_theme_id, md5(text_content)
+        FROM tickets
+        WHERE upload_id = :upload_id
+        ORDER BY ticket_id
+        """,
+        {'upload_id': upload_id}
+    )
+    corpus_hash = _corpus_hash(rows, max_ngram)
+    path = _cache_path(upload_id, cache_dir)
+
+    if os.path.exists(path):
+        try:
+            with open(path, 'rb') as f:
+                cached = pickle.load(f)
+            if cached['corpus_hash'] == corpus_hash and cached['min_df'] <= min_df:
+                return cached['matrix'], rows, True
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable keyword matrix cache {path}: {e}")
+
+    # Cache miss: read texts together with the keys they are hashed under, so
+    # the matrix, its cache key and the returned rows describe the same tickets
+    # even if the upload changed since the lookup above
+    tickets = db_manager.execute_query(
+        """
+        SELECT ticket_id, assigned_theme_id, md5(text_content), text_content
+        FROM tickets
+        WHERE upload_id = :upload_id
+        ORDER BY ticket_id
+        """,
+        {'upload_id': upload_id}
+    )
+    rows = [tuple(ticket[:3]) for ticket in tickets]
+    corpus_hash = _corpus_hash(rows, max_ngram)
+    build_min_df = _build_min_df(len(tickets), min_df)
+    matrix = build_term_matrix([ticket[3] or "" for ticket in tickets], max_ngram, build_min_df)
+
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        pickle.dump({'corpus_hash': corpus_hash, 'min_df': build_min_df, 'matrix': matrix}, f)
+    os.replace(tmp_path, path)
+    logger.info(f"Built keyword matrix for upload {upload_id}: {matrix['counts'].shape}")
+    return matrix, rows, False
+
+
+def write_theme_keywords(db_manager, upload_id, keywords):
+    """
+    Write keywords for all themes of an upload in one statement
+    keywords: list of dicts with theme_id and keywords
+    """
+    db_manager.require_postgresql("Writing theme keywords")
+    query = """
+    UPDATE themes t
+    SET keywords = k.keywords
+    FROM jsonb_to_recordset(CAST(:payload AS JSONB)) AS k(
+        theme_id INTEGER,
+        keywords TEXT[]
+    )
+    WHERE t.upload_id = :upload_id
+      AND t.theme_id = k.theme_id
+    """
+    try:
+        with db_manager.get_connection() as conn:
+            result = conn.execute(text(query), {'upload_id': upload_id, 'payload': json.dumps(keywords)})
+            conn.commit()
+            logger.info(f"Updated keywords for {result.rowcount} themes of upload {upload_id}")
+            return result.rowcount
+    except Exception as e:
+        logger.error(f"Failed to write theme keywords: {e}")
+        raise
+
+
+def extract_upload_keywords(db_manager, upload_id, top_n=KEYWORD_TOP_N, min_df=KEYWORD_MIN_DF,
+                            max_df=KEYWORD_MAX_DF, max_ngram=KEYWORD_MAX_NGRAM,
+                            cache_dir=THEME_MODEL_DIR, write=True):
+    """
+    Compute keywords for every theme of an upload and store them in themes.keywords
+    max_ngram: up to KEYWORD_MAX_NGRAM without rebuilding the cached matrix
+    write: store the keywords (PostgreSQL only; extraction alone runs on any backend)
+    Returns: list of dicts with theme_id, theme_number, keywords
+    """
+    if write:
+        # Fail before tokenizing rather than after
+        db_manager.require_postgresql("Writing theme keywords")
+    themes = db_manager.execute_query(
+        "SELECT theme_id, theme_number FROM themes WHERE upload_id = :upload_id ORDER BY theme_number",
+        {'upload_id': upload_id}
+    )
+    if not themes:
+        return []
+
+    build_ngram = max(max_ngram, KEYWORD_MAX_NGRAM)
+    matrix, rows, cache_hit = load_term_matrix(db_manager, upload_id, build_ngram, cache_dir, min_df)
+
+    class_of_theme = {theme_id: i for i, (theme_id, _) in enumerate(themes)}
+    labels = np.array([class_of_theme.get(theme_id, -1) for _, theme_id, _ in rows], dtype=np.int64)
+
+    per_class = extract_keywords(matrix, labels, len(themes), top_n, min_df, max_df, max_ngram)
+    keywords = [
+        {'theme_id': theme_id, 'theme_number': theme_number, 'keywords': per_class[i]}
+        for i, (theme_id, theme_number) in enumerate(themes)
+    ]
+    logger.info(
+        f"Extracted keywords for {len(themes)} themes of upload {upload_id} "
+        f"({'cached' if cache_hit else 'new'} matrix)"
+    )
+
+    if write:
+        write_theme_keywords(db_manager, upload_id, keywords)
+    return keywords
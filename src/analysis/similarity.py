@@ -0,0 +1,515 @@
+"""
+Similar-ticket search using local embeddings
+
+Vectors are computed locally (TF-IDF + TruncatedSVD), stored as float16 in an
+append-only memory-mapped file keyed by ticket_id, and searched with a
+random-projection LSH index followed by an exact re-rank of the candidates.
+"""
+import os
+import json
+import uuid
+import pickle
+import logging
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+
+from utils.config import (
+    VECTOR_STORE_DIR,
+    EMBEDDING_DIM,
+    LSH_NUM_TABLES,
+    LSH_NUM_BITS
+)
+
+logger = logging.getLogger(__name__)
+
+
+class TicketEmbedder:
+    """Local TF-IDF + TruncatedSVD text embeddings (no network access)"""
+
+    def __init__(self, dim=EMBEDDING_DIM, max_features=50000):
+        self.dim = dim
+        self.max_features = max_features
+        self.vectorizer = None
+        self.svd = None
+
+    @property
+    def is_fitted(self):
+        return self.vectorizer is not None
+
+    def fit(self, texts):
+        """Fit the vocabulary and projection on a corpus of ticket texts"""
+        from sklearn.feature_extraction.text import TfidfVectorizer
+        from sklearn.decomposition import TruncatedSVD
+
+        self.vectorizer = TfidfVectorizer(
+            max_features=self.max_features,
+            stop_words='english',
+            sublinear_tf=True,
+            dtype=np.float32
+        )
+        tfidf = self.vectorizer.fit_transform(texts)
+
+        # SVD needs fewer components than features on small corpora
+        n_components = max(1, min(self.dim, tfidf.shape[1] - 1))
+        self.svd = TruncatedSVD(n_components=n_components, random_state=42)
+        self.svd.fit(tfidf)
+
+        logger.info(f"Fitted embedder on {tfidf.shape[0]} texts ({n_components} dims)")
+        return self
+
+    def transform(self, texts):
+        """
+        Embed texts
+        Returns: float32 array of shape (n, dim), L2-normalized
+        """
+        if not self.is_fitted:
+            raise ValueError("Embedder has not been fitted")
+
+        reduced = self.svd.transform(self.vectorizer.transform(texts))
+        vectors = np.zeros((reduced.shape[0], self.dim), dtype=np.float32)
+        vectors[:, :reduced.shape[1]] = reduced
+
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+    def save(self, path):
+        with open(path, 'wb') as f:
+            pickle.dump(self, f)
+
+    @staticmethod
+    def load(path):
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+
+
+class VectorStore:
+    """
+    Append-only float16 vector store with a random-projection LSH index
+
+    Files in the store directory:
+        vectors.f16     - raw float16 rows, memory-mapped for reads
+        signatures.u64  - one LSH bucket signature per row and table
+        ids.txt         - ticket_id for each row, in row order
+        planes.npy      - random hyperplanes used for hashing
+        meta.json       - dimensions and committed row count
+    """
+
+    def __init__(self, path=VECTOR_STORE_DIR, dim=EMBEDDING_DIM,
+                 n_tables=LSH_NUM_TABLES, n_bits=LSH_NUM_BITS):
+        if n_bits > 64:
+            raise ValueError("LSH signatures are limited to 64 bits")
+
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+
+        meta_path = os.path.join(path, 'meta.json')
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                self.meta = json.load(f)
+        else:
+            self.meta = {
+                'store_id': uuid.uuid4().hex,
+                'dim': dim,
+                'n_tables': n_tables,
+                'n_bits': n_bits,
+                'count': 0,
+                'ids_bytes': 0
+            }
+            rng = np.random.default_rng(42)
+            planes = rng.standard_normal((n_tables * n_bits, dim)).astype(np.float32)
+            np.save(os.path.join(path, 'planes.npy'), planes)
+            self._write_meta()
+
+        self._load_planes()
+        self._reset_cache()
+
+    @property
+    def dim(self):
+        return self.meta['dim']
+
+    @property
+    def n_tables(self):
+        return self.meta['n_tables']
+
+    @property
+    def n_bits(self):
+        return self.meta['n_bits']
+
+    def __len__(self):
+        return self.meta['count']
+
+    def _file(self, name):
+        return os.path.join(self.path, name)
+
+    def _write_meta(self):
+        tmp_path = self._file('meta.json.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(self.meta, f)
+        os.replace(tmp_path, self._file('meta.json'))
+
+    def _load_planes(self):
+        self.planes = np.load(self._file('planes.npy'))
+        self._bit_weights = (1 << np.arange(self.n_bits, dtype=np.uint64)).astype(np.uint64)
+
+    def refresh(self):
+        """
+        Pick up changes made by other processes since the store was opened
+        The id map and bucket index are kept while the store is unchanged.
+        Returns: True if the store changed
+        """
+        with open(self._file('meta.json')) as f:
+            meta = json.load(f)
+        if meta == self.meta:
+            return False
+        rebuilt = meta.get('store_id') != self.meta.get('store_id')
+        self.meta = meta
+        if rebuilt:
+            self._load_planes()
+        self._reset_cache()
+        return True
+
+    def _reset_cache(self):
+        self._vectors = None
+        self._signatures = None
+        self._sorted = None
+        self._ids = None
+        self._id_index = None
+
+    def _signature(self, vectors):
+        """Hash vectors into one uint64 bucket signature per table"""
+        bits = (vectors @ self.planes.T) > 0
+        bits = bits.reshape(len(vectors), self.n_tables, self.n_bits)
+        return (bits.astype(np.uint64) * self._bit_weights).sum(axis=2, dtype=np.uint64)
+
+    def append(self, ticket_ids, vectors):
+        """
+        Append vectors for new tickets; ids already in the store are skipped
+        Other processes may write the same store: hold store_write_lock.
+        Returns: number of rows added
+        """
+        ticket_ids = [str(t) for t in ticket_ids]
+        vectors = np.asarray(vectors, dtype=np.float32)
+
+        known = self.id_index()
+        keep = [i for i, t in enumerate(ticket_ids) if t not in known]
+        if not keep:
+            return 0
+
+        ticket_ids = [ticket_ids[i] for i in keep]
+        vectors = vectors[keep]
+        signatures = self._signature(vectors)
+
+        # Data files first, row count last: a crash mid-append leaves
+        # trailing bytes that are ignored until overwritten
+        count = len(self)
+        ids_bytes = self._truncate(count)
+        with open(self._file('vectors.f16'), 'ab') as f:
+            f.write(vectors.astype(np.float16).tobytes())
+        with open(self._file('signatures.u64'), 'ab') as f:
+            f.write(signatures.tobytes())
+        encoded_ids = ''.join(t + '\n' for t in ticket_ids).encode('utf-8')
+        with open(self._file('ids.txt'), 'ab') as f:
+            f.write(encoded_ids)
+
+        self.meta['count'] = count + len(ticket_ids)
+        self.meta['ids_bytes'] = ids_bytes + len(encoded_ids)
+        self._write_meta()
+
+        # Extend the id map in place; only the mapped arrays need reopening
+        if self._ids is not None:
+            self._ids.extend(ticket_ids)
+            self._id_index.update((t, count + i) for i, t in enumerate(ticket_ids))
+        self._vectors = None
+        self._signatures = None
+        self._sorted = None
+
+        logger.info(f"Appended {len(ticket_ids)} vectors (total {len(self)})")
+        return len(ticket_ids)
+
+    def _truncate(self, count):
+        """
+        Drop bytes past the committed row count left by an interrupted append
+        Returns: committed size of ids.txt in bytes
+        """
+        sizes = {
+            'vectors.f16': count * self.dim * 2,
+            'signatures.u64': count * self.n_tables * 8
+        }
+        for name, size in sizes.items():
+            path = self._file(name)
+            if os.path.exists(path) and os.path.getsize(path) > size:
+                with open(path, 'r+b') as f:
+                    f.truncate(size)
+
+        ids_path = self._file('ids.txt')
+        if not os.path.exists(ids_path):
+            return 0
+        ids_bytes = self.meta.get('ids_bytes')
+        if ids_bytes is None:
+            # Stores written before ids_bytes was tracked: find it once
+            with open(ids_path, 'rb') as f:
+                lines = f.read().split(b'\n')
+            ids_bytes = sum(len(line) + 1 for line in lines[:count])
+        if os.path.getsize(ids_path) > ids_bytes:
+            with open(ids_path, 'r+b') as f:
+                f.truncate(ids_bytes)
+        return ids_bytes
+
+    def vectors(self):
+        """Memory-mapped (count, dim) float16 array"""
+        if self._vectors is None:
+            self._vectors = np.memmap(
+                self._file('vectors.f16'), dtype=np.float16, mode='r',
+                shape=(len(self), self.dim)
+            )
+        return self._vectors
+
+    def ids(self):
+        if self._ids is None:
+            with open(self._file('ids.txt'), encoding='utf-8') as f:
+                self._ids = f.read().splitlines()[:len(self)]
+        return self._ids
+
+    def id_index(self):
+        """Map of ticket_id -> row number"""
+        if self._id_index is None:
+            if len(self) == 0:
+                self._ids = []
+                self._id_index = {}
+            else:
+                self._id_index = {t: i for i, t in enumerate(self.ids())}
+        return self._id_index
+
+    def _bucket_index(self):
+        """Per-table signatures sorted once, so bucket lookup is a binary search"""
+        if self._sorted is None:
+            self._signatures = np.memmap(
+                self._file('signatures.u64'), dtype=np.uint64, mode='r',
+                shape=(len(self), self.n_tables)
+            )
+            self._sorted = []
+            for t in range(self.n_tables):
+                column = np.asarray(self._signatures[:, t])
+                order = np.argsort(column, kind='stable').astype(np.int32)
+                self._sorted.append((column[order], order))
+        return self._sorted
+
+    def _candidates(self, signature, min_candidates):
+        """Rows sharing a bucket with the query, probing 1-bit neighbours if too few"""
+        index = self._bucket_index()
+        found = []
+
+        for t, (keys, order) in enumerate(index):
+            lo = np.searchsorted(keys, signature[t], side='left')
+            hi = np.searchsorted(keys, signature[t], side='right')
+            found.append(order[lo:hi])
+
+        candidates = np.unique(np.concatenate(found)) if found else np.array([], dtype=np.int64)
+        if len(candidates) >= min_candidates:
+            return candidates
+
+        # Multi-probe: also look in buckets one bit flip away
+        for t, (keys, order) in enumerate(index):
+            probes = signature[t] ^ self._bit_weights
+            lo = np.searchsorted(keys, probes, side='left')
+            hi = np.searchsorted(keys, probes, side='right')
+            for a, b in zip(lo, hi):
+                if b > a:
+                    found.append(order[a:b])
+
+        return np.unique(np.concatenate(found))
+
+    def search(self, vector, k=10, exclude=None):
+        """
+        Approximate top-k cosine neighbours of a query vector
+        Returns: list of (ticket_id, score) sorted by score
+        """
+        if len(self) == 0:
+            return []
+
+        query = np.asarray(vector, dtype=np.float32).reshape(1, -1)
+        signature = self._signature(query)[0]
+        candidates = self._candidates(signature, min_candidates=k * 4)
+
+        if exclude is not None:
+            row = self.id_index().get(str(exclude))
+            if row is not None:
+                candidates = candidates[candidates != row]
+        if len(candidates) == 0:
+            return []
+
+        scores = self.vectors()[candidates].astype(np.float32) @ query[0]
+        top = min(k, len(candidates))
+        best = np.argpartition(-scores, top - 1)[:top]
+        best = best[np.argsort(-scores[best])]
+
+        ids = self.ids()
+        return [(ids[candidates[i]], float(scores[i])) for i in best]
+
+    def similar_to(self, ticket_id, k=10):
+        """Top-k tickets most similar to an indexed ticket"""
+        row = self.id_index().get(str(ticket_id))
+        if row is None:
+            raise KeyError(f"Ticket {ticket_id} is not in the similarity index")
+        vector = self.vectors()[row].astype(np.float32)
+        return self.search(vector, k=k, exclude=ticket_id)
+
+
+@contextmanager
+def store_write_lock(store_dir=VECTOR_STORE_DIR):
+    """
+    Exclusive lock for writing a store, shared across processes (workers
+    append concurrently). The lock file sits next to the directory so
+    rebuild_index can replace the directory while holding it.
+    """
+    import fcntl
+
+    lock_path = os.path.abspath(store_dir).rstrip(os.sep) + '.lock'
+    os.makedirs(os.path.dirname(lock_path), exist_ok=True)
+    with open(lock_path, 'w') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+# Open stores per directory, shared by all sessions of the process
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_vector_store(store_dir=VECTOR_STORE_DIR):
+    """
+    Process-wide VectorStore for a directory. The id map and sorted LSH
+    buckets are built on first search and reused until rows are added.
+    """
+    with _stores_lock:
+        store = _stores.get(store_dir)
+        if store is None:
+            store = _stores[store_dir] = VectorStore(store_dir)
+        else:
+            store.refresh()
+        return store
+
+
+def _embedder_path(store_dir):
+    return os.path.join(store_dir, 'embedder.pkl')
+
+
+def _fetch_ticket_texts(db_manager, upload_id=None):
+    query = "SELECT ticket_id, text_content FROM tickets"
+    params = {}
+    if upload_id is not None:
+        query += " WHERE upload_id = :upload_id"
+        params['upload_id'] = upload_id
+    rows = db_manager.execute_query(query + " ORDER BY ticket_id", params)
+    return [r[0] for r in rows], [r[1] or "" for r in rows]
+
+
+def index_upload(db_manager, upload_id, store_dir=VECTOR_STORE_DIR, batch_size=10000):
+    """
+    Embed the tickets of one upload and append them to the similarity index.
+    The embedder is fitted on the first indexed upload and reused afterwards.
+    Returns: number of tickets added
+    """
+    try:
+        # Workers index concurrently; appends and the first fit must not interleave
+        with store_write_lock(store_dir):
+            os.makedirs(store_dir, exist_ok=True)
+            model_path = _embedder_path(store_dir)
+            if os.path.exists(model_path):
+                embedder = TicketEmbedder.load(model_path)
+            else:
+                # First upload: the whole upload is needed to fit the vocabulary
+                _, texts = _fetch_ticket_texts(db_manager, upload_id)
+                if not texts:
+                    return 0
+                embedder = TicketEmbedder().fit(texts)
+                embedder.save(model_path)
+                del texts
+
+            # Embed straight off a server-side cursor, one batch at a time
+            store = VectorStore(store_dir, dim=embedder.dim)
+            added = 0
+            query = """
+            SELECT ticket_id, COALESCE(text_content, '') AS text_content
+            FROM tickets
+            WHERE upload_id = :upload_id
+            """
+            for batch in db_manager.stream_dataframes(query, {'upload_id': upload_id}, yield_per=batch_size):
+                vectors = embedder.transform(batch['text_content'].tolist())
+                added += store.append(batch['ticket_id'].tolist(), vectors)
+
+            logger.info(f"Indexed {added} tickets from upload {upload_id}")
+            return added
+    except Exception as e:
+        logger.error(f"Failed to index upload {upload_id}: {e}")
+        raise
+
+
+def rebuild_index(db_manager, store_dir=VECTOR_STORE_DIR, batch_size=10000):
+    """Refit the embedder on all tickets and rebuild the index from scratch"""
+    import shutil
+
+    try:
+        with store_write_lock(store_dir):
+            ticket_ids, texts = _fetch_ticket_texts(db_manager)
+            if os.path.exists(store_dir):
+                shutil.rmtree(store_dir)
+            os.makedirs(store_dir)
+            with _stores_lock:
+                _stores.pop(store_dir, None)
+            if not ticket_ids:
+                return 0
+
+            embedder = TicketEmbedder().fit(texts)
+            embedder.save(_embedder_path(store_dir))
+
+            store = VectorStore(store_dir, dim=embedder.dim)
+            for start in range(0, len(texts), batch_size):
+                vectors = embedder.transform(texts[start:start + batch_size])
+                store.append(ticket_ids[start:start + batch_size], vectors)
+
+            logger.info(f"Rebuilt similarity index with {len(store)} tickets")
+            return len(store)
+    except Exception as e:
+        logger.error(f"Failed to rebuild similarity index: {e}")
+        raise
+
+
+def find_similar_tickets(db_manager, ticket_id, k=10, store_dir=VECTOR_STORE_DIR):
+    """
+    Find tickets similar to the given one
+    Returns: list of dicts with ticket details and similarity score
+    """
+    store = get_vector_store(store_dir)
+    matches = store.similar_to(ticket_id, k=k)
+    if not matches:
+        return []
+
+    scores = dict(matches)
+    query = """
+    SELECT ticket_id, created_at, text_content, product, channel, assigned_theme_name
+    FROM tickets
+    WHERE ticket_id = ANY(:ticket_ids)
+    """
+    rows = db_manager.execute_query(query, {'ticket_ids': list(scores)})
+
+    results = [
+        {
+            'ticket_id': row[0],
+            'created_at': row[1],
+            'text_content': row[2],
+            'product': row[3],
+            'channel': row[4],
+            'assigned_theme_name': row[5],
+            'similarity': scores[row[0]]
+        }
+        for row in rows
+    ]
+    results.sort(key=lambda r: r['similarity'], reverse=True)
+    return results
@@ -0,0 +1,287 @@
+"""
+Automatic choice of the number of themes
+
+Every candidate k in MIN_THEMES..MAX_THEMES is fitted in parallel with
+joblib on one shared sparse TF-IDF matrix (joblib memory-maps its arrays for
+the worker processes instead of copying them). All candidates start from a
+single k-means++ seeding computed once for MAX_THEMES: the first k seeds of a
+k-means++ run are themselves a valid k-means++ seeding, so no candidate
+repeats the expensive initialization. Candidates are scored on a sample with
+cosine silhouette and UMass topic coherence.
+
+Results are cached per upload. A repeat run on unchanged tickets is served
+from the cache; when tickets changed, the cached vocabulary and centroids are
+reused as warm starts for the new fits.
+"""
+import os
+import time
+import pickle
+import hashlib
+import logging
+
+import numpy as np
+
+from utils.config import (
+    MIN_THEMES,
+    MAX_THEMES,
+    THEME_MODEL_DIR,
+    THEME_SELECTION_JOBS,
+    THEME_SELECTION_SAMPLE_SIZE,
+    THEME_COHERENCE_TOP_TERMS,
+    THEME_COHERENCE_WEIGHT
+)
+
+logger = logging.getLogger(__name__)
+
+RANDOM_STATE = 42
+
+
+def build_features(texts, vectorizer=None, max_features=20000):
+    """
+    Sparse L2-normalized TF-IDF matrix shared by all candidate fits
+    vectorizer: previously fitted vectorizer to reuse (warm start)
+    Returns: (csr_matrix, vectorizer)
+    """
+    if vectorizer is None:
+        from sklearn.feature_extraction.text import TfidfVectorizer
+
+        vectorizer = TfidfVectorizer(
+            max_features=max_features,
+            stop_words='english',
+            sublinear_tf=True,
+            min_df=2 if len(texts) >= 100 else 1,
+            dtype=np.float32
+        )
+        X = vectorizer.fit_transform(texts)
+    else:
+        X = vectorizer.transform(texts)
+    return X.tocsr(), vectorizer
+
+
+def seed_centers(X, max_k, sample_idx):
+    """k-means++ seeds for max_k clusters, in selection order"""
+    from sklearn.cluster import kmeans_plusplus
+
+    centers, _ = kmeans_plusplus(X[sample_idx], n_clusters=max_k, random_state=RANDOM_STATE)
+    return np.asarray(centers.toarray() if hasattr(centers, 'toarray') else centers, dtype=np.float32)
+
+
+def top_terms(centers, n_terms=THEME_COHERENCE_TOP_TERMS):
+    """Indices of the highest-weighted terms of each centroid"""
+    return np.argsort(-centers, axis=1)[:, :n_terms]
+
+
+def umass_coherence(X_sample, term_indices):
+    """
+    Mean UMass coherence of the clusters' top terms on a document sample
+    Higher (closer to 0) is more coherent.
+    """
+    presence = (X_sample > 0).astype(np.float32).tocsc()
+    scores = []
+    for terms in term_indices:
+        B = presence[:, terms]
+        co = (B.T @ B).toarray()
+        doc_freq = np.diag(co)
+        pair_scores = [
+            np.log((co[i, j] + 1.0) / doc_freq[j])
+            for i in range(1, len(terms))
+            for j in range(i)
+            if doc_freq[j] > 0
+        ]
+        if pair_scores:
+            scores.append(np.mean(pair_scores))
+    return float(np.mean(scores)) if scores else float('-inf')
+
+
+def fit_candidate(X, k, init, sample_idx):
+    """
+    Fit and score one candidate (runs in a joblib worker)
+    Returns: dict with k, scores, centers, labels and timings
+    """
+    from sklearn.cluster import MiniBatchKMeans
+    from sklearn.metrics import silhouette_score
+
+    started = time.perf_counter()
+    model = MiniBatchKMeans(
+        n_clusters=k,
+        init=init,
+        n_init=1,
+        batch_size=4096,
+        random_state=RANDOM_STATE
+    )
+    labels = model.fit_predict(X)
+    fit_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    sample_labels = labels[sample_idx]
+    if len(np.unique(sample_labels)) > 1:
+        silhouette = float(silhouette_score(X[sample_idx], sample_labels, metric='cosine'))
+    else:
+        silhouette = -1.0
+    coherence = umass_coherence(X[sample_idx], top_terms(model.cluster_centers_))
+    score_seconds = time.perf_counter() - started
+
+    return {
+        'k': k,
+        'silhouette': silhouette,
+        'coherence': coherence,
+        'inertia': float(model.inertia_),
+        'centers': model.cluster_centers_.astype(np.float32),
+        'labels': labels.astype(np.int16),
+        'fit_seconds': fit_seconds,
+        'score_seconds': score_seconds
+    }
+
+
+def _normalize(values):
+    values = np.asarray(values, dtype=np.float64)
+    finite = np.isfinite(values)
+    if not finite.any():
+        return np.zeros_like(values)
+    low, high = values[finite].min(), values[finite].max()
+    scaled = (values - low) / (high - low) if high > low else np.ones_like(values)
+    return np.where(finite, scaled, 0.0)
+
+
+def rank_candidates(candidates, coherence_weight=THEME_COHERENCE_WEIGHT):
+    """Combined score: silhouette and coherence, each min-max scaled across candidates"""
+    silhouette = _normalize([c['silhouette'] for c in candidates])
+    coherence = _normalize([c['coherence'] for c in candidates])
+    scores = (1 - coherence_weight) * silhouette + coherence_weight * coherence
+    for candidate, score in zip(candidates, scores):
+        candidate['score'] = float(score)
+    return max(candidates, key=lambda c: (c['score'], -c['k']))
+
+
+def _texts_hash(texts, min_k, max_k):
+    digest = hashlib.sha256(f"{min_k}:{max_k}:{THEME_COHERENCE_WEIGHT}".encode())
+    for text in texts:
+        digest.update(text.encode('utf-8', 'replace'))
+        digest.update(b'\x1f')
+    return digest.hexdigest()
+
+
+def _cache_path(upload_id, model_dir):
+    return os.path.join(model_dir, f"theme_selection_upload_{upload_id}.pkl")
+
+
+def _load_cache(path):
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+    except Exception as e:
+        logger.warning(f"Ignoring unreadable theme selection cache {path}: {e}")
+        return None
+
+
+def _save_cache(path, entry):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        pickle.dump(entry, f)
+    os.replace(tmp_path, path)
+
+
+def select_num_themes(texts, min_k=MIN_THEMES, max_k=MAX_THEMES, n_jobs=THEME_SELECTION_JOBS,
+                      sample_size=THEME_SELECTION_SAMPLE_SIZE, warm_start=None):
+    """
+    Fit every k in [min_k, max_k] in parallel and pick the best
+    warm_start: {'vectorizer', 'centers': {k: array}} from a previous run
+    Returns: dict with best_k, labels, top_terms, candidates, timings, vectorizer, centers
+    """
+    from joblib import Parallel, delayed
+
+    texts = [t or "" for t in texts]
+    max_k = min(max_k, len(texts))
+    min_k = min(min_k, max_k)
+    if max_k < 2:
+        raise ValueError(f"Need at least 2 tickets to choose a theme count (got {len(texts)})")
+
+    timings = {}
+    started = time.perf_counter()
+    vectorizer = warm_start['vectorizer'] if warm_start else None
+    X, vectorizer = build_features(texts, vectorizer)
+    timings['features_seconds'] = time.perf_counter() - started
+
+    rng = np.random.default_rng(RANDOM_STATE)
+    n_sample = min(sample_size, X.shape[0])
+    sample_idx = np.sort(rng.choice(X.shape[0], size=n_sample, replace=False))
+
+    started = time.perf_counter()
+    previous = warm_start['centers'] if warm_start else {}
+    seeds = None
+    inits = {}
+    for k in range(min_k, max_k + 1):
+        if k in previous:
+            inits[k] = previous[k]
+        else:
+            if seeds is None:
+                seeds = seed_centers(X, max_k, sample_idx)
+            inits[k] = seeds[:k]
+    timings['seeding_seconds'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    candidates = Parallel(n_jobs=n_jobs, max_nbytes='1M')(
+        delayed(fit_candidate)(X, k, inits[k], sample_idx) for k in range(min_k, max_k + 1)
+    )
+    timings['parallel_seconds'] = time.perf_counter() - started
+    timings['serial_fit_seconds'] = sum(c['fit_seconds'] + c['score_seconds'] for c in candidates)
+    timings['speedup'] = timings['serial_fit_seconds'] / max(timings['parallel_seconds'], 1e-9)
+    timings['warm_started'] = sorted(k for k in inits if k in previous)
+
+    best = rank_candidates(candidates)
+    terms = np.asarray(vectorizer.get_feature_names_out())
+    result = {
+        'best_k': best['k'],
+        'labels': best['labels'],
+        'top_terms': [list(terms[idx]) for idx in top_terms(best['centers'])],
+        'candidates': [
+            {key: c[key] for key in ('k', 'silhouette', 'coherence', 'inertia', 'score',
+                                     'fit_seconds', 'score_seconds')}
+            for c in candidates
+        ],
+        'timings': timings,
+        'vectorizer': vectorizer,
+        'centers': {c['k']: c['centers'] for c in candidates}
+    }
+
+    logger.info(
+        f"Selected k={best['k']} from {len(candidates)} candidates in "
+        f"{timings['parallel_seconds']:.1f}s (serial {timings['serial_fit_seconds']:.1f}s, "
+        f"x{timings['speedup']:.1f})"
+    )
+    return result
+
+
+def select_themes_for_upload(db_manager, upload_id, min_k=MIN_THEMES, max_k=MAX_THEMES,
+                             model_dir=THEME_MODEL_DIR, n_jobs=THEME_SELECTION_JOBS):
+    """
+    Choose the theme count for an upload, using the per-upload model cache
+    Returns: selection dict (see select_num_themes) plus ticket_ids and cache_hit
+    """
+    rows = db_manager.execute_query(
+        "SELECT ticket_id, text_content FROM tickets WHERE upload_id = :upload_id ORDER BY ticket_id",
+        {'upload_id': upload_id}
+    )
+    ticket_ids = [r[0] for r in rows]
+    texts = [r[1] or "" for r in rows]
+
+    path = _cache_path(upload_id, model_dir)
+    cached = _load_cache(path)
+    texts_hash = _texts_hash(texts, min_k, max_k)
+
+    if cached and cached['texts_hash'] == texts_hash:
+        logger.info(f"Theme selection for upload {upload_id} served from cache (k={cached['result']['best_k']})")
+        result = dict(cached['result'])
+        result['timings'] = dict(result['timings'], cached=True)
+        return dict(result, ticket_ids=ticket_ids, cache_hit=True)
+
+    warm_start = None
+    if cached:
+        warm_start = {'vectorizer': cached['result']['vectorizer'], 'centers': cached['result']['centers']}
+
+    result = select_num_themes(texts, min_k, max_k, n_jobs=n_jobs, warm_start=warm_start)
+    _save_cache(path, {'texts_hash': texts_hash, 'result': result})
+    return dict(result, ticket_ids=ticket_ids, cache_hit=False)
@@ -0,0 +1,193 @@
+"""
+Theme trend engine: growth rates and moving averages per theme
+
+Daily ticket counts are kept per (theme, day, upload) in theme_daily_counts.
+Themes are identified by name, so a theme's series spans every upload that
+contains it; buckets are built from the names on the tickets, so trends run
+after labeling (a relabeled upload is picked up by refreshing it again).
+Buckets outlive archiving, so archived uploads still count towards trends.
+Processing an upload only rewrites that upload's buckets and then recomputes
+metrics for the themes it touched over a fixed window, so the cost does not
+depend on how many tickets are already in the database.
+"""
+import json
+import logging
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+from utils.config import TREND_WINDOW_WEEKS, TREND_MOVING_AVG_DAYS
+
+logger = logging.getLogger(__name__)
+
+
+def refresh_daily_counts(conn, upload_id):
+    """
+    Rebuild the daily buckets contributed by one upload (idempotent)
+    The tickets of archived uploads are no longer in the table, so their
+    buckets are kept as they are
+    Returns: list of affected theme names
+    """
+    archived = conn.execute(
+        text("SELECT archived_at IS NOT NULL FROM uploads WHERE upload_id = :upload_id"),
+        {'upload_id': upload_id}
+    ).scalar()
+    if archived:
+        result = conn.execute(
+            text("SELECT DISTINCT theme_name FROM theme_daily_counts WHERE upload_id = :upload_id"),
+            {'upload_id': upload_id}
+        )
+        return sorted(row[0] for row in result)
+
+    conn.execute(
+        text("DELETE FROM theme_daily_counts WHERE upload_id = :upload_id"),
+        {'upload_id': upload_id}
+    )
+
+    query = """
+    INSERT INTO theme_daily_counts
+        (theme_name, bucket_date, upload_id, ticket_count, severity_sum, severity_count)
+    SELECT assigned_theme_name,
+           created_date,
+           upload_id,
+           COUNT(*),
+           COALESCE(SUM(severity_score), 0),
+           COUNT(severity_score)
+    FROM tickets
+    WHERE upload_id = :upload_id
+      AND assigned_theme_name IS NOT NULL
+    GROUP BY assigned_theme_name, created_date, upload_id
+    RETURNING theme_name
+    """
+    result = conn.execute(text(query), {'upload_id': upload_id})
+    return sorted({row[0] for row in result})
+
+
+def compute_trend_metrics(counts, ma_days=TREND_MOVING_AVG_DAYS):
+    """
+    Vectorized trend metrics for a (n_themes, n_days) matrix of daily counts.
+    The last column is the most recent day; n_days must be a multiple of 7.
+    Returns: dict of 1-D arrays (one value per theme)
+    """
+    n_themes, n_days = counts.shape
+    weekly = counts.reshape(n_themes, n_days // 7, 7).sum(axis=2)
+
+    this_week = weekly[:, -1]
+    last_week = weekly[:, -2] if weekly.shape[1] > 1 else np.zeros(n_themes)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        growth_rate = np.where(last_week > 0, (this_week - last_week) / last_week, np.nan)
+
+    # Trailing moving average of the daily series via cumulative sums
+    cumulative = np.cumsum(counts, axis=1)
+    window_total = cumulative[:, -1] - (cumulative[:, -ma_days - 1] if n_days > ma_days else 0)
+    moving_avg = window_total / min(ma_days, n_days)
+
+    return {
+        'weekly_count': this_week.astype(np.int64),
+        'wow_delta': (this_week - last_week).astype(np.int64),
+        'growth_rate': growth_rate,
+        'moving_avg_daily': moving_avg
+    }
+
+
+def _load_window(conn, theme_names, start_date, end_date):
+    """Daily counts of the themes across all uploads"""
+    query = """
+    SELECT theme_name, bucket_date, SUM(ticket_count)
+    FROM theme_daily_counts
+    WHERE theme_name = ANY(:theme_names)
+      AND bucket_date BETWEEN :start_date AND :end_date
+    GROUP BY theme_name, bucket_date
+    """
+    rows = conn.execute(
+        text(query),
+        {'theme_names': theme_names, 'start_date': start_date, 'end_date': end_date}
+    ).fetchall()
+    return pd.DataFrame(rows, columns=['theme_name', 'bucket_date', 'ticket_count'])
+
+
+def _load_avg_severity(conn, theme_names):
+    query = """
+    SELECT theme_name, SUM(severity_sum) / NULLIF(SUM(severity_count), 0)
+    FROM theme_daily_counts
+    WHERE theme_name = ANY(:theme_names)
+    GROUP BY theme_name
+    """
+    return dict(conn.execute(text(query), {'theme_names': theme_names}).fetchall())
+
+
+def write_theme_metrics(conn, upload_id, metrics):
+    """Write metrics for all themes of an upload back to the themes table in one statement"""
+    query = """
+    UPDATE themes t
+    SET growth_rate = m.growth_rate,
+        avg_severity = m.avg_severity,
+        weekly_count = m.weekly_count,
+        wow_delta = m.wow_delta,
+        moving_avg_daily = m.moving_avg_daily,
+        trend_updated_at = CURRENT_TIMESTAMP
+    FROM jsonb_to_recordset(CAST(:payload AS JSONB)) AS m(
+        theme_name TEXT,
+        growth_rate FLOAT,
+        avg_severity FLOAT,
+        weekly_count INTEGER,
+        wow_delta INTEGER,
+        moving_avg_daily FLOAT
+    )
+    WHERE t.upload_id = :upload_id
+      AND t.theme_name = m.theme_name
+    """
+    # NaN is not valid JSON; missing metrics become NULL
+    records = metrics.astype(object).where(metrics.notna(), None).to_dict('records')
+    result = conn.execute(text(query), {'upload_id': upload_id, 'payload': json.dumps(records)})
+    return result.rowcount
+
+
+def update_theme_trends(db_manager, upload_id, window_weeks=TREND_WINDOW_WEEKS):
+    """
+    Refresh trend metrics for the themes of an upload
+    Returns: DataFrame of metrics per theme (theme_name plus metric columns)
+    """
+    db_manager.require_postgresql("Theme trends")
+    try:
+        with db_manager.get_connection() as conn:
+            themes = refresh_daily_counts(conn, upload_id)
+            if not themes:
+                conn.commit()
+                logger.info(f"No themed tickets in upload {upload_id}; trends unchanged")
+                return pd.DataFrame()
+
+            # Window ends at the latest day seen for these themes, not "now",
+            # so historical uploads still get meaningful trends
+            end_date = conn.execute(
+                text("SELECT MAX(bucket_date) FROM theme_daily_counts WHERE upload_id = :upload_id"),
+                {'upload_id': upload_id}
+            ).scalar()
+            n_days = window_weeks * 7
+            start_date = end_date - timedelta(days=n_days - 1)
+
+            window = _load_window(conn, themes, start_date, end_date)
+            theme_index = {name: i for i, name in enumerate(themes)}
+
+            counts = np.zeros((len(themes), n_days), dtype=np.float64)
+            if not window.empty:
+                rows = window['theme_name'].map(theme_index).to_numpy()
+                days = (pd.to_datetime(window['bucket_date']) - pd.Timestamp(start_date)).dt.days.to_numpy()
+                np.add.at(counts, (rows, days), window['ticket_count'].to_numpy(dtype=np.float64))
+
+            metrics = pd.DataFrame(compute_trend_metrics(counts))
+            metrics.insert(0, 'theme_name', themes)
+            avg_severity = _load_avg_severity(conn, themes)
+            metrics['avg_severity'] = metrics['theme_name'].map(avg_severity).astype(float)
+
+            updated = write_theme_metrics(conn, upload_id, metrics)
+            conn.commit()
+
+        logger.info(f"Updated trends for {len(themes)} themes ({updated} theme rows) from upload {upload_id}")
+        return metrics
+    except Exception as e:
+        logger.error(f"Failed to update theme trends: {e}")
+        raise
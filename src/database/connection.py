@@ -1,12 +1,40 @@
 """
 Database connection manager for PostgreSQL
+
+DATABASE_URL may also point at an embedded DuckDB file
+(duckdb:///data/cx_insights.duckdb, or duckdb:///:memory:) for single-node
+deployments and CI; install requirements-duckdb.txt for it. DuckDB runs the
+same schema (translated by schema.py), the dashboard queries, uploads
+(processed in the app process, see etl/jobs.py: a separate worker cannot
+open a DuckDB file the app holds) and exports. The background worker and
+the analysis writers (theme trends, anomalies, keywords, labels,
+incremental stages), which use jsonb_to_recordset, row locking and
+transaction ids, need PostgreSQL and raise UnsupportedBackendError on
+DuckDB (see DatabaseManager.require_postgresql).
 """
 import os
+import time
+import threading
+import importlib.util
 from sqlalchemy import create_engine, text
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
 from dotenv import load_dotenv
 import logging
 
+from utils.config import (
+    STREAM_YIELD_PER,
+    DB_POOL_SIZE,
+    DB_MAX_OVERFLOW,
+    DB_POOL_TIMEOUT,
+    DB_POOL_RECYCLE
+)
+from utils.lazy import lazy_import
+
+# Only needed by the streaming readers; keep them off the startup path
+pd = lazy_import('pandas')
+pa = lazy_import('pyarrow')
+
 # Load environment variables
 load_dotenv()
 
@@ -15,34 +43,133 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
+class UnsupportedBackendError(RuntimeError):
+    """A PostgreSQL-only feature was used with another backend"""
+
+
 class DatabaseManager:
     """Manages PostgreSQL database connections"""
     
-    def __init__(self):
-        self.database_url = os.getenv('DATABASE_URL')
+    def __init__(self, pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW,
+                 pool_timeout=DB_POOL_TIMEOUT, pool_recycle=DB_POOL_RECYCLE, database_url=None):
+        self.database_url = database_url or os.getenv('DATABASE_URL')
         if not self.database_url:
             raise ValueError("DATABASE_URL not found in environment variables")
+        self.dialect = 'duckdb' if self.database_url.startswith('duckdb') else 'postgresql'
         
-        # Create engine
-        self.engine = create_engine(
-            self.database_url,
-            pool_size=5,
-            max_overflow=10,
-            pool_pre_ping=True  # Verify connections before using
-        )
+        self.pool_size = pool_size
+        self.max_overflow = max_overflow
+        self.pool_timeout = pool_timeout
+        self.pool_recycle = pool_recycle
         
-        # Create session factory
-        self.SessionLocal = sessionmaker(
-            autocommit=False,
-            autoflush=False,
-            bind=self.engine
-        )
+        # Engine and session factory are created on first use, so importing
+        # a page or building the manager never blocks on the database
+        self._engine = None
+        self._session_factory = None
         
-        logger.info("Database connection initialized")
+        # Seconds spent waiting for a pooled connection, recorded only
+        # while pool metrics are enabled (load tests)
+        self._pool_waits = None
+        self._pool_waits_lock = threading.Lock()
+    
+    @property
+    def engine(self):
+        """SQLAlchemy engine, created on first access"""
+        if self._engine is None:
+            if self.dialect == 'duckdb':
+                self._engine = self._create_duckdb_engine()
+            else:
+                self._engine = create_engine(
+                    self.database_url,
+                    pool_size=self.pool_size,
+                    max_overflow=self.max_overflow,
+                    pool_timeout=self.pool_timeout,
+                    pool_recycle=self.pool_recycle,
+                    pool_pre_ping=True  # Verify connections before using
+                )
+                logger.info(
+                    f"Database connection initialized (pool_size={self.pool_size}, "
+                    f"max_overflow={self.max_overflow})"
+                )
+        return self._engine
+    
+    def _create_duckdb_engine(self):
+        """Embedded DuckDB engine (needs the duckdb and duckdb-engine packages)"""
+        if importlib.util.find_spec('duckdb_engine') is None:
+            raise ImportError(
+                "DATABASE_URL points at DuckDB but duckdb-engine is not installed "
+                "(pip install -r requirements-duckdb.txt)"
+            )
+        
+        path = self.database_url.split(':///', 1)[-1]
+        if path and path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            engine = create_engine(self.database_url)
+        else:
+            # Every new connection to :memory: is a separate empty database,
+            # so all sessions share one connection
+            engine = create_engine(self.database_url, poolclass=StaticPool)
+        logger.info(f"Embedded DuckDB database initialized ({path or ':memory:'})")
+        return engine
+    
+    @property
+    def SessionLocal(self):
+        """Session factory, created on first access"""
+        if self._session_factory is None:
+            self._session_factory = sessionmaker(
+                autocommit=False,
+                autoflush=False,
+                bind=self.engine
+            )
+        return self._session_factory
     
     def get_connection(self):
         """Get a raw database connection"""
-        return self.engine.connect()
+        if self._pool_waits is None:
+            return self.engine.connect()
+        
+        started = time.perf_counter()
+        conn = self.engine.connect()
+        with self._pool_waits_lock:
+            self._pool_waits.append(time.perf_counter() - started)
+        return conn
+    
+    def enable_pool_metrics(self):
+        """Start recording how long each connection checkout waits"""
+        with self._pool_waits_lock:
+            self._pool_waits = []
+    
+    def drain_pool_waits(self):
+        """Returns: checkout wait times (seconds) recorded since the last call"""
+        with self._pool_waits_lock:
+            waits = self._pool_waits or []
+            if self._pool_waits is not None:
+                self._pool_waits = []
+        return waits
+    
+    def pool_status(self):
+        """
+        Current pool occupancy
+        Returns: dict, or None for pools without occupancy counters (the
+                 StaticPool of an in-memory DuckDB database)
+        """
+        pool = self.engine.pool
+        if not hasattr(pool, 'checkedout'):
+            return None
+        return {
+            'pool_size': pool.size(),
+            'checked_out': pool.checkedout(),
+            'checked_in': pool.checkedin(),
+            'overflow': max(pool.overflow(), 0),
+            'max_overflow': self.max_overflow
+        }
+    
+    def require_postgresql(self, feature):
+        """Fail fast when a PostgreSQL-only feature runs against DuckDB"""
+        if self.dialect != 'postgresql':
+            raise UnsupportedBackendError(
+                f"{feature} needs PostgreSQL; DATABASE_URL points at {self.dialect}"
+            )
     
     def get_session(self):
         """Get a SQLAlchemy session"""
@@ -51,7 +178,7 @@ class DatabaseManager:
     def test_connection(self):
         """Test database connection"""
         try:
-            with self.engine.connect() as conn:
+            with self.get_connection() as conn:
                 result = conn.execute(text("SELECT 1"))
                 logger.info("✅ Database connection successful!")
                 return True
@@ -62,17 +189,56 @@ class DatabaseManager:
     def execute_query(self, query, params=None):
         """Execute a SQL query and return results"""
         try:
-            with self.engine.connect() as conn:
+            with self.get_connection() as conn:
                 result = conn.execute(text(query), params or {})
                 return result.fetchall()
         except Exception as e:
             logger.error(f"Query execution failed: {e}")
             raise
     
+    def _stream_partitions(self, query, params=None, yield_per=STREAM_YIELD_PER):
+        """
+        Run a query on a server-side cursor
+        Yields: (column_names, list_of_rows) for each batch of up to yield_per rows
+        """
+        with self.get_connection() as conn:
+            result = conn.execution_options(
+                stream_results=True,
+                yield_per=yield_per
+            ).execute(text(query), params or {})
+            columns = list(result.keys())
+            for partition in result.partitions(yield_per):
+                yield columns, partition
+    
+    def stream_rows(self, query, params=None, yield_per=STREAM_YIELD_PER):
+        """Yield result rows one at a time without materializing the result"""
+        for _, partition in self._stream_partitions(query, params, yield_per):
+            yield from partition
+    
+    def stream_dataframes(self, query, params=None, yield_per=STREAM_YIELD_PER):
+        """Yield the result as DataFrame chunks of up to yield_per rows"""
+        for columns, partition in self._stream_partitions(query, params, yield_per):
+            yield pd.DataFrame.from_records(partition, columns=columns)
+    
+    def stream_record_batches(self, query, params=None, yield_per=STREAM_YIELD_PER, schema=None):
+        """Yield the result as pyarrow RecordBatches of up to yield_per rows"""
+        for columns, partition in self._stream_partitions(query, params, yield_per):
+            arrays = [list(col) for col in zip(*partition)]
+            if schema is not None:
+                yield pa.RecordBatch.from_arrays(
+                    [pa.array(a, type=schema.field(c).type) for a, c in zip(arrays, columns)],
+                    schema=schema
+                )
+            else:
+                yield pa.RecordBatch.from_arrays([pa.array(a) for a in arrays], names=columns)
+    
     def close(self):
         """Close database connections"""
-        self.engine.dispose()
-        logger.info("Database connections closed")
+        if self._engine is not None:
+            self._engine.dispose()
+            self._engine = None
+            self._session_factory = None
+            logger.info("Database connections closed")
 
 
 # Global database instance
@@ -0,0 +1,104 @@
+"""
+Connection pool sizing from load-test measurements
+
+The number of connections a process needs is its query throughput times the
+time each query holds a connection (Little's law). Load tests measure both,
+plus how many connections were actually checked out and how long checkouts
+waited, and recommend_pool_settings turns that into DB_POOL_SIZE /
+DB_MAX_OVERFLOW values.
+"""
+import math
+
+import numpy as np
+
+from utils.config import DB_POOL_TARGET_WAIT_MS
+
+# Connections PostgreSQL keeps for superusers/maintenance by default
+RESERVED_CONNECTIONS = 3
+
+
+def summarize(samples, scale=1000.0):
+    """
+    Percentiles of a list of durations in seconds
+    Returns: dict in milliseconds (scale=1000)
+    """
+    if not len(samples):
+        return {'count': 0, 'mean': 0.0, 'p50': 0.0, 'p95': 0.0, 'p99': 0.0, 'max': 0.0}
+    values = np.asarray(samples, dtype=np.float64) * scale
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {
+        'count': int(len(values)),
+        'mean': float(values.mean()),
+        'p50': float(p50),
+        'p95': float(p95),
+        'p99': float(p99),
+        'max': float(values.max())
+    }
+
+
+def estimate_connections(queries_per_second, mean_hold_seconds):
+    """Average number of connections busy at once (Little's law)"""
+    return queries_per_second * mean_hold_seconds
+
+
+def recommend_pool_settings(throughput_qps, mean_hold_seconds, in_use_samples,
+                            wait_p95_ms, pool_size, max_overflow,
+                            target_wait_ms=DB_POOL_TARGET_WAIT_MS,
+                            processes=1, max_connections=None):
+    """
+    Recommend pool settings for one app process
+    throughput_qps: queries per second observed in the load test
+    mean_hold_seconds: average time a query held its connection
+    in_use_samples: checked-out connection counts sampled during the test
+    wait_p95_ms: 95th percentile checkout wait observed
+    pool_size, max_overflow: settings the test ran with
+    processes: app processes sharing the database
+    max_connections: PostgreSQL max_connections, to cap the total
+    Returns: dict with pool_size, max_overflow, saturated flag and reasoning
+    """
+    average = estimate_connections(throughput_qps, mean_hold_seconds)
+    in_use = np.asarray(in_use_samples if len(in_use_samples) else [0], dtype=np.float64)
+    observed_p95 = float(np.percentile(in_use, 95))
+    observed_peak = float(in_use.max())
+    limit = pool_size + max_overflow
+
+    # A pool that ran at its limit while callers waited hid the real demand:
+    # the measured concurrency is a lower bound, so size up and re-test
+    saturated = observed_peak >= limit and wait_p95_ms > target_wait_ms
+    notes = []
+
+    if saturated:
+        recommended_size = max(limit, math.ceil(observed_p95 * 1.5))
+        recommended_overflow = max(max_overflow, recommended_size // 2)
+        notes.append(
+            f"Pool was exhausted ({observed_peak:.0f}/{limit} connections in use, "
+            f"p95 wait {wait_p95_ms:.0f} ms); demand is higher than measured, re-run with these settings"
+        )
+    else:
+        # Steady state covers the p95 concurrency; overflow absorbs bursts up to the peak
+        recommended_size = max(1, math.ceil(max(observed_p95, average)))
+        recommended_overflow = max(2, math.ceil(observed_peak) - recommended_size)
+        notes.append(
+            f"p95 concurrency {observed_p95:.1f}, peak {observed_peak:.0f}, "
+            f"Little's law average {average:.1f} connections"
+        )
+
+    if max_connections:
+        budget = max(1, (max_connections - RESERVED_CONNECTIONS) // max(processes, 1))
+        if recommended_size + recommended_overflow > budget:
+            recommended_size = min(recommended_size, budget)
+            recommended_overflow = max(0, budget - recommended_size)
+            notes.append(
+                f"Capped to {budget} connections per process "
+                f"(max_connections={max_connections}, {processes} processes)"
+            )
+
+    return {
+        'pool_size': int(recommended_size),
+        'max_overflow': int(recommended_overflow),
+        'saturated': bool(saturated),
+        'average_in_use': float(average),
+        'p95_in_use': observed_p95,
+        'peak_in_use': observed_peak,
+        'notes': notes
+    }
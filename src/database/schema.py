@@ -1,14 +1,27 @@
 """
 Database schema creation and management
 """
+import re
 from sqlalchemy import text
 import logging
 
+from utils.config import HIGH_SEVERITY_THRESHOLD, TICKET_ID_BLOCK_SIZE
+
 logger = logging.getLogger(__name__)
 
+# Ticket columns that come from the uploaded file; only changes to these
+# re-open a ticket for the incremental stages (see analysis/incremental.py)
+TICKET_SOURCE_COLUMNS = [
+    'created_at', 'text_content', 'product', 'channel',
+    'original_priority', 'customer_tier', 'customer_id'
+]
+
+# Partial index behind the high-severity queue (checked by scripts/check_query_plans.py)
+HIGH_SEVERITY_INDEX = 'idx_triage_high_severity'
+
 
 # SQL Schema
-SCHEMA_SQL = """
+SCHEMA_SQL = f"""
 -- ============================================================================
 -- CX INSIGHTS LAB - POSTGRESQL SCHEMA
 -- ============================================================================
@@ -100,14 +113,262 @@ CREATE TABLE IF NOT EXISTS analysis_cache (
 
 CREATE INDEX IF NOT EXISTS idx_cache_upload ON analysis_cache(upload_id);
 CREATE INDEX IF NOT EXISTS idx_cache_type ON analysis_cache(result_type);
+
+-- Upload processing status (maintained by background workers)
+ALTER TABLE uploads ADD COLUMN IF NOT EXISTS status VARCHAR(20) DEFAULT 'pending';
+ALTER TABLE uploads ADD COLUMN IF NOT EXISTS progress FLOAT DEFAULT 0;
+ALTER TABLE uploads ADD COLUMN IF NOT EXISTS error_message TEXT;
+ALTER TABLE uploads ADD COLUMN IF NOT EXISTS profile JSONB;
+-- Bytes per column at each load stage (raw, transformed, database)
+ALTER TABLE uploads ADD COLUMN IF NOT EXISTS memory_report JSONB;
+
+-- Table 5: jobs (work queue, claimed with FOR UPDATE SKIP LOCKED)
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id SERIAL PRIMARY KEY,
+    job_type VARCHAR(50) NOT NULL,
+    upload_id INTEGER REFERENCES uploads(upload_id) ON DELETE CASCADE,
+    payload JSONB,
+    status VARCHAR(20) NOT NULL DEFAULT 'queued',
+    attempts INTEGER DEFAULT 0,
+    worker_id VARCHAR(100),
+    error_message TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    started_at TIMESTAMP,
+    finished_at TIMESTAMP,
+    -- Refreshed by the worker while a job runs; stale heartbeats get requeued
+    heartbeat_at TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_jobs_queued ON jobs(created_at) WHERE status = 'queued';
+CREATE INDEX IF NOT EXISTS idx_jobs_upload ON jobs(upload_id);
+
+-- Table 6: theme_daily_counts (each upload's contribution to a theme/day bucket;
+-- keyed on the theme name, so a theme's series spans uploads)
+CREATE TABLE IF NOT EXISTS theme_daily_counts (
+    theme_name VARCHAR(200) NOT NULL,
+    bucket_date DATE NOT NULL,
+    upload_id INTEGER REFERENCES uploads(upload_id) ON DELETE CASCADE,
+    ticket_count INTEGER NOT NULL DEFAULT 0,
+    severity_sum FLOAT DEFAULT 0,
+    severity_count INTEGER DEFAULT 0,
+    PRIMARY KEY (theme_name, bucket_date, upload_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_theme_daily_upload ON theme_daily_counts(upload_id);
+
+-- Trend metrics maintained by the trend engine
+ALTER TABLE themes ADD COLUMN IF NOT EXISTS weekly_count INTEGER;
+ALTER TABLE themes ADD COLUMN IF NOT EXISTS wow_delta INTEGER;
+ALTER TABLE themes ADD COLUMN IF NOT EXISTS moving_avg_daily FLOAT;
+ALTER TABLE themes ADD COLUMN IF NOT EXISTS trend_updated_at TIMESTAMP;
+
+-- Table 7: stage_watermarks (incremental analysis progress per stage)
+CREATE TABLE IF NOT EXISTS stage_watermarks (
+    stage VARCHAR(100) PRIMARY KEY,
+    watermark_txid BIGINT,
+    params_hash VARCHAR(64),
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Table 8: ticket_stage_state (what each ticket looked like when a stage last ran)
+CREATE TABLE IF NOT EXISTS ticket_stage_state (
+    stage VARCHAR(100) NOT NULL,
+    ticket_id VARCHAR(100) REFERENCES tickets(ticket_id) ON DELETE CASCADE,
+    content_hash VARCHAR(32) NOT NULL,
+    params_hash VARCHAR(64) NOT NULL,
+    processed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (stage, ticket_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_tickets_last_updated ON tickets(last_updated);
+
+-- Change tracking for incremental stages (stamped by the triggers in
+-- CHANGE_TRACKING_SQL below)
+ALTER TABLE tickets ADD COLUMN IF NOT EXISTS change_txid BIGINT;
+CREATE INDEX IF NOT EXISTS idx_tickets_change_txid ON tickets(change_txid);
+
+-- Cold storage: tickets of archived uploads live in Parquet under archive_path
+ALTER TABLE uploads ADD COLUMN IF NOT EXISTS archived_at TIMESTAMP;
+ALTER TABLE uploads ADD COLUMN IF NOT EXISTS archive_path TEXT;
+ALTER TABLE uploads ADD COLUMN IF NOT EXISTS archived_rows INTEGER;
+
+-- Generated ticket IDs: each nextval reserves a block of TICKET_ID_BLOCK_SIZE numbers
+CREATE SEQUENCE IF NOT EXISTS ticket_id_seq START WITH 1 INCREMENT BY {TICKET_ID_BLOCK_SIZE};
+
+-- Table 9: volume_state (streaming EWMA of daily ticket volume per series)
+CREATE TABLE IF NOT EXISTS volume_state (
+    dimension VARCHAR(20) NOT NULL,
+    series_key VARCHAR(200) NOT NULL,
+    open_bucket DATE NOT NULL,
+    open_count INTEGER NOT NULL DEFAULT 0,
+    ewma_mean FLOAT NOT NULL DEFAULT 0,
+    ewma_var FLOAT NOT NULL DEFAULT 0,
+    n_buckets INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (dimension, series_key)
+);
+
+-- Table 10: anomalies (daily volume spikes/drops flagged from volume_state)
+CREATE TABLE IF NOT EXISTS anomalies (
+    anomaly_id SERIAL PRIMARY KEY,
+    dimension VARCHAR(20) NOT NULL,
+    series_key VARCHAR(200) NOT NULL,
+    bucket_date DATE NOT NULL,
+    direction VARCHAR(10) NOT NULL,
+    observed INTEGER NOT NULL,
+    expected FLOAT NOT NULL,
+    z_score FLOAT NOT NULL,
+    upload_id INTEGER REFERENCES uploads(upload_id) ON DELETE SET NULL,
+    detected_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE(dimension, series_key, bucket_date)
+);
+
+CREATE INDEX IF NOT EXISTS idx_anomalies_detected ON anomalies(detected_at);
+
+-- Table 11: volume_scans (which dimensions of an upload are folded into
+-- volume_state; claimed per dimension so theming can finish later)
+CREATE TABLE IF NOT EXISTS volume_scans (
+    upload_id INTEGER REFERENCES uploads(upload_id) ON DELETE CASCADE,
+    dimension VARCHAR(20) NOT NULL,
+    scanned_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (upload_id, dimension)
+);
+
+"""
+
+# Change tracking for incremental stages: inserts, and updates that change a
+# source column, are stamped in the database with the writing transaction's
+# id (and the time), so stages resume from a snapshot rather than a
+# client-side clock. Updates of derived columns (the stages' own output) are
+# not changes.
+_source_changed = "\n        OR ".join(
+    f"OLD.{column} IS DISTINCT FROM NEW.{column}" for column in TICKET_SOURCE_COLUMNS
+)
+CHANGE_TRACKING_SQL = f"""
+CREATE OR REPLACE FUNCTION stamp_ticket_change() RETURNS trigger AS $$
+BEGIN
+    NEW.change_txid := txid_current();
+    NEW.last_updated := CURRENT_TIMESTAMP;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS tickets_stamp_insert ON tickets;
+CREATE TRIGGER tickets_stamp_insert
+    BEFORE INSERT ON tickets
+    FOR EACH ROW EXECUTE FUNCTION stamp_ticket_change();
+
+DROP TRIGGER IF EXISTS tickets_stamp_change ON tickets;
+CREATE TRIGGER tickets_stamp_change
+    BEFORE UPDATE ON tickets
+    FOR EACH ROW
+    WHEN ({_source_changed})
+    EXECUTE FUNCTION stamp_ticket_change();
+"""
+
+SCHEMA_SQL += CHANGE_TRACKING_SQL
+
+# Triage views (keyset pagination): equality filter first, then the sort key
+# with ticket_id as tie-breaker. Plain (non-covering) indexes: the browser
+# also reads text_content, product and severity_label, so every page visits
+# the heap for its rows anyway. Unscored tickets are not listed, so the
+# indexes leave them out. The high-severity predicate is generated from
+# HIGH_SEVERITY_THRESHOLD so it matches the literal the browser queries with.
+TRIAGE_INDEX_SQL = f"""
+CREATE INDEX IF NOT EXISTS idx_triage_priority
+    ON tickets(priority_rank, ticket_id)
+    WHERE priority_rank IS NOT NULL;
+CREATE INDEX IF NOT EXISTS idx_triage_theme_priority
+    ON tickets(assigned_theme_name, priority_rank, ticket_id)
+    WHERE priority_rank IS NOT NULL;
+CREATE INDEX IF NOT EXISTS idx_triage_upload_priority
+    ON tickets(upload_id, priority_rank, ticket_id)
+    WHERE priority_rank IS NOT NULL;
+CREATE INDEX IF NOT EXISTS idx_triage_severity
+    ON tickets(severity_score, created_at, ticket_id)
+    WHERE severity_score IS NOT NULL;
+CREATE INDEX IF NOT EXISTS idx_triage_theme_severity
+    ON tickets(assigned_theme_name, severity_score, created_at, ticket_id)
+    WHERE severity_score IS NOT NULL;
+CREATE INDEX IF NOT EXISTS idx_triage_newest
+    ON tickets(created_at, ticket_id);
+-- High-severity queue, newest first
+CREATE INDEX IF NOT EXISTS {HIGH_SEVERITY_INDEX}
+    ON tickets(created_at, ticket_id)
+    WHERE severity_score >= {int(HIGH_SEVERITY_THRESHOLD)};
 """
 
+SCHEMA_SQL += TRIAGE_INDEX_SQL
+
+
+# Sequences behind the SERIAL columns (DuckDB has no SERIAL type)
+SERIAL_SEQUENCES = ['uploads_upload_id_seq', 'themes_theme_id_seq', 'jobs_job_id_seq', 'anomalies_anomaly_id_seq']
+
+
+# Statements without a DuckDB equivalent
+POSTGRES_ONLY_PREFIXES = ('CREATE INDEX', 'CREATE OR REPLACE FUNCTION', 'CREATE TRIGGER', 'DROP TRIGGER')
+
+
+def _split_statements(sql):
+    """Split on ';' outside $$-quoted function bodies; drops comment lines"""
+    lines = [line for line in sql.splitlines() if not line.strip().startswith('--')]
+    statements, current, in_body = [], [], False
+    for chunk in re.split(r'(\$\$)', '\n'.join(lines)):
+        if chunk == '$$' or in_body:
+            in_body = in_body != (chunk == '$$')
+            current.append(chunk)
+            continue
+        parts = chunk.split(';')
+        current.append(parts[0])
+        for part in parts[1:]:
+            statements.append(''.join(current))
+            current = [part]
+    statements.append(''.join(current))
+    return [stmt.strip() for stmt in statements if stmt.strip()]
+
+
+def translate_schema(sql, dialect):
+    """
+    Rewrite the PostgreSQL schema for another backend
+    DuckDB: SERIAL becomes a sequence default, JSONB becomes JSON, FLOAT
+    becomes DOUBLE (FLOAT is 4 bytes in DuckDB, 8 in PostgreSQL), foreign keys
+    are dropped (DuckDB has no ON DELETE actions and blocks updates of
+    referenced rows) and secondary indexes are skipped: columnar scans with
+    min/max zone maps serve the analytical queries, and DuckDB supports
+    neither partial nor INCLUDE indexes. The PL/pgSQL change-tracking trigger
+    is skipped too (incremental stages run on PostgreSQL only).
+    Returns: list of statements
+    """
+    statements = _split_statements(sql)
+    if dialect != 'duckdb':
+        return statements
+
+    translated = []
+    for stmt in statements:
+        if stmt.upper().startswith(POSTGRES_ONLY_PREFIXES):
+            continue
+        table = re.match(r'CREATE TABLE IF NOT EXISTS (\w+)', stmt)
+        serial = re.search(r'(\w+) SERIAL PRIMARY KEY', stmt)
+        if table and serial:
+            sequence = f"{table.group(1)}_{serial.group(1)}_seq"
+            translated.append(f"CREATE SEQUENCE IF NOT EXISTS {sequence}")
+            stmt = stmt.replace(
+                serial.group(0),
+                f"{serial.group(1)} INTEGER PRIMARY KEY DEFAULT nextval('{sequence}')"
+            )
+        stmt = re.sub(r'\s*REFERENCES \w+\(\w+\)( ON DELETE (CASCADE|SET NULL))?', '', stmt)
+        stmt = re.sub(r'\bJSONB\b', 'JSON', stmt)
+        stmt = re.sub(r'\bFLOAT\b', 'DOUBLE', stmt)
+        translated.append(stmt)
+    return translated
+
 
 def create_schema(db_manager):
     """Create all database tables"""
     try:
         with db_manager.get_connection() as conn:
-            conn.execute(text(SCHEMA_SQL))
+            for statement in translate_schema(SCHEMA_SQL, db_manager.dialect):
+                conn.execute(text(statement))
             conn.commit()
             logger.info("✅ Database schema created successfully!")
             return True
@@ -119,15 +380,29 @@ def create_schema(db_manager):
 def drop_all_tables(db_manager):
     """Drop all tables (use with caution!)"""
     drop_sql = """
+    DROP TABLE IF EXISTS volume_scans CASCADE;
+    DROP TABLE IF EXISTS anomalies CASCADE;
+    DROP TABLE IF EXISTS volume_state CASCADE;
+    DROP TABLE IF EXISTS ticket_stage_state CASCADE;
+    DROP TABLE IF EXISTS stage_watermarks CASCADE;
+    DROP TABLE IF EXISTS theme_daily_counts CASCADE;
+    DROP TABLE IF EXISTS jobs CASCADE;
     DROP TABLE IF EXISTS analysis_cache CASCADE;
     DROP TABLE IF EXISTS themes CASCADE;
     DROP TABLE IF EXISTS tickets CASCADE;
     DROP TABLE IF EXISTS uploads CASCADE;
+    DROP SEQUENCE IF EXISTS ticket_id_seq;
     """
+    statements = _split_statements(drop_sql)
+    if db_manager.dialect == 'duckdb':
+        # No foreign keys to cascade over; the SERIAL sequences are explicit
+        statements = [stmt.replace(' CASCADE', '') for stmt in statements]
+        statements += [f"DROP SEQUENCE IF EXISTS {sequence}" for sequence in SERIAL_SEQUENCES]
     
     try:
         with db_manager.get_connection() as conn:
-            conn.execute(text(drop_sql))
+            for statement in statements:
+                conn.execute(text(statement))
             conn.commit()
             logger.info("All tables dropped")
             return True
@@ -141,7 +416,7 @@ def get_table_info(db_manager):
     query = """
     SELECT table_name 
     FROM information_schema.tables 
-    WHERE table_schema = 'public'
+    WHERE table_schema = current_schema()
     ORDER BY table_name;
     """
     
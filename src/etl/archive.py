@@ -0,0 +1,250 @@
+"""
+Cold storage for old uploads
+
+Uploads past the retention period are moved out of the `tickets` table into
+zstd-compressed Parquet under ARCHIVE_DIR, laid out as a hive-partitioned
+dataset:
+
+    tickets/upload_id=<id>/created_month=<YYYY-MM>/part-<n>.parquet
+
+The upload row stays in PostgreSQL with archived_at/archive_path set, so
+themes, trend counts and history keep working. Archived tickets are read
+back through a pyarrow dataset; upload and month filters prune directories
+and the remaining predicates are pushed down to the Parquet row groups.
+"""
+import os
+import uuid
+import shutil
+import logging
+from datetime import datetime, timedelta
+
+from sqlalchemy import text
+
+from utils.config import ARCHIVE_DIR, ARCHIVE_RETENTION_DAYS, ARCHIVE_ROWS_PER_FILE, STREAM_YIELD_PER
+from utils.lazy import lazy_import
+
+pd = lazy_import('pandas')
+pa = lazy_import('pyarrow')
+ds = lazy_import('pyarrow.dataset')
+
+logger = logging.getLogger(__name__)
+
+PARTITION_COLUMNS = ['upload_id', 'created_month']
+
+
+def archive_schema():
+    """Arrow schema of archived tickets (partition columns included)"""
+    return pa.schema([
+        ('ticket_id', pa.string()),
+        ('upload_id', pa.int32()),
+        ('created_at', pa.timestamp('us')),
+        ('text_content', pa.string()),
+        ('product', pa.string()),
+        ('channel', pa.string()),
+        ('original_priority', pa.string()),
+        ('customer_tier', pa.string()),
+        ('customer_id', pa.string()),
+        ('assigned_theme_id', pa.int32()),
+        ('assigned_theme_name', pa.string()),
+        ('theme_confidence', pa.float64()),
+        ('severity_score', pa.int32()),
+        ('severity_label', pa.string()),
+        ('priority_rank', pa.int32()),
+        ('text_length', pa.int32()),
+        ('created_date', pa.date32()),
+        ('created_month', pa.string()),
+        ('processed_at', pa.timestamp('us')),
+        ('last_updated', pa.timestamp('us'))
+    ])
+
+
+def _tickets_root(archive_dir):
+    return os.path.join(archive_dir, 'tickets')
+
+
+def get_upload_archive_path(upload_id, archive_dir=ARCHIVE_DIR):
+    return os.path.join(_tickets_root(archive_dir), f"upload_id={upload_id}")
+
+
+def get_archive_candidates(db_manager, retention_days=ARCHIVE_RETENTION_DAYS):
+    """Processed, not yet archived uploads older than the retention period"""
+    query = """
+    SELECT upload_id
+    FROM uploads
+    WHERE archived_at IS NULL
+      AND processed = TRUE
+      AND uploaded_at < :cutoff
+    ORDER BY uploaded_at
+    """
+    cutoff = datetime.now() - timedelta(days=retention_days)
+    return [row[0] for row in db_manager.execute_query(query, {'cutoff': cutoff})]
+
+
+def get_archived_uploads(db_manager):
+    """Returns: list of upload IDs whose tickets live in the archive"""
+    rows = db_manager.execute_query("SELECT upload_id FROM uploads WHERE archived_at IS NOT NULL")
+    return [row[0] for row in rows]
+
+
+def _write_upload_files(db_manager, upload_id, staging_path):
+    """Stream one upload's tickets into a month-partitioned dataset"""
+    schema = archive_schema()
+    file_schema = pa.schema([f for f in schema if f.name != 'upload_id'])
+    columns = ", ".join(file_schema.names)
+    query = f"SELECT {columns} FROM tickets WHERE upload_id = :upload_id ORDER BY created_at, ticket_id"
+
+    batches = db_manager.stream_record_batches(
+        query, {'upload_id': upload_id}, yield_per=STREAM_YIELD_PER, schema=file_schema
+    )
+    ds.write_dataset(
+        batches,
+        staging_path,
+        schema=file_schema,
+        format='parquet',
+        partitioning=ds.partitioning(pa.schema([('created_month', pa.string())]), flavor='hive'),
+        file_options=ds.ParquetFileFormat().make_write_options(compression='zstd'),
+        max_rows_per_file=ARCHIVE_ROWS_PER_FILE,
+        max_rows_per_group=min(ARCHIVE_ROWS_PER_FILE, 100000),
+        basename_template='part-{i}.parquet'
+    )
+    if not os.path.isdir(staging_path):
+        os.makedirs(staging_path)  # Upload has no tickets
+        return 0
+    return ds.dataset(staging_path, format='parquet').count_rows()
+
+
+def archive_upload(db_manager, upload_id, archive_dir=ARCHIVE_DIR):
+    """
+    Move one upload's tickets to Parquet and delete them from PostgreSQL
+    Files are written and counted before the delete; the delete and the
+    uploads update commit together and roll back if the counts disagree.
+    Returns: number of tickets archived
+    """
+    final_path = get_upload_archive_path(upload_id, archive_dir)
+    # Dot-prefixed directories are ignored by dataset discovery
+    staging_path = os.path.join(_tickets_root(archive_dir), f".tmp-{upload_id}-{uuid.uuid4().hex[:8]}")
+    os.makedirs(_tickets_root(archive_dir), exist_ok=True)
+
+    try:
+        written = _write_upload_files(db_manager, upload_id, staging_path)
+
+        if os.path.exists(final_path):
+            shutil.rmtree(final_path)  # Left over from an interrupted run
+        os.replace(staging_path, final_path)
+
+        with db_manager.get_connection() as conn:
+            conn.execute(
+                text("""
+                DELETE FROM ticket_stage_state s
+                USING tickets t
+                WHERE t.ticket_id = s.ticket_id
+                  AND t.upload_id = :upload_id
+                """),
+                {'upload_id': upload_id}
+            )
+            deleted = conn.execute(
+                text("DELETE FROM tickets WHERE upload_id = :upload_id"),
+                {'upload_id': upload_id}
+            ).rowcount
+            if deleted != written:
+                conn.rollback()
+                raise RuntimeError(
+                    f"Upload {upload_id} changed while archiving ({written} archived, {deleted} in table)"
+                )
+            conn.execute(
+                text("""
+                UPDATE uploads
+                SET archived_at = CURRENT_TIMESTAMP,
+                    archive_path = :path,
+                    archived_rows = :rows
+                WHERE upload_id = :upload_id
+                """),
+                {'upload_id': upload_id, 'path': final_path, 'rows': written}
+            )
+            conn.commit()
+    except Exception as e:
+        logger.error(f"Failed to archive upload {upload_id}: {e}")
+        shutil.rmtree(staging_path, ignore_errors=True)
+        raise
+
+    logger.info(f"Archived {written} tickets of upload {upload_id} to {final_path}")
+    return written
+
+
+def archive_old_uploads(db_manager, retention_days=ARCHIVE_RETENTION_DAYS, archive_dir=ARCHIVE_DIR):
+    """
+    Archive every upload past the retention period
+    Returns: dict mapping upload_id to tickets archived
+    """
+    results = {}
+    for upload_id in get_archive_candidates(db_manager, retention_days):
+        results[upload_id] = archive_upload(db_manager, upload_id, archive_dir)
+    return results
+
+
+def open_archive(archive_dir=ARCHIVE_DIR):
+    """pyarrow dataset over all archived tickets, or None if nothing is archived"""
+    root = _tickets_root(archive_dir)
+    if not os.path.isdir(root):
+        return None
+    schema = archive_schema()
+    partitioning = ds.partitioning(
+        pa.schema([schema.field(name) for name in PARTITION_COLUMNS]), flavor='hive'
+    )
+    return ds.dataset(root, schema=schema, format='parquet', partitioning=partitioning)
+
+
+def build_archive_filter(upload_ids, upload_id=None, start_date=None, end_date=None,
+                         theme=None, min_severity=None):
+    """
+    Dataset expression equivalent to the export filters
+    upload_ids: uploads currently marked archived (guards against orphaned files)
+    """
+    expr = ds.field('upload_id').isin(upload_ids)
+    if upload_id is not None:
+        expr &= ds.field('upload_id') == upload_id
+    if start_date is not None:
+        start = pd.Timestamp(start_date)
+        expr &= ds.field('created_month') >= start.strftime('%Y-%m')
+        expr &= ds.field('created_at') >= start.to_pydatetime()
+    if end_date is not None:
+        end = pd.Timestamp(end_date)
+        expr &= ds.field('created_month') <= (end - pd.Timedelta(microseconds=1)).strftime('%Y-%m')
+        expr &= ds.field('created_at') < end.to_pydatetime()
+    if theme:
+        expr &= ds.field('assigned_theme_name') == theme
+    if min_severity is not None:
+        expr &= ds.field('severity_score') >= min_severity
+    return expr
+
+
+def iter_archived_batches(db_manager, columns=None, archive_dir=ARCHIVE_DIR,
+                          batch_size=STREAM_YIELD_PER, **filters):
+    """
+    Yield RecordBatches of archived tickets matching the export-style filters
+    filters: upload_id, start_date, end_date, theme, min_severity
+    """
+    dataset = open_archive(archive_dir)
+    if dataset is None:
+        return
+    upload_ids = get_archived_uploads(db_manager)
+    if not upload_ids:
+        return
+
+    scanner = dataset.scanner(
+        columns=columns,
+        filter=build_archive_filter(upload_ids, **filters),
+        batch_size=batch_size
+    )
+    for batch in scanner.to_batches():
+        if batch.num_rows:
+            yield batch
+
+
+def read_archived_tickets(db_manager, columns=None, archive_dir=ARCHIVE_DIR, **filters):
+    """Archived tickets matching the filters as a DataFrame"""
+    batches = list(iter_archived_batches(db_manager, columns, archive_dir, **filters))
+    if not batches:
+        names = columns or archive_schema().names
+        return pd.DataFrame(columns=names)
+    return pa.Table.from_batches(batches).to_pandas()
@@ -0,0 +1,250 @@
+"""
+Streaming export of enriched tickets
+
+CSV exports are produced by PostgreSQL itself with COPY ... TO STDOUT and
+written straight to the output file. Parquet exports read through a
+server-side (named) cursor in fixed-size chunks. On DuckDB the result is
+streamed as Arrow record batches and written with the same writers as the
+archive. No path holds the full result set in Python memory. Tickets of
+archived uploads are read from the Parquet archive and written ahead of the
+database rows.
+"""
+import os
+import time
+import gzip
+import uuid
+import logging
+import itertools
+
+from utils.config import EXPORT_DIR, EXPORT_CHUNK_ROWS
+from utils.lazy import lazy_import
+from etl.archive import iter_archived_batches
+
+pd = lazy_import('pandas')
+pa = lazy_import('pyarrow')
+pq = lazy_import('pyarrow.parquet')
+
+logger = logging.getLogger(__name__)
+
+EXPORT_FORMATS = {
+    'csv': '.csv',
+    'csv.gz': '.csv.gz',
+    'parquet': '.parquet'
+}
+
+EXPORT_COLUMNS = [
+    'ticket_id', 'upload_id', 'created_at', 'text_content', 'product',
+    'channel', 'original_priority', 'customer_tier', 'customer_id',
+    'assigned_theme_name', 'theme_confidence', 'severity_score',
+    'severity_label', 'priority_rank'
+]
+
+
+def build_export_query(upload_id=None, start_date=None, end_date=None,
+                       theme=None, min_severity=None, paramstyle='pyformat'):
+    """
+    Build the export SELECT
+    paramstyle: 'pyformat' for psycopg2 (%(name)s), 'named' for SQLAlchemy text() (:name)
+    Returns: (query, params)
+    """
+    conditions = []
+    params = {}
+
+    def placeholder(name):
+        return f":{name}" if paramstyle == 'named' else f"%({name})s"
+
+    if upload_id is not None:
+        conditions.append(f"upload_id = {placeholder('upload_id')}")
+        params['upload_id'] = upload_id
+    if start_date is not None:
+        conditions.append(f"created_at >= {placeholder('start_date')}")
+        params['start_date'] = start_date
+    if end_date is not None:
+        conditions.append(f"created_at < {placeholder('end_date')}")
+        params['end_date'] = end_date
+    if theme:
+        conditions.append(f"assigned_theme_name = {placeholder('theme')}")
+        params['theme'] = theme
+    if min_severity is not None:
+        conditions.append(f"severity_score >= {placeholder('min_severity')}")
+        params['min_severity'] = min_severity
+
+    query = f"SELECT {', '.join(EXPORT_COLUMNS)} FROM tickets"
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    query += " ORDER BY created_at, ticket_id"
+
+    return query, params
+
+
+def _copy_csv(raw_conn, query, params, fileobj, header=True):
+    """Stream a query result as CSV via COPY ... TO STDOUT"""
+    with raw_conn.cursor() as cur:
+        # COPY cannot take bind parameters, so inline them safely
+        sql = cur.mogrify(query, params).decode()
+        options = "FORMAT csv, HEADER" if header else "FORMAT csv"
+        cur.copy_expert(f"COPY ({sql}) TO STDOUT WITH ({options})", fileobj)
+        return cur.rowcount
+
+
+def _write_csv_batches(batches, fileobj):
+    """Write Arrow record batches as CSV (with header); Returns: rows written"""
+    # Nullable integers stay integers ("3", not "3.0" as with NaN-backed
+    # floats), matching the COPY output of the database rows
+    int_types = {pa.int32(): pd.Int32Dtype(), pa.int64(): pd.Int64Dtype()}
+    rows = 0
+    for batch in batches:
+        frame = batch.to_pandas(types_mapper=int_types.get)
+        frame.to_csv(fileobj, header=rows == 0, index=False, encoding='utf-8')
+        rows += batch.num_rows
+    return rows
+
+
+def export_schema():
+    """Fixed Arrow schema so chunks with all-NULL columns still line up"""
+    return pa.schema([
+        ('ticket_id', pa.string()),
+        ('upload_id', pa.int32()),
+        ('created_at', pa.timestamp('us')),
+        ('text_content', pa.string()),
+        ('product', pa.string()),
+        ('channel', pa.string()),
+        ('original_priority', pa.string()),
+        ('customer_tier', pa.string()),
+        ('customer_id', pa.string()),
+        ('assigned_theme_name', pa.string()),
+        ('theme_confidence', pa.float64()),
+        ('severity_score', pa.int32()),
+        ('severity_label', pa.string()),
+        ('priority_rank', pa.int32())
+    ])
+
+
+def _stream_parquet(raw_conn, query, params, path, chunk_rows, archived_batches=()):
+    """Write archived batches, then a query result, to Parquet in chunks"""
+    schema = export_schema()
+    rows_written = 0
+    writer = pq.ParquetWriter(path, schema, compression='zstd')
+    # Named cursors are server-side: rows arrive itersize at a time
+    with raw_conn.cursor(name=f"export_{uuid.uuid4().hex}") as cur:
+        cur.itersize = chunk_rows
+        try:
+            for batch in archived_batches:
+                writer.write_table(pa.Table.from_batches([batch]).cast(schema))
+                rows_written += batch.num_rows
+
+            cur.execute(query, params)
+            while True:
+                rows = cur.fetchmany(chunk_rows)
+                if not rows:
+                    break
+                table = pa.Table.from_pandas(
+                    pd.DataFrame(rows, columns=EXPORT_COLUMNS),
+                    schema=schema,
+                    preserve_index=False
+                )
+                writer.write_table(table)
+                rows_written += len(rows)
+        finally:
+            writer.close()
+
+    return rows_written
+
+
+def _export_record_batches(db_manager, query, params, path, fmt, chunk_rows, archived_batches=()):
+    """
+    Write archived batches, then a query result read as Arrow record batches
+    (backends without COPY or named cursors, i.e. DuckDB)
+    Returns: rows written
+    """
+    schema = export_schema()
+    batches = itertools.chain(
+        archived_batches,
+        db_manager.stream_record_batches(query, params, yield_per=chunk_rows, schema=schema)
+    )
+
+    if fmt == 'parquet':
+        rows_written = 0
+        with pq.ParquetWriter(path, schema, compression='zstd') as writer:
+            for batch in batches:
+                writer.write_table(pa.Table.from_batches([batch]).cast(schema))
+                rows_written += batch.num_rows
+        return rows_written
+
+    opener = gzip.open if fmt == 'csv.gz' else open
+    with opener(path, 'wb') as f:
+        rows_written = _write_csv_batches(batches, f)
+        if rows_written == 0:
+            pd.DataFrame(columns=EXPORT_COLUMNS).to_csv(f, index=False, encoding='utf-8')
+    return rows_written
+
+
+def export_tickets(db_manager, path, fmt='csv', chunk_rows=EXPORT_CHUNK_ROWS,
+                   include_archive=True, **filters):
+    """
+    Export enriched tickets to a file
+    fmt: 'csv', 'csv.gz' or 'parquet'; filters: see build_export_query
+    include_archive: also export matching tickets of archived uploads
+    Returns: number of rows written
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported export format: {fmt}")
+
+    archived = (
+        iter_archived_batches(db_manager, columns=EXPORT_COLUMNS, batch_size=chunk_rows, **filters)
+        if include_archive else ()
+    )
+    if db_manager.dialect != 'postgresql':
+        # COPY ... TO STDOUT and named cursors are psycopg2 features
+        query, params = build_export_query(paramstyle='named', **filters)
+        try:
+            rows = _export_record_batches(db_manager, query, params, path, fmt, chunk_rows, archived)
+        except Exception as e:
+            logger.error(f"Export failed: {e}")
+            raise
+        logger.info(f"Exported {rows} tickets to {path}")
+        return rows
+
+    query, params = build_export_query(**filters)
+    raw_conn = db_manager.engine.raw_connection()
+    try:
+        if fmt == 'parquet':
+            rows = _stream_parquet(raw_conn, query, params, path, chunk_rows, archived)
+        else:
+            opener = gzip.open if fmt == 'csv.gz' else open
+            with opener(path, 'wb') as f:
+                archived_rows = _write_csv_batches(archived, f)
+                rows = archived_rows + _copy_csv(raw_conn, query, params, f, header=archived_rows == 0)
+        raw_conn.commit()
+        logger.info(f"Exported {rows} tickets to {path}")
+        return rows
+    except Exception as e:
+        raw_conn.rollback()
+        logger.error(f"Export failed: {e}")
+        raise
+    finally:
+        raw_conn.close()
+
+
+def export_to_directory(db_manager, fmt='csv', export_dir=EXPORT_DIR, **filters):
+    """
+    Export into a new file under export_dir
+    Returns: (path, row_count)
+    """
+    os.makedirs(export_dir, exist_ok=True)
+    cleanup_exports(export_dir)
+    path = os.path.join(export_dir, f"tickets_{uuid.uuid4().hex[:12]}{EXPORT_FORMATS[fmt]}")
+    rows = export_tickets(db_manager, path, fmt=fmt, **filters)
+    return path, rows
+
+
+def cleanup_exports(export_dir=EXPORT_DIR, max_age_hours=24):
+    """Delete export files older than max_age_hours"""
+    cutoff = time.time() - max_age_hours * 3600
+    for name in os.listdir(export_dir):
+        path = os.path.join(export_dir, name)
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,105 @@
+"""
+Compact in-memory representation of ticket DataFrames
+"""
+import logging
+from utils.lazy import lazy_import
+
+# Loaded on first use to keep it off the page startup path
+pd = lazy_import('pandas')
+
+logger = logging.getLogger(__name__)
+
+# Low-cardinality columns stored as categoricals (raw and schema names)
+CATEGORICAL_COLUMNS = [
+    'channel', 'priority', 'original_priority', 'customer_tier',
+    'product', 'category'
+]
+
+# Free-text / identifier columns stored as Arrow-backed strings
+STRING_COLUMNS = ['ticket_id', 'customer_id', 'text', 'text_content']
+
+# Only convert to categorical when values repeat enough to pay off
+MAX_CATEGORY_RATIO = 0.5
+
+
+def string_dtype():
+    """Arrow-backed strings when pyarrow is installed, else pandas strings"""
+    try:
+        import pyarrow  # noqa: F401
+        return 'string[pyarrow]'
+    except ImportError:
+        return 'string'
+
+
+def compact_tickets(df):
+    """
+    Convert ticket columns to compact dtypes in place
+    Returns: the same DataFrame
+    """
+    text_dtype = string_dtype()
+
+    for col in CATEGORICAL_COLUMNS:
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            n_unique = df[col].nunique(dropna=True)
+            if n_unique <= max(1, len(df) * MAX_CATEGORY_RATIO):
+                df[col] = df[col].astype('category')
+
+    for col in STRING_COLUMNS:
+        if col in df.columns and df[col].dtype == object:
+            df[col] = df[col].astype(text_dtype)
+
+    return df
+
+
+def read_tickets_csv(source, **kwargs):
+    """Read a ticket CSV straight into compact dtypes"""
+    dtype = {col: 'category' for col in CATEGORICAL_COLUMNS}
+    dtype.update({col: string_dtype() for col in STRING_COLUMNS})
+    dtype.update(kwargs.pop('dtype', {}))
+
+    # read_csv ignores dtype entries for columns the file does not have
+    return pd.read_csv(source, dtype=dtype, **kwargs)
+
+
+def fill_missing(df, col, value):
+    """fillna that also works for categoricals missing the fill category"""
+    series = df[col]
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        if not series.isna().any():
+            return
+        if value not in series.cat.categories:
+            series = series.cat.add_categories([value])
+    df[col] = series.fillna(value)
+
+
+def memory_report(**stages):
+    """
+    Bytes per column for each named pipeline stage, e.g.
+    memory_report(raw=raw_df, transformed=clean_df, database=db_df)
+    Returns: DataFrame indexed by column with one column per stage, plus a TOTAL row
+    """
+    report = pd.DataFrame({
+        name: frame.memory_usage(index=False, deep=True)
+        for name, frame in stages.items()
+    })
+    report.loc['TOTAL'] = report.sum()
+    return report.astype('Int64')
+
+
+def memory_report_json(report):
+    """
+    JSON form of a memory_report for storing with the upload
+    Returns: JSON array of {column, <stage>: bytes, ...} objects (null where a
+             stage has no such column), TOTAL last
+    """
+    return report.rename_axis('column').reset_index().to_json(orient='records')
+
+
+def log_memory_report(**stages):
+    """Log the per-stage memory totals"""
+    report = memory_report(**stages)
+    totals = ", ".join(
+        f"{name}={report.loc['TOTAL', name] / 1024 ** 2:.1f} MB" for name in report.columns
+    )
+    logger.info(f"Frame memory: {totals}")
+    return report
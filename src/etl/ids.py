@@ -0,0 +1,119 @@
+"""
+Ticket ID allocation for rows uploaded without an ID
+
+IDs are numbered from the ticket_id_seq sequence, which advances in blocks
+of TICKET_ID_BLOCK_SIZE: every nextval reserves a whole block for the
+caller. One query reserves as many blocks as a batch needs, so generating
+IDs costs one round trip per batch however many rows it has, and uploads
+running at the same time can never hand out the same number.
+
+Reserved ranges are plain (start, stop) tuples and can be split between
+chunks or worker processes without going back to the database.
+"""
+import logging
+
+from utils.config import TICKET_ID_PREFIX, TICKET_ID_BLOCK_SIZE
+from utils.lazy import lazy_import
+
+# Loaded on first use to keep it off the page startup path
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+
+logger = logging.getLogger(__name__)
+
+# Zero-padded so generated IDs sort in allocation order
+ID_DIGITS = 10
+
+
+def reserve_ticket_ids(db_manager, count, block_size=TICKET_ID_BLOCK_SIZE):
+    """
+    Reserve at least `count` ticket numbers in one query
+    Returns: list of (start, stop) ranges (stop exclusive), in sequence order
+    """
+    if count <= 0:
+        return []
+
+    blocks = -(-count // block_size)
+    query = "SELECT nextval('ticket_id_seq') FROM generate_series(1, :blocks)"
+    try:
+        rows = db_manager.execute_query(query, {'blocks': blocks})
+    except Exception as e:
+        logger.error(f"Failed to reserve ticket IDs: {e}")
+        raise
+
+    starts = sorted(row[0] for row in rows)
+    ranges = merge_ranges([(start, start + block_size) for start in starts])
+    logger.info(f"Reserved {blocks * block_size} ticket IDs in {len(ranges)} range(s) for {count} rows")
+    return ranges
+
+
+def merge_ranges(ranges):
+    """Coalesce adjacent (start, stop) ranges"""
+    merged = []
+    for start, stop in sorted(ranges):
+        if merged and merged[-1][1] == start:
+            merged[-1] = (merged[-1][0], stop)
+        else:
+            merged.append((start, stop))
+    return merged
+
+
+def range_size(ranges):
+    return sum(stop - start for start, stop in ranges)
+
+
+def take_ids(ranges, count):
+    """
+    First `count` numbers of the reserved ranges
+    Returns: int64 array
+    """
+    if count > range_size(ranges):
+        raise ValueError(f"Need {count} ticket IDs but only {range_size(ranges)} are reserved")
+
+    parts = []
+    remaining = count
+    for start, stop in ranges:
+        if remaining == 0:
+            break
+        n = min(stop - start, remaining)
+        parts.append(np.arange(start, start + n, dtype=np.int64))
+        remaining -= n
+    return np.concatenate(parts) if parts else np.empty(0, dtype=np.int64)
+
+
+def split_ranges(ranges, sizes):
+    """
+    Hand out disjoint sub-ranges, e.g. one per chunk or worker
+    sizes: number of IDs each part needs
+    Returns: list of range lists, one per size
+    """
+    if sum(sizes) > range_size(ranges):
+        raise ValueError(f"Need {sum(sizes)} ticket IDs but only {range_size(ranges)} are reserved")
+
+    pending = list(ranges)
+    parts = []
+    for size in sizes:
+        part = []
+        while size > 0:
+            start, stop = pending[0]
+            n = min(stop - start, size)
+            part.append((start, start + n))
+            size -= n
+            if start + n == stop:
+                pending.pop(0)
+            else:
+                pending[0] = (start + n, stop)
+        parts.append(part)
+    return parts
+
+
+def format_ticket_ids(numbers, prefix=TICKET_ID_PREFIX):
+    """Turn sequence numbers into ticket ID strings"""
+    return prefix + pd.Series(numbers, dtype='int64').astype(str).str.zfill(ID_DIGITS)
+
+
+def count_missing_ids(df):
+    """Number of rows that will need a generated ticket ID"""
+    if 'ticket_id' not in df.columns:
+        return len(df)
+    return int(df['ticket_id'].isna().sum())
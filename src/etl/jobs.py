@@ -0,0 +1,472 @@
+"""
+Background job queue for upload processing
+
+Jobs live in the PostgreSQL `jobs` table. Workers claim them with
+SELECT ... FOR UPDATE SKIP LOCKED, so any number of worker processes can
+poll the same queue without handing out a job twice. Progress and status
+are written to `uploads` so the Upload page only needs to poll.
+
+A running job's heartbeat_at is refreshed from a background thread and on
+every progress update; jobs whose heartbeat stops are requeued. A worker
+whose job was requeued and claimed by another worker notices it at its
+next progress update or heartbeat and stops without touching the job.
+
+On DuckDB there are no worker processes (only one process can open the
+database file), so enqueue_upload claims the job itself and processes it
+before returning; the upload record goes through the same statuses.
+"""
+import os
+import json
+import time
+import socket
+import contextlib
+import logging
+import threading
+
+from sqlalchemy import text
+
+from database.connection import UnsupportedBackendError
+from utils.config import JOB_HEARTBEAT_SECONDS, JOB_STALE_MINUTES
+
+logger = logging.getLogger(__name__)
+
+JOB_TYPE_UPLOAD = 'process_upload'
+
+
+class JobSuperseded(Exception):
+    """The job was requeued and now belongs to another worker"""
+
+
+def _default_worker_id():
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+def _json_type(db_manager):
+    """Type to CAST JSON parameters to (DuckDB's JSON plays the part of JSONB)"""
+    return 'JSON' if db_manager.dialect == 'duckdb' else 'JSONB'
+
+
+def enqueue_upload(db_manager, handle, user_notes="", profile=None):
+    """
+    Create an upload record and queue it for processing in one transaction
+    On DuckDB the job is processed in this process before returning
+    profile: optional column profile stored with the upload record
+    Returns: (upload_id, job_id)
+    """
+    json_type = _json_type(db_manager)
+    upload_query = f"""
+    INSERT INTO uploads (filename, file_size_bytes, row_count, user_notes, processed, status, progress, profile)
+    VALUES (:filename, :file_size_bytes, :row_count, :user_notes, FALSE, 'queued', 0, CAST(:profile AS {json_type}))
+    RETURNING upload_id
+    """
+    job_query = f"""
+    INSERT INTO jobs (job_type, upload_id, payload)
+    VALUES (:job_type, :upload_id, CAST(:payload AS {json_type}))
+    RETURNING job_id
+    """
+
+    try:
+        with db_manager.get_connection() as conn:
+            upload_id = conn.execute(
+                text(upload_query),
+                {
+                    'filename': handle['filename'],
+                    'file_size_bytes': handle.get('source_size'),
+                    'row_count': handle['row_count'],
+                    'user_notes': user_notes,
+                    'profile': json.dumps(profile) if profile is not None else None
+                }
+            ).fetchone()[0]
+            job_id = conn.execute(
+                text(job_query),
+                {
+                    'job_type': JOB_TYPE_UPLOAD,
+                    'upload_id': upload_id,
+                    'payload': json.dumps({'handle': handle})
+                }
+            ).fetchone()[0]
+            conn.commit()
+            logger.info(f"Queued job {job_id} for upload {upload_id}")
+    except Exception as e:
+        logger.error(f"Failed to enqueue upload: {e}")
+        raise
+
+    if db_manager.dialect == 'duckdb':
+        job = claim_job(db_manager, _default_worker_id(), job_id=job_id)
+        if job is not None:
+            # Single process: nothing can take the job over, no heartbeat needed
+            process_job(db_manager, job, heartbeat=False)
+    return upload_id, job_id
+
+
+def claim_job(db_manager, worker_id, job_id=None):
+    """
+    Atomically claim the oldest queued job (or job_id, if it is still queued)
+    Returns: job dict, or None if the queue is empty
+    """
+    # DuckDB has no row locks; its single process is the only claimant
+    lock = "FOR UPDATE SKIP LOCKED" if db_manager.dialect == 'postgresql' else ""
+    job_filter = "AND job_id = :job_id" if job_id is not None else ""
+    query = f"""
+    UPDATE jobs
+    SET status = 'running',
+        started_at = CURRENT_TIMESTAMP,
+        heartbeat_at = CURRENT_TIMESTAMP,
+        attempts = attempts + 1,
+        worker_id = :worker_id
+    WHERE job_id = (
+        SELECT job_id
+        FROM jobs
+        WHERE status = 'queued' {job_filter}
+        ORDER BY created_at
+        {lock}
+        LIMIT 1
+    )
+    RETURNING job_id, job_type, upload_id, payload, attempts
+    """
+
+    with db_manager.get_connection() as conn:
+        row = conn.execute(text(query), {'worker_id': worker_id, 'job_id': job_id}).fetchone()
+        conn.commit()
+
+    if row is None:
+        return None
+    payload = row[3] or {}
+    if isinstance(payload, str):
+        # DuckDB returns JSON columns as text
+        payload = json.loads(payload)
+    return {
+        'job_id': row[0],
+        'job_type': row[1],
+        'upload_id': row[2],
+        'payload': payload,
+        'attempts': row[4],
+        'worker_id': worker_id
+    }
+
+
+def touch_job(db_manager, job, conn=None):
+    """
+    Refresh the heartbeat of a running job owned by this worker
+    Returns: False if the job no longer belongs to the worker
+    """
+    # RETURNING rather than rowcount, which DuckDB does not report
+    query = """
+    UPDATE jobs
+    SET heartbeat_at = CURRENT_TIMESTAMP
+    WHERE job_id = :job_id
+      AND worker_id = :worker_id
+      AND status = 'running'
+    RETURNING job_id
+    """
+    params = {'job_id': job['job_id'], 'worker_id': job['worker_id']}
+    if conn is not None:
+        return conn.execute(text(query), params).fetchone() is not None
+
+    with db_manager.get_connection() as conn:
+        owned = conn.execute(text(query), params).fetchone() is not None
+        conn.commit()
+    return owned
+
+
+class JobHeartbeat:
+    """Refresh a job's heartbeat from a background thread while it runs"""
+
+    def __init__(self, db_manager, job, interval=JOB_HEARTBEAT_SECONDS):
+        self.db_manager = db_manager
+        self.job = job
+        self.interval = interval
+        self.superseded = False
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                if not touch_job(self.db_manager, self.job):
+                    self.superseded = True
+                    logger.warning(f"Job {self.job['job_id']} was taken over by another worker")
+                    return
+            except Exception as e:
+                logger.warning(f"Heartbeat for job {self.job['job_id']} failed: {e}")
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+
+
+def update_upload_status(db_manager, upload_id, status=None, progress=None, error_message=None, job=None):
+    """
+    Update status/progress columns on uploads (None leaves a field unchanged)
+    job: the running job; its heartbeat is refreshed in the same transaction,
+    and JobSuperseded is raised (nothing written) if another worker owns it now
+    """
+    query = """
+    UPDATE uploads
+    SET status = COALESCE(:status, status),
+        progress = COALESCE(:progress, progress),
+        error_message = COALESCE(:error_message, error_message)
+    WHERE upload_id = :upload_id
+    """
+
+    with db_manager.get_connection() as conn:
+        if job is not None and not touch_job(db_manager, job, conn):
+            conn.rollback()
+            raise JobSuperseded(f"Job {job['job_id']} was taken over by another worker")
+        conn.execute(
+            text(query),
+            {
+                'upload_id': upload_id,
+                'status': status,
+                'progress': progress,
+                'error_message': error_message
+            }
+        )
+        conn.commit()
+
+
+def finish_job(db_manager, job, status, error_message=None):
+    """
+    Mark a job as completed or failed, if this worker still owns it
+    Returns: False if the job was taken over by another worker
+    """
+    query = """
+    UPDATE jobs
+    SET status = :status,
+        error_message = :error_message,
+        finished_at = CURRENT_TIMESTAMP
+    WHERE job_id = :job_id
+      AND worker_id = :worker_id
+      AND status = 'running'
+    RETURNING job_id
+    """
+
+    with db_manager.get_connection() as conn:
+        row = conn.execute(
+            text(query),
+            {
+                'job_id': job['job_id'],
+                'worker_id': job['worker_id'],
+                'status': status,
+                'error_message': error_message
+            }
+        ).fetchone()
+        conn.commit()
+    return row is not None
+
+
+def requeue_stale_jobs(db_manager, timeout_minutes=JOB_STALE_MINUTES, max_attempts=3):
+    """
+    Put back jobs whose worker stopped sending heartbeats
+    Returns: number of jobs requeued
+    """
+    query = """
+    UPDATE jobs
+    SET status = CASE WHEN attempts >= :max_attempts THEN 'failed' ELSE 'queued' END,
+        error_message = 'Worker timed out'
+    WHERE status = 'running'
+      AND COALESCE(heartbeat_at, started_at) < CURRENT_TIMESTAMP - make_interval(mins => :timeout_minutes)
+    """
+
+    with db_manager.get_connection() as conn:
+        result = conn.execute(
+            text(query),
+            {'timeout_minutes': timeout_minutes, 'max_attempts': max_attempts}
+        )
+        conn.commit()
+        if result.rowcount:
+            logger.warning(f"Requeued {result.rowcount} stale jobs")
+        return result.rowcount
+
+
+def get_upload_status(db_manager, upload_id):
+    """Get processing status of an upload"""
+    query = """
+    SELECT status, progress, error_message, row_count, processed
+    FROM uploads
+    WHERE upload_id = :upload_id
+    """
+
+    with db_manager.get_connection() as conn:
+        row = conn.execute(text(query), {'upload_id': upload_id}).fetchone()
+
+    if row is None:
+        return None
+    return {
+        'status': row[0],
+        'progress': row[1] or 0.0,
+        'error_message': row[2],
+        'row_count': row[3],
+        'processed': row[4]
+    }
+
+
+def save_memory_report(db_manager, upload_id, report_json):
+    """Store the per-column frame memory of a load (see etl.frames.memory_report_json)"""
+    query = f"""
+    UPDATE uploads
+    SET memory_report = CAST(:report AS {_json_type(db_manager)})
+    WHERE upload_id = :upload_id
+    """
+    with db_manager.get_connection() as conn:
+        conn.execute(text(query), {'upload_id': upload_id, 'report': report_json})
+        conn.commit()
+
+
+def get_memory_report(db_manager, upload_id):
+    """
+    Per-column frame memory recorded when the upload was loaded
+    Returns: list of dicts (column plus bytes per stage), or None
+    """
+    rows = db_manager.execute_query(
+        "SELECT memory_report FROM uploads WHERE upload_id = :upload_id",
+        {'upload_id': upload_id}
+    )
+    if not rows or rows[0][0] is None:
+        return None
+    report = rows[0][0]
+    # DuckDB returns JSON columns as text
+    return json.loads(report) if isinstance(report, str) else report
+
+
+def _delete_upload_tickets(db_manager, upload_id):
+    """Remove partially loaded tickets so a retry starts clean"""
+    with db_manager.get_connection() as conn:
+        conn.execute(text("DELETE FROM tickets WHERE upload_id = :upload_id"), {'upload_id': upload_id})
+        conn.commit()
+
+
+# Derived indexes and metrics refreshed after an upload is loaded:
+# (description, module, function taking db_manager and upload_id)
+# The theme steps follow theming (they do nothing for unthemed tickets) in
+# dependency order: labels are written from the keywords, and trends are
+# bucketed by the labeled theme names
+POST_LOAD_STEPS = [
+    ('Similarity indexing', 'analysis.similarity', 'index_upload'),
+    ('Theme keywords', 'analysis.keywords', 'extract_upload_keywords'),
+    ('Theme labels', 'llm.labeler', 'label_upload_themes'),
+    ('Theme trends', 'analysis.trends', 'update_theme_trends'),
+    ('Volume anomalies', 'analysis.anomalies', 'update_volume_anomalies')
+]
+
+
+def run_post_load_steps(db_manager, upload_id):
+    """Run POST_LOAD_STEPS in order; they are nice-to-haves, so failures don't fail the upload"""
+    import importlib
+
+    for description, module_name, function_name in POST_LOAD_STEPS:
+        try:
+            step = getattr(importlib.import_module(module_name), function_name)
+            step(db_manager, upload_id)
+        except UnsupportedBackendError as e:
+            logger.info(f"{description} skipped for upload {upload_id}: {e}")
+        except Exception as e:
+            logger.warning(f"{description} skipped for upload {upload_id}: {e}")
+
+
+def run_upload_job(db_manager, job):
+    """Validate, transform and load a staged upload"""
+    from etl.staging import read_staged_frame
+    from etl.transform import transform_tickets, prepare_for_database
+    from etl.ids import count_missing_ids, reserve_ticket_ids
+    from etl.frames import log_memory_report, memory_report_json
+    from etl.loader import load_tickets_to_db, mark_upload_processed
+    from utils.validators import validate_staged_upload
+
+    upload_id = job['upload_id']
+    handle = job['payload']['handle']
+
+    update_upload_status(db_manager, upload_id, status='running', progress=0.0, job=job)
+
+    # Normally a memo hit: the page validated the same file before queuing it
+    validation = validate_staged_upload(handle)
+    if not validation['is_valid']:
+        raise ValueError(validation['report'])
+    update_upload_status(db_manager, upload_id, progress=0.05, job=job)
+
+    df = read_staged_frame(handle)
+
+    # One sequence round trip covers every row that arrived without an ID
+    id_ranges = reserve_ticket_ids(db_manager, count_missing_ids(df))
+    transformed_df = transform_tickets(df, id_ranges=id_ranges)
+    db_df = prepare_for_database(transformed_df, upload_id)
+    memory = log_memory_report(raw=df, transformed=transformed_df, database=db_df)
+    save_memory_report(db_manager, upload_id, memory_report_json(memory))
+    del df, transformed_df, memory
+    update_upload_status(db_manager, upload_id, progress=0.1, job=job)
+
+    # Loading is the bulk of the work: map it onto 10%-95%
+    def on_progress(loaded, total):
+        update_upload_status(db_manager, upload_id, progress=0.1 + 0.85 * loaded / max(total, 1), job=job)
+
+    _delete_upload_tickets(db_manager, upload_id)
+    load_tickets_to_db(db_manager, db_df, upload_id, progress_callback=on_progress)
+    mark_upload_processed(db_manager, upload_id)
+
+    run_post_load_steps(db_manager, upload_id)
+
+    update_upload_status(db_manager, upload_id, status='completed', progress=1.0, job=job)
+
+
+JOB_HANDLERS = {
+    JOB_TYPE_UPLOAD: run_upload_job
+}
+
+
+def process_job(db_manager, job, heartbeat=True):
+    """
+    Run a claimed job and record its outcome
+    heartbeat: refresh the job's heartbeat from a background thread while it runs
+    """
+    handler = JOB_HANDLERS.get(job['job_type'])
+    try:
+        if handler is None:
+            raise ValueError(f"Unknown job type: {job['job_type']}")
+        with JobHeartbeat(db_manager, job) if heartbeat else contextlib.nullcontext():
+            handler(db_manager, job)
+        if not finish_job(db_manager, job, 'completed'):
+            raise JobSuperseded(f"Job {job['job_id']} was taken over by another worker")
+        logger.info(f"Job {job['job_id']} completed")
+        return True
+    except JobSuperseded as e:
+        # The upload now belongs to the other worker: leave its tickets and status alone
+        logger.warning(f"Abandoning job {job['job_id']}: {e}")
+        return False
+    except Exception as e:
+        logger.error(f"Job {job['job_id']} failed: {e}")
+        if not finish_job(db_manager, job, 'failed', str(e)):
+            logger.warning(f"Job {job['job_id']} was taken over by another worker; not cleaning up")
+            return False
+        if job.get('upload_id') is not None:
+            try:
+                _delete_upload_tickets(db_manager, job['upload_id'])
+            finally:
+                update_upload_status(db_manager, job['upload_id'], status='failed', error_message=str(e))
+        return False
+
+
+def run_worker(db_manager, worker_id=None, poll_interval=2.0, max_jobs=None):
+    """
+    Poll the queue and process jobs until interrupted
+    max_jobs stops the worker after that many jobs (useful for tests)
+    """
+    db_manager.require_postgresql("The job worker")
+    worker_id = worker_id or _default_worker_id()
+    logger.info(f"Worker {worker_id} started")
+
+    processed = 0
+    while max_jobs is None or processed < max_jobs:
+        job = claim_job(db_manager, worker_id)
+        if job is None:
+            # Idle: recover jobs abandoned by crashed workers, then wait
+            requeue_stale_jobs(db_manager)
+            time.sleep(poll_interval)
+            continue
+        process_job(db_manager, job)
+        processed += 1
+
+    return processed
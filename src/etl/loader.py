@@ -1,9 +1,12 @@
 """
 Data loading functions to PostgreSQL
 """
-import pandas as pd
 from sqlalchemy import text
 import logging
+from utils.lazy import lazy_import
+
+# Loaded on first use to keep it off the page startup path
+pd = lazy_import('pandas')
 
 logger = logging.getLogger(__name__)
 
@@ -36,27 +39,49 @@ def create_upload_record(db_manager, filename, row_count, user_notes=""):
         logger.error(f"Failed to create upload record: {e}")
         raise
 
-def load_tickets_to_db(db_manager, df, upload_id):
+def load_tickets_to_db(db_manager, df, upload_id, progress_callback=None, batch_size=5000):
     """
     Load tickets DataFrame to database
+    progress_callback(loaded_rows, total_rows) is called after each batch
     """
     try:
-        # Use pandas to_sql for bulk insert
-        df.to_sql(
-            'tickets',
-            db_manager.engine,
-            if_exists='append',
-            index=False,
-            method='multi',
-            chunksize=100
-        )
+        total = len(df)
+        for start in range(0, total, batch_size):
+            append_dataframe(db_manager, df.iloc[start:start + batch_size], 'tickets')
+            if progress_callback:
+                progress_callback(min(start + batch_size, total), total)
         
-        logger.info(f"Loaded {len(df)} tickets to database")
+        logger.info(f"Loaded {total} tickets to database")
         return True
     except Exception as e:
         logger.error(f"Failed to load tickets: {e}")
         raise
 
+def append_dataframe(db_manager, df, table):
+    """Append DataFrame rows to a table"""
+    if db_manager.dialect == 'duckdb':
+        # DuckDB scans the DataFrame in place; one INSERT ... SELECT instead of row INSERTs
+        columns = ', '.join(df.columns)
+        with db_manager.get_connection() as conn:
+            raw = conn.connection.driver_connection
+            raw.register('incoming_df', df)
+            try:
+                raw.execute(f"INSERT INTO {table} ({columns}) SELECT {columns} FROM incoming_df")
+            finally:
+                raw.unregister('incoming_df')
+            conn.commit()
+        return
+    
+    # Use pandas to_sql for bulk insert
+    df.to_sql(
+        table,
+        db_manager.engine,
+        if_exists='append',
+        index=False,
+        method='multi',
+        chunksize=100
+    )
+
 def mark_upload_processed(db_manager, upload_id):
     """Mark upload as processed"""
     query = """
@@ -102,7 +127,7 @@ def get_upload_info(db_manager, upload_id):
 def get_all_uploads(db_manager):
     """Get all uploads"""
     query = """
-    SELECT upload_id, filename, row_count, uploaded_at, processed
+    SELECT upload_id, filename, row_count, uploaded_at, processed, status
     FROM uploads
     ORDER BY uploaded_at DESC
     """
@@ -110,16 +135,17 @@ def get_all_uploads(db_manager):
     try:
         with db_manager.get_connection() as conn:
             result = conn.execute(text(query))
-            uploads = []
-            for row in result:
-                uploads.append({
-                    'upload_id': row[0],
-                    'filename': row[1],
-                    'row_count': row[2],
-                    'uploaded_at': row[3],
-                    'processed': row[4]
-                })
-            return uploads
+            return [dict(row) for row in result.mappings()]
     except Exception as e:
         logger.error(f"Failed to get uploads: {e}")
-        raise
\ No newline at end of file
+        raise
+
+def get_quick_stats(db_manager):
+    """
+    Ticket and upload counts for the home page
+    Returns: (ticket_count, upload_count)
+    """
+    with db_manager.get_connection() as conn:
+        ticket_count = conn.execute(text("SELECT COUNT(*) FROM tickets")).scalar()
+        upload_count = conn.execute(text("SELECT COUNT(*) FROM uploads")).scalar()
+    return ticket_count, upload_count
@@ -0,0 +1,218 @@
+"""
+Single-pass column profiler for uploaded ticket data
+
+A profile is built once per staged file, chunk by chunk, and cached next to
+the stage. It holds per-column null counts, approximate distinct counts
+(HyperLogLog), min/max, text length histograms and top values, so previews
+never need to rescan the data.
+"""
+import os
+import json
+import uuid
+import logging
+
+from utils.config import PROFILE_TOP_VALUES, PROFILE_BATCH_ROWS
+from utils.lazy import lazy_import
+
+# Loaded on first use to keep it off the page startup path
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+
+logger = logging.getLogger(__name__)
+
+# Lower edges of the text length histogram buckets (last bucket is open-ended)
+LENGTH_BINS = [0, 10, 25, 50, 100, 250, 500, 1000, 5000]
+
+# Columns parsed as dates before profiling, so min/max are real dates
+DATE_COLUMNS = ['created_at']
+
+
+class HyperLogLog:
+    """Approximate distinct counter (~1.6% standard error with p=12)"""
+
+    def __init__(self, p=12):
+        self.p = p
+        self.m = 1 << p
+        self.registers = np.zeros(self.m, dtype=np.uint8)
+
+    def add_hashes(self, hashes):
+        """Add 64-bit hashes (numpy uint64 array)"""
+        if len(hashes) == 0:
+            return
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        index = (hashes >> np.uint64(64 - self.p)).astype(np.int64)
+        rest = hashes & np.uint64((1 << (64 - self.p)) - 1)
+
+        # Rank = position of the leftmost 1-bit in the remaining 64-p bits
+        bit_length = np.frexp(rest.astype(np.float64))[1]
+        rank = (64 - self.p - bit_length + 1).astype(np.uint8)
+        np.maximum.at(self.registers, index, rank)
+
+    def add_series(self, series):
+        self.add_hashes(pd.util.hash_pandas_object(series.dropna(), index=False).to_numpy())
+
+    def merge(self, other):
+        np.maximum(self.registers, other.registers, out=self.registers)
+
+    def estimate(self):
+        alpha = 0.7213 / (1 + 1.079 / self.m)
+        raw = alpha * self.m ** 2 / np.sum(np.power(2.0, -self.registers.astype(np.float64)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if raw <= 2.5 * self.m and zeros:
+            # Small-range correction (linear counting)
+            return int(round(self.m * np.log(self.m / zeros)))
+        return int(round(raw))
+
+
+class ColumnProfile:
+    """Running statistics for one column"""
+
+    def __init__(self, name, top_k=PROFILE_TOP_VALUES):
+        self.name = name
+        self.top_k = top_k
+        self.dtype = None
+        self.count = 0
+        self.nulls = 0
+        self.minimum = None
+        self.maximum = None
+        self.hll = HyperLogLog()
+        self.length_hist = None
+        self.value_counts = {}
+
+    def update(self, series):
+        if self.dtype is None:
+            self.dtype = str(series.dtype)
+        self.count += len(series)
+        self.nulls += int(series.isna().sum())
+
+        values = series.dropna()
+        if values.empty:
+            return
+        self.hll.add_series(values)
+
+        is_text = pd.api.types.is_string_dtype(values) or isinstance(values.dtype, pd.CategoricalDtype)
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            values = values.astype(str)
+
+        try:
+            low, high = values.min(), values.max()
+            self.minimum = low if self.minimum is None else min(self.minimum, low)
+            self.maximum = high if self.maximum is None else max(self.maximum, high)
+        except TypeError:
+            pass  # Mixed types have no ordering
+
+        if is_text:
+            lengths = values.astype(str).str.len().to_numpy()
+            hist = np.histogram(lengths, bins=LENGTH_BINS + [np.inf])[0]
+            self.length_hist = hist if self.length_hist is None else self.length_hist + hist
+
+        # Keep a bounded candidate set so top values stay cheap on high-cardinality columns
+        for value, n in values.value_counts().head(self.top_k * 10).items():
+            self.value_counts[value] = self.value_counts.get(value, 0) + int(n)
+        if len(self.value_counts) > self.top_k * 20:
+            keep = sorted(self.value_counts.items(), key=lambda item: -item[1])[:self.top_k * 10]
+            self.value_counts = dict(keep)
+
+    def to_dict(self):
+        top = sorted(self.value_counts.items(), key=lambda item: -item[1])[:self.top_k]
+        return {
+            'column': self.name,
+            'dtype': self.dtype,
+            'count': self.count,
+            'nulls': self.nulls,
+            'null_pct': round(self.nulls / self.count * 100, 2) if self.count else 0.0,
+            'distinct_approx': self.hll.estimate(),
+            'min': _to_json_value(self.minimum),
+            'max': _to_json_value(self.maximum),
+            'length_histogram': (
+                dict(zip(_length_labels(), (int(n) for n in self.length_hist)))
+                if self.length_hist is not None else None
+            ),
+            'top_values': [[_to_json_value(v), n] for v, n in top]
+        }
+
+
+def _length_labels():
+    labels = [f"{low}-{high - 1}" for low, high in zip(LENGTH_BINS, LENGTH_BINS[1:])]
+    return labels + [f"{LENGTH_BINS[-1]}+"]
+
+
+def _to_json_value(value):
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return None
+    if isinstance(value, (pd.Timestamp, np.datetime64)):
+        return pd.Timestamp(value).isoformat()
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, (int, float, bool, str)):
+        return value
+    return str(value)
+
+
+def profile_batches(batches):
+    """
+    Profile a stream of DataFrame chunks in a single pass
+    Returns: dict with row_count and a list of column profiles
+    """
+    profiles = {}
+    row_count = 0
+
+    for batch in batches:
+        row_count += len(batch)
+        for col in batch.columns:
+            series = batch[col]
+            if col in DATE_COLUMNS:
+                series = pd.to_datetime(series, errors='coerce')
+            if col not in profiles:
+                profiles[col] = ColumnProfile(col)
+            profiles[col].update(series)
+
+    return {
+        'row_count': row_count,
+        'columns': [profile.to_dict() for profile in profiles.values()]
+    }
+
+
+def profile_frame(df, batch_size=PROFILE_BATCH_ROWS):
+    """Profile an in-memory DataFrame"""
+    return profile_batches(df.iloc[i:i + batch_size] for i in range(0, len(df), batch_size))
+
+
+def get_upload_profile(handle):
+    """
+    Profile of a staged upload, built on first request and cached with the stage
+    Returns: profile dict
+    """
+    from etl.staging import get_sidecar_path, iter_staged_batches
+
+    path = get_sidecar_path(handle['key'], 'profile.json')
+    if os.path.exists(path):
+        with open(path) as f:
+            return json.load(f)
+
+    profile = profile_batches(iter_staged_batches(handle, PROFILE_BATCH_ROWS))
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(profile, f)
+    os.replace(tmp_path, path)
+
+    logger.info(f"Profiled {handle['filename']} ({profile['row_count']} rows)")
+    return profile
+
+
+def profile_summary(profile):
+    """Compact per-column table for display"""
+    return pd.DataFrame([
+        {
+            'Column': c['column'],
+            'Type': c['dtype'],
+            'Missing': c['nulls'],
+            'Missing %': c['null_pct'],
+            'Distinct (≈)': c['distinct_approx'],
+            # Stringified: a column's min/max may mix types across columns
+            'Min': None if c['min'] is None else str(c['min']),
+            'Max': None if c['max'] is None else str(c['max']),
+            'Top Values': ", ".join(f"{v} ({n})" for v, n in c['top_values'][:3])
+        }
+        for c in profile['columns']
+    ])
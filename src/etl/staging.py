@@ -0,0 +1,203 @@
+"""
+Disk-backed staging store for uploaded files
+
+Raw uploads are parsed once and spilled to a local Parquet file named after
+the SHA-256 of the file contents. Sessions keep only a small handle (a dict)
+and read previews, columns or the full frame from disk when needed, so
+identical files opened by several users share one staged copy.
+"""
+import os
+import io
+import uuid
+import hashlib
+import logging
+
+from etl.frames import read_tickets_csv, compact_tickets
+from utils.config import STAGING_DIR, MAX_STAGED_UPLOADS, MAX_STAGING_MB
+from utils.lazy import lazy_import
+
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+pq = lazy_import('pyarrow.parquet')
+
+logger = logging.getLogger(__name__)
+
+
+def content_hash(data):
+    """SHA-256 hex digest of the raw file bytes"""
+    return hashlib.sha256(data).hexdigest()
+
+
+def get_stage_path(key, staging_dir=STAGING_DIR):
+    return os.path.join(staging_dir, f"{key}.parquet")
+
+
+def _parse_file(data, filename):
+    """Parse raw upload bytes into a compact DataFrame"""
+    if filename.lower().endswith('.csv'):
+        return read_tickets_csv(io.BytesIO(data))
+    return compact_tickets(pd.read_excel(io.BytesIO(data)))
+
+
+def _make_handle(key, filename, path):
+    metadata = pq.read_metadata(path)
+    return {
+        'key': key,
+        'filename': filename,
+        'row_count': metadata.num_rows,
+        'columns': [c for c in metadata.schema.to_arrow_schema().names
+                    if not c.startswith('__index_level_')],
+        'size_bytes': os.path.getsize(path)
+    }
+
+
+def stage_upload(data, filename, staging_dir=STAGING_DIR):
+    """
+    Stage raw file bytes, reusing an existing stage with the same content
+    Returns: handle dict (key, filename, row_count, columns, size_bytes)
+    """
+    key = content_hash(data)
+    path = get_stage_path(key, staging_dir)
+
+    try:
+        if os.path.exists(path):
+            touch_stage(key, staging_dir)
+            logger.info(f"Reusing staged upload {key[:12]} for {filename}")
+            return _make_handle(key, filename, path)
+
+        os.makedirs(staging_dir, exist_ok=True)
+        df = _parse_file(data, filename)
+
+        # Write to a private temp file, then atomically publish it; concurrent
+        # stagers of the same file produce identical content
+        tmp_path = os.path.join(staging_dir, f".{key}.{uuid.uuid4().hex}.tmp")
+        try:
+            # Small row groups keep previews and chunked reads cheap
+            df.to_parquet(tmp_path, index=False, compression='zstd', row_group_size=100000)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        del df
+
+        logger.info(f"Staged {filename} as {key[:12]}")
+        cleanup_stages(staging_dir, keep=key)
+        return _make_handle(key, filename, path)
+    except Exception as e:
+        logger.error(f"Failed to stage upload {filename}: {e}")
+        raise
+
+
+def stage_file(path, staging_dir=STAGING_DIR):
+    """Stage a file from local disk (e.g. the sample dataset)"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    return stage_upload(data, os.path.basename(path), staging_dir)
+
+
+def get_sidecar_path(key, suffix, staging_dir=STAGING_DIR):
+    """Path for a result cached alongside a stage, e.g. <key>.validation.json"""
+    return os.path.join(staging_dir, f"{key}.{suffix}")
+
+
+def touch_stage(key, staging_dir=STAGING_DIR):
+    """Mark a stage as recently used for LRU cleanup"""
+    try:
+        os.utime(get_stage_path(key, staging_dir))
+    except FileNotFoundError:
+        pass
+
+
+def _open_stage(handle, staging_dir):
+    path = get_stage_path(handle['key'], staging_dir)
+    if not os.path.exists(path):
+        raise FileNotFoundError(
+            f"Staged data for {handle['filename']} has expired, please upload it again"
+        )
+    touch_stage(handle['key'], staging_dir)
+    return path
+
+
+def read_preview(handle, n=10, staging_dir=STAGING_DIR):
+    """Read only the first n rows of a staged upload"""
+    parquet_file = pq.ParquetFile(_open_stage(handle, staging_dir))
+    for batch in parquet_file.iter_batches(batch_size=n):
+        return batch.to_pandas()
+    return pd.DataFrame(columns=handle['columns'])
+
+
+def read_columns(handle, columns, staging_dir=STAGING_DIR):
+    """Read a subset of columns from a staged upload"""
+    return pd.read_parquet(_open_stage(handle, staging_dir), columns=columns)
+
+
+def iter_staged_batches(handle, batch_size=100000, columns=None, staging_dir=STAGING_DIR):
+    """Yield a staged upload as DataFrame chunks of up to batch_size rows"""
+    parquet_file = pq.ParquetFile(_open_stage(handle, staging_dir))
+    for batch in parquet_file.iter_batches(batch_size=batch_size, columns=columns):
+        yield batch.to_pandas()
+
+
+def iter_sampled_row_groups(handle, max_groups, columns=None, seed=42, staging_dir=STAGING_DIR):
+    """
+    Yield up to max_groups randomly chosen row groups of a staged upload (in
+    file order) as DataFrames; the cost is bounded by max_groups, not by the
+    number of rows
+    """
+    parquet_file = pq.ParquetFile(_open_stage(handle, staging_dir))
+    rng = np.random.default_rng(seed)
+    chosen = sorted(rng.permutation(parquet_file.num_row_groups)[:max_groups])
+    for group in chosen:
+        yield parquet_file.read_row_group(int(group), columns=columns).to_pandas()
+
+
+def read_staged_frame(handle, staging_dir=STAGING_DIR):
+    """Read the full staged DataFrame"""
+    return pd.read_parquet(_open_stage(handle, staging_dir))
+
+
+def cleanup_stages(staging_dir=STAGING_DIR, max_stages=MAX_STAGED_UPLOADS,
+                   max_mb=MAX_STAGING_MB, keep=None):
+    """
+    Remove least recently used stages beyond the count and size limits
+    Returns: number of stages removed
+    """
+    if not os.path.isdir(staging_dir):
+        return 0
+
+    stages = []
+    for name in os.listdir(staging_dir):
+        if name.endswith('.parquet'):
+            path = os.path.join(staging_dir, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            stages.append((stat.st_mtime, stat.st_size, name[:-len('.parquet')], path))
+
+    # Newest first; everything after the limits is evicted
+    stages.sort(reverse=True)
+    max_bytes = max_mb * 1024 * 1024
+    kept_count, kept_bytes, removed = 0, 0, 0
+
+    for mtime, size, key, path in stages:
+        if key == keep or (kept_count < max_stages and kept_bytes + size <= max_bytes):
+            kept_count += 1
+            kept_bytes += size
+            continue
+        try:
+            os.remove(path)
+            removed += 1
+        except FileNotFoundError:
+            pass
+        # Sidecar results (validation, profile) belong to the stage
+        for name in os.listdir(staging_dir):
+            if name.startswith(key + '.') and not name.endswith('.parquet'):
+                try:
+                    os.remove(os.path.join(staging_dir, name))
+                except FileNotFoundError:
+                    pass
+
+    if removed:
+        logger.info(f"Evicted {removed} staged uploads")
+    return removed
@@ -1,10 +1,15 @@
 """
 Data transformation functions
 """
-import pandas as pd
 #for regex patterns
 import re
-from datetime import datetime
+
+from etl.frames import compact_tickets, fill_missing, string_dtype
+from etl.ids import take_ids, format_ticket_ids
+from utils.lazy import lazy_import
+
+# Loaded on first use to keep it off the page startup path
+pd = lazy_import('pandas')
 
 def clean_text(text):
     """Clean and normalize text"""
@@ -22,38 +27,48 @@ def clean_text(text):
     
     return text.strip()
 
-def transform_tickets(df):
+def transform_tickets(df, id_ranges=None):
     """
     Transform raw ticket data for database storage
-    Returns: cleaned DataFrame
+    id_ranges: ticket numbers reserved with etl.ids.reserve_ticket_ids, used
+               for rows without a ticket_id (see etl.ids.count_missing_ids)
+    Returns: cleaned DataFrame (the input frame is left untouched)
     """
-    df = df.copy()
+    # Shallow copy: columns are replaced below, never written into,
+    # so the caller's data does not need to be duplicated
+    df = df.copy(deep=False)
     
     # 1. Parse dates
     df['created_at'] = pd.to_datetime(df['created_at'])
     
     # 2. Clean text
-    df['text'] = df['text'].apply(clean_text)
+    df['text'] = df['text'].apply(clean_text).astype(string_dtype())
     
     # 3. Generate ticket_id if missing
-    if 'ticket_id' not in df.columns or df['ticket_id'].isna().any():
-        # Generate IDs for missing ones
-        max_id = 100000
-        for idx in df[df['ticket_id'].isna()].index:
-            df.loc[idx, 'ticket_id'] = f'TKT-{max_id}'
-            max_id += 1
+    if 'ticket_id' not in df.columns:
+        df['ticket_id'] = pd.Series(pd.NA, index=df.index, dtype=string_dtype())
+    
+    missing = df['ticket_id'].isna()
+    if missing.any():
+        if id_ranges is None:
+            raise ValueError(
+                f"{missing.sum()} tickets have no ticket_id; reserve IDs with reserve_ticket_ids()"
+            )
+        ticket_ids = df['ticket_id'].astype(string_dtype())
+        ticket_ids[missing] = format_ticket_ids(take_ids(id_ranges, int(missing.sum()))).to_numpy()
+        df['ticket_id'] = ticket_ids
     
     # 4. Add computed fields
     df['text_length'] = df['text'].str.len()
-    df['created_date'] = df['created_at'].dt.date
-    df['created_month'] = df['created_at'].dt.strftime('%Y-%m')
+    df['created_date'] = df['created_at'].dt.normalize()
+    df['created_month'] = df['created_at'].dt.strftime('%Y-%m').astype('category')
     
     # 5. Standardize column names (map to our schema)
     column_mapping = {
         'text': 'text_content',
         'priority': 'original_priority'
     }
-    df = df.rename(columns=column_mapping)
+    df = df.rename(columns=column_mapping, copy=False)
     
     # 6. Fill missing optional fields
     optional_fills = {
@@ -66,32 +81,27 @@ def transform_tickets(df):
     
     for col, fill_value in optional_fills.items():
         if col in df.columns:
-            df[col] = df[col].fillna(fill_value)
-    
-    # 7. Add metadata
-    df['last_updated'] = datetime.now()
+            fill_missing(df, col, fill_value)
     
-    return df
+    return compact_tickets(df)
 
 def prepare_for_database(df, upload_id):
     """
     Prepare DataFrame for database insertion
     """
-    df = df.copy()
-    
-    # Add upload_id
-    df['upload_id'] = upload_id
-    
     # Select only columns that exist in database schema
     db_columns = [
         'ticket_id', 'upload_id', 'created_at', 'text_content',
         'product', 'channel', 'original_priority', 'customer_tier',
-        'customer_id', 'text_length', 'created_date', 'created_month',
-        'last_updated'
+        'customer_id', 'text_length', 'created_date', 'created_month'
     ]
     
-    # Keep only columns that exist in both df and db_columns
-    final_columns = [col for col in db_columns if col in df.columns]
+    # Keep only columns that exist in both df and db_columns;
+    # column selection already returns a new frame, so no extra copy
+    final_columns = [col for col in db_columns if col in df.columns and col != 'upload_id']
     df = df[final_columns]
     
-    return df
\ No newline at end of file
+    # Add upload_id
+    df.insert(1, 'upload_id', upload_id)
+    
+    return df
@@ -0,0 +1,111 @@
+"""
+LLM backends for theme labeling
+
+All backends expose the same async `complete(prompt)` coroutine. The stub
+backend is deterministic and runs fully offline, so batching, concurrency
+and caching can be exercised without network access.
+"""
+import re
+import json
+import asyncio
+import logging
+from collections import Counter
+
+from utils.config import LLM_BACKEND, LLM_MODEL
+
+logger = logging.getLogger(__name__)
+
+# Words ignored when the stub backend names a theme from its examples
+STUB_STOPWORDS = {
+    'the', 'a', 'an', 'and', 'or', 'to', 'of', 'for', 'with', 'on', 'in', 'is',
+    'my', 'me', 'i', 'im', 'it', 'this', 'that', 'have', 'has', 'been', 'be',
+    'not', 'no', 'but', 'about', 'can', 'you', 'please', 'hi', 'hello', 'help',
+    'need', 'issue', 'problem', 'having', 'experiencing', 'assistance', 'there',
+    'someone', 'writing', 'because', 'already', 'before', 'again', 'times'
+}
+
+
+class LLMBackend:
+    """Base class for completion backends"""
+
+    name = 'base'
+
+    def __init__(self, model=LLM_MODEL):
+        self.model = model
+
+    async def complete(self, prompt):
+        """Returns: completion text"""
+        raise NotImplementedError
+
+
+class StubBackend(LLMBackend):
+    """
+    Deterministic offline backend: names each theme after its most frequent
+    keywords. `latency` simulates per-request round-trip time in seconds.
+    """
+
+    name = 'stub'
+
+    def __init__(self, model='stub', latency=0.05):
+        super().__init__(model)
+        self.latency = latency
+        self.calls = 0
+
+    async def complete(self, prompt):
+        self.calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        themes = json.loads(prompt[prompt.index('<themes>') + 8:prompt.index('</themes>')])
+        labels = []
+        for theme in themes:
+            words = list(theme.get('keywords') or [])
+            if len(words) < 2:
+                counts = Counter(
+                    w for example in theme.get('examples', [])
+                    for w in re.findall(r'[a-z]+', example.lower())
+                    if w not in STUB_STOPWORDS and len(w) > 2
+                )
+                words += [w for w, _ in counts.most_common(3) if w not in words]
+            name = " ".join(w.title() for w in words[:2]) or f"Theme {theme['theme_number']}"
+            labels.append({
+                'theme_number': theme['theme_number'],
+                'name': name,
+                'description': f"Tickets mentioning {', '.join(words[:4]) or 'varied topics'}."
+            })
+        return json.dumps(labels)
+
+
+class OpenAIBackend(LLMBackend):
+    """OpenAI chat completions (requires the optional `openai` package)"""
+
+    name = 'openai'
+
+    def __init__(self, model=LLM_MODEL):
+        super().__init__(model)
+        try:
+            from openai import AsyncOpenAI
+        except ImportError:
+            raise ImportError("LLM_BACKEND=openai requires the 'openai' package (pip install openai)")
+        self.client = AsyncOpenAI()
+
+    async def complete(self, prompt):
+        response = await self.client.chat.completions.create(
+            model=self.model,
+            messages=[{'role': 'user', 'content': prompt}],
+            temperature=0
+        )
+        return response.choices[0].message.content
+
+
+BACKENDS = {
+    'stub': StubBackend,
+    'openai': OpenAIBackend
+}
+
+
+def get_backend(name=LLM_BACKEND, **kwargs):
+    """Create a backend by name"""
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown LLM backend: {name} (choose from {list(BACKENDS)})")
+    return BACKENDS[name](**kwargs)
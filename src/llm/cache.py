@@ -0,0 +1,43 @@
+"""
+On-disk cache of LLM responses keyed by prompt hash
+"""
+import os
+import json
+import uuid
+import hashlib
+
+from utils.config import LLM_CACHE_DIR
+
+
+class ResponseCache:
+    """One JSON file per (backend, model, prompt), sharded by hash prefix"""
+
+    def __init__(self, cache_dir=LLM_CACHE_DIR):
+        self.cache_dir = cache_dir
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(backend_name, model, prompt):
+        payload = f"{backend_name}\x1f{model}\x1f{prompt}"
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def get(self, key):
+        path = self._path(key)
+        if not os.path.exists(path):
+            self.misses += 1
+            return None
+        with open(path) as f:
+            self.hits += 1
+            return json.load(f)['response']
+
+    def set(self, key, response):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({'response': response}, f)
+        os.replace(tmp_path, path)
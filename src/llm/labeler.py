@@ -0,0 +1,211 @@
+"""
+Batched, cached and concurrent theme labeling
+
+Themes are grouped several per prompt, prompts run concurrently under a
+semaphore and a requests-per-minute limit, and every response is cached on
+disk by prompt hash so re-labeling an unchanged upload makes no requests.
+"""
+import json
+import time
+import asyncio
+import logging
+
+from sqlalchemy import text
+
+from llm.backends import get_backend
+from llm.cache import ResponseCache
+from utils.config import (
+    LLM_MAX_CONCURRENCY,
+    LLM_REQUESTS_PER_MINUTE,
+    LLM_THEMES_PER_REQUEST,
+    LLM_EXAMPLES_PER_THEME
+)
+
+logger = logging.getLogger(__name__)
+
+PROMPT_TEMPLATE = """You are labeling clusters of customer support tickets.
+For each theme below, write a short name (2-5 words) and a one-sentence description
+based on its keywords and example tickets.
+
+Respond with only a JSON array of objects with keys "theme_number", "name" and "description".
+
+<themes>{themes}</themes>"""
+
+
+class RateLimiter:
+    """Async limiter spacing request starts to at most `per_minute` per minute"""
+
+    def __init__(self, per_minute=LLM_REQUESTS_PER_MINUTE):
+        self.interval = 60.0 / per_minute if per_minute else 0.0
+        self._next_slot = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            now = time.monotonic()
+            wait = self._next_slot - now
+            self._next_slot = max(now, self._next_slot) + self.interval
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+def build_prompts(themes, themes_per_request=LLM_THEMES_PER_REQUEST):
+    """
+    Group themes into prompts
+    themes: list of dicts with theme_number, keywords and examples
+    Returns: list of prompt strings
+    """
+    prompts = []
+    for start in range(0, len(themes), themes_per_request):
+        batch = themes[start:start + themes_per_request]
+        prompts.append(PROMPT_TEMPLATE.format(themes=json.dumps(batch, ensure_ascii=False)))
+    return prompts
+
+
+def parse_labels(response):
+    """Extract the JSON array of labels from a model response"""
+    start, end = response.find('['), response.rfind(']')
+    if start == -1 or end == -1:
+        raise ValueError(f"No JSON array in LLM response: {response[:200]}")
+    return json.loads(response[start:end + 1])
+
+
+class ThemeLabeler:
+    """Labels themes with an LLM backend"""
+
+    def __init__(self, backend=None, cache=None,
+                 max_concurrency=LLM_MAX_CONCURRENCY,
+                 requests_per_minute=LLM_REQUESTS_PER_MINUTE,
+                 themes_per_request=LLM_THEMES_PER_REQUEST):
+        self.backend = backend or get_backend()
+        self.cache = cache or ResponseCache()
+        self.max_concurrency = max_concurrency
+        self.requests_per_minute = requests_per_minute
+        self.themes_per_request = themes_per_request
+
+    async def _complete(self, prompt, semaphore, limiter):
+        key = self.cache.key(self.backend.name, self.backend.model, prompt)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+
+        async with semaphore:
+            await limiter.acquire()
+            response = await self.backend.complete(prompt)
+
+        # Only cache responses we can use
+        parse_labels(response)
+        self.cache.set(key, response)
+        return response
+
+    async def label_async(self, themes):
+        """
+        Label themes concurrently
+        Returns: list of dicts with theme_number, name, description
+        """
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        limiter = RateLimiter(self.requests_per_minute)
+        prompts = build_prompts(themes, self.themes_per_request)
+
+        responses = await asyncio.gather(
+            *(self._complete(prompt, semaphore, limiter) for prompt in prompts)
+        )
+
+        labels = []
+        for response in responses:
+            labels.extend(parse_labels(response))
+        return labels
+
+    def label(self, themes):
+        """Synchronous wrapper around label_async"""
+        started = time.perf_counter()
+        labels = asyncio.run(self.label_async(themes))
+        logger.info(
+            f"Labeled {len(themes)} themes in {time.perf_counter() - started:.2f}s "
+            f"(cache hits {self.cache.hits}, misses {self.cache.misses})"
+        )
+        return labels
+
+
+def get_theme_inputs(db_manager, upload_id, examples_per_theme=LLM_EXAMPLES_PER_THEME):
+    """
+    Keywords and most representative tickets for each theme of an upload
+    Returns: list of dicts with theme_number, keywords, examples
+    """
+    query = """
+    SELECT th.theme_number, th.keywords, ex.text_content
+    FROM themes th
+    LEFT JOIN LATERAL (
+        SELECT t.text_content
+        FROM tickets t
+        WHERE t.upload_id = th.upload_id
+          AND t.assigned_theme_id = th.theme_id
+        ORDER BY t.theme_confidence DESC NULLS LAST, t.ticket_id
+        LIMIT :examples
+    ) ex ON TRUE
+    WHERE th.upload_id = :upload_id
+    ORDER BY th.theme_number
+    """
+    rows = db_manager.execute_query(query, {'upload_id': upload_id, 'examples': examples_per_theme})
+
+    themes = {}
+    for theme_number, keywords, example in rows:
+        theme = themes.setdefault(theme_number, {
+            'theme_number': theme_number,
+            'keywords': list(keywords or []),
+            'examples': []
+        })
+        if example:
+            theme['examples'].append(example[:500])
+    return list(themes.values())
+
+
+def write_theme_labels(db_manager, upload_id, labels):
+    """Write names and descriptions for all themes of an upload in one statement"""
+    query = """
+    UPDATE themes t
+    SET theme_name = l.name,
+        theme_description = l.description
+    FROM jsonb_to_recordset(CAST(:payload AS JSONB)) AS l(
+        theme_number INTEGER,
+        name TEXT,
+        description TEXT
+    )
+    WHERE t.upload_id = :upload_id
+      AND t.theme_number = l.theme_number
+    """
+    # Keep the denormalized name on tickets in step with the theme
+    tickets_query = """
+    UPDATE tickets t
+    SET assigned_theme_name = th.theme_name
+    FROM themes th
+    WHERE th.upload_id = :upload_id
+      AND t.assigned_theme_id = th.theme_id
+      AND t.assigned_theme_name IS DISTINCT FROM th.theme_name
+    """
+    params = {'upload_id': upload_id, 'payload': json.dumps(labels)}
+    try:
+        with db_manager.get_connection() as conn:
+            result = conn.execute(text(query), params)
+            conn.execute(text(tickets_query), params)
+            conn.commit()
+            logger.info(f"Updated labels for {result.rowcount} themes of upload {upload_id}")
+            return result.rowcount
+    except Exception as e:
+        logger.error(f"Failed to write theme labels: {e}")
+        raise
+
+
+def label_upload_themes(db_manager, upload_id, labeler=None):
+    """
+    Label every theme of an upload and store the results
+    Returns: list of labels
+    """
+    db_manager.require_postgresql("Theme labeling")
+    themes = get_theme_inputs(db_manager, upload_id)
+    if not themes:
+        return []
+
+    labels = (labeler or ThemeLabeler()).label(themes)
+    write_theme_labels(db_manager, upload_id, labels)
+    return labels
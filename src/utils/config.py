@@ -23,4 +23,120 @@ MIN_THEMES = 5
 MAX_THEMES = 15
 
 # Date format
-DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
\ No newline at end of file
+DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# Similar-ticket index
+VECTOR_STORE_DIR = os.getenv('VECTOR_STORE_DIR', 'data/vectors')
+EMBEDDING_DIM = int(os.getenv('EMBEDDING_DIM', '128'))
+LSH_NUM_TABLES = 8
+LSH_NUM_BITS = 16
+
+# Upload staging
+STAGING_DIR = os.getenv('STAGING_DIR', 'data/staging')
+MAX_STAGED_UPLOADS = int(os.getenv('MAX_STAGED_UPLOADS', '20'))
+MAX_STAGING_MB = int(os.getenv('MAX_STAGING_MB', '2048'))
+
+# Background jobs: running jobs refresh jobs.heartbeat_at this often and are
+# requeued once the heartbeat is older than JOB_STALE_MINUTES
+JOB_HEARTBEAT_SECONDS = 30
+JOB_STALE_MINUTES = 5
+
+# Theme trends
+TREND_WINDOW_WEEKS = 8
+TREND_MOVING_AVG_DAYS = 7
+
+# Exports
+EXPORT_DIR = os.getenv('EXPORT_DIR', 'data/exports')
+EXPORT_CHUNK_ROWS = 50000
+# Larger exports are not offered as in-browser downloads (st.download_button
+# holds the whole file in server memory); they stay in EXPORT_DIR
+EXPORT_DOWNLOAD_MAX_MB = int(os.getenv('EXPORT_DOWNLOAD_MAX_MB', '200'))
+
+# Streaming reads (rows fetched per round trip from server-side cursors)
+STREAM_YIELD_PER = int(os.getenv('STREAM_YIELD_PER', '10000'))
+
+# Validation
+VALIDATION_SAMPLE_SIZE = 10000
+VALIDATION_BATCH_ROWS = 100000
+# The quick verdict samples rows from at most this many staged row groups
+# (100,000 rows each), so its cost does not grow with the file
+VALIDATION_SAMPLE_ROW_GROUPS = 4
+
+# Column profiling
+PROFILE_TOP_VALUES = 10
+PROFILE_BATCH_ROWS = 100000
+
+# LLM theme labeling
+LLM_BACKEND = os.getenv('LLM_BACKEND', 'stub')
+LLM_MODEL = os.getenv('LLM_MODEL', 'gpt-4o-mini')
+LLM_CACHE_DIR = os.getenv('LLM_CACHE_DIR', 'data/llm_cache')
+LLM_MAX_CONCURRENCY = int(os.getenv('LLM_MAX_CONCURRENCY', '4'))
+LLM_REQUESTS_PER_MINUTE = int(os.getenv('LLM_REQUESTS_PER_MINUTE', '60'))
+LLM_THEMES_PER_REQUEST = 5
+LLM_EXAMPLES_PER_THEME = 5
+
+# Dashboard charts: maximum points sent to the browser per chart
+CHART_MAX_POINTS = 1000
+CHART_MAX_SERIES = 8
+# Aggregate this many times finer than the budget, then downsample with LTTB
+CHART_OVERSAMPLE = 4
+
+# Cold storage: uploads older than this are moved to Parquet under ARCHIVE_DIR
+ARCHIVE_DIR = os.getenv('ARCHIVE_DIR', 'data/archive')
+ARCHIVE_RETENTION_DAYS = int(os.getenv('ARCHIVE_RETENTION_DAYS', '180'))
+ARCHIVE_ROWS_PER_FILE = 500000
+
+# Generated ticket IDs (for rows uploaded without one): numbers come from
+# ticket_id_seq in blocks of TICKET_ID_BLOCK_SIZE. The schema creates the
+# sequence with this INCREMENT BY; an existing database keeps the value it
+# was created with until the sequence is altered
+TICKET_ID_PREFIX = os.getenv('TICKET_ID_PREFIX', 'TKT-G')
+TICKET_ID_BLOCK_SIZE = 1000
+
+# Connection pool (per process). Size these from scripts/load_test.py
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '5'))
+DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', '10'))
+DB_POOL_TIMEOUT = int(os.getenv('DB_POOL_TIMEOUT', '30'))
+DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', '1800'))
+# Pool sizing target: 95th percentile wait for a connection, in milliseconds
+DB_POOL_TARGET_WAIT_MS = 20
+
+# Theme count selection (MIN_THEMES..MAX_THEMES fitted in parallel)
+THEME_MODEL_DIR = os.getenv('THEME_MODEL_DIR', 'data/models')
+THEME_SELECTION_JOBS = int(os.getenv('THEME_SELECTION_JOBS', '-1'))  # -1 = all cores
+THEME_SELECTION_SAMPLE_SIZE = 5000
+THEME_COHERENCE_TOP_TERMS = 10
+# Share of the selection score given to coherence (the rest is silhouette)
+THEME_COHERENCE_WEIGHT = 0.3
+
+# Volume anomaly detection (EWMA of daily counts per theme/channel/product)
+ANOMALY_DIMENSIONS = {
+    'theme': 'assigned_theme_name',
+    'channel': 'channel',
+    'product': 'product'
+}
+ANOMALY_EWMA_ALPHA = 0.1
+ANOMALY_Z_THRESHOLD = 4.0
+ANOMALY_WARMUP_DAYS = 14
+# Ignore spikes below this many tickets/day and floor the std at ANOMALY_MIN_STD
+ANOMALY_MIN_COUNT = 5
+ANOMALY_MIN_STD = 1.0
+
+# Ticket browser (keyset pagination)
+BROWSE_PAGE_SIZE = 50
+BROWSE_MAX_PAGE_SIZE = 500
+# Severity at or above which tickets are in the high-severity queue
+# (the predicate of the partial index idx_triage_high_severity is generated
+# from it; recreate that index after changing it)
+HIGH_SEVERITY_THRESHOLD = 4
+
+# Theme keywords (c-TF-IDF over a per-upload document-term matrix cached in THEME_MODEL_DIR)
+KEYWORD_TOP_N = 10
+# Longest n-gram counted when the matrix is built; extraction can restrict to shorter ones
+KEYWORD_MAX_NGRAM = 2
+KEYWORD_MIN_DF = 2
+KEYWORD_MAX_DF = 0.5  # share of tickets; more common terms are not keywords
+# Uploads with at least this many tickets drop terms below KEYWORD_MIN_DF
+# when the matrix is built (one-off terms dominate large vocabularies);
+# asking for a lower min_df rebuilds it
+KEYWORD_PRUNE_MIN_DOCS = 100
@@ -0,0 +1,11 @@
+"""
+Process-wide resources shared by all Streamlit sessions
+"""
+import streamlit as st
+
+
+@st.cache_resource(show_spinner=False)
+def get_cached_db_manager():
+    """One DatabaseManager (and connection pool) for the whole server"""
+    from database.connection import get_db_manager
+    return get_db_manager()
@@ -1,10 +1,30 @@
 """
 Data validation functions for uploaded files
 """
-import pandas as pd
+import os
+import json
+import math
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 import re
 
+from utils.config import (
+    VALIDATION_SAMPLE_SIZE,
+    VALIDATION_BATCH_ROWS,
+    VALIDATION_SAMPLE_ROW_GROUPS,
+    MAX_STAGED_UPLOADS
+)
+from utils.lazy import lazy_import
+
+# Loaded on first use to keep it off the page startup path
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+
+logger = logging.getLogger(__name__)
+
 class DataValidator:
     """Validates uploaded ticket data"""
     
@@ -63,7 +83,7 @@ class DataValidator:
         
         if 'text' in df.columns:
             # Check if text column contains strings
-            if not df['text'].dtype == 'object':
+            if not pd.api.types.is_string_dtype(df['text']):
                 self.warnings.append("'text' column should contain text data")
     
     def _check_missing_values(self, df):
@@ -142,4 +162,270 @@ def validate_ticket_data(df):
     is_valid, errors, warnings = validator.validate_file(df)
     report = validator.get_validation_report()
     
-    return is_valid, report
\ No newline at end of file
+    return is_valid, report
+
+# ============================================================================
+# Sampled, memoized and chunked validation for large staged uploads
+# ============================================================================
+
+# Row-level checks: (count key, severity, message template)
+ROW_CHECKS = [
+    ('missing_created_at', 'error', "Column 'created_at' has {count} missing values"),
+    ('missing_text', 'error', "Column 'text' has {count} missing values"),
+    ('invalid_dates', 'error', "{count} tickets have an invalid date format in 'created_at'"),
+    ('empty_text', 'error', "{count} tickets have empty text"),
+    ('short_text', 'warning', "{count} tickets have very short text (<10 characters)"),
+    ('future_dates', 'warning', "{count} tickets have future dates"),
+    ('old_dates', 'warning', "{count} tickets are older than 2020"),
+]
+
+# Keyed by staged-file key; only MAX_STAGED_UPLOADS files stay staged, so
+# older entries are evicted least recently used first
+_validation_memo = OrderedDict()
+_validation_runs = OrderedDict()
+_validation_lock = threading.Lock()
+_validation_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='validation')
+
+
+def _lru_get(cache, key):
+    value = cache.get(key)
+    if value is not None:
+        cache.move_to_end(key)
+    return value
+
+
+def _lru_put(cache, key, value, max_entries=MAX_STAGED_UPLOADS):
+    cache[key] = value
+    cache.move_to_end(key)
+    while len(cache) > max_entries:
+        cache.popitem(last=False)
+
+
+def count_issues(df):
+    """
+    Count rows failing each row-level check in a chunk
+    Returns: dict of count key -> number of rows (plus 'rows')
+    """
+    counts = {key: 0 for key, _, _ in ROW_CHECKS}
+    counts['rows'] = len(df)
+
+    if 'created_at' in df.columns:
+        raw_dates = df['created_at']
+        dates = pd.to_datetime(raw_dates, errors='coerce')
+        counts['missing_created_at'] = int(raw_dates.isna().sum())
+        counts['invalid_dates'] = int((dates.isna() & raw_dates.notna()).sum())
+        counts['future_dates'] = int((dates > datetime.now()).sum())
+        counts['old_dates'] = int((dates < datetime(2020, 1, 1)).sum())
+
+    if 'text' in df.columns:
+        texts = df['text']
+        counts['missing_text'] = int(texts.isna().sum())
+        counts['short_text'] = int((texts.str.len() < 10).sum())
+        counts['empty_text'] = int((texts.str.strip() == '').sum())
+
+    return counts
+
+
+def _merge_counts(total, counts):
+    for key, value in counts.items():
+        total[key] = total.get(key, 0) + value
+    return total
+
+
+def _report_from_counts(columns, counts):
+    """Build (is_valid, report) with the same layout as DataValidator"""
+    validator = DataValidator()
+    missing_cols = [col for col in validator.REQUIRED_COLUMNS if col not in columns]
+    if missing_cols:
+        validator.errors.append(f"Missing required columns: {missing_cols}")
+
+    for key, severity, message in ROW_CHECKS:
+        if counts.get(key, 0) > 0:
+            target = validator.errors if severity == 'error' else validator.warnings
+            target.append(message.format(count=counts[key]))
+
+    return len(validator.errors) == 0, validator.get_validation_report()
+
+
+def _proportion_interval(count, n, z=1.96):
+    """Wilson score interval for a proportion"""
+    if n == 0:
+        return 0.0, 1.0
+    p = count / n
+    denom = 1 + z ** 2 / n
+    centre = (p + z ** 2 / (2 * n)) / denom
+    margin = z * math.sqrt(p * (1 - p) / n + z ** 2 / (4 * n ** 2)) / denom
+    return max(0.0, centre - margin), min(1.0, centre + margin)
+
+
+def reservoir_sample(batches, k, seed=42):
+    """
+    Uniform sample of k rows from a stream of DataFrame chunks (Algorithm R,
+    vectorized per chunk)
+    """
+    rng = np.random.default_rng(seed)
+    reservoir = None
+    seen = 0
+
+    for batch in batches:
+        # Object columns so replaced values never clash with per-chunk dtypes
+        batch = batch.reset_index(drop=True).astype(object)
+        if reservoir is None:
+            reservoir = batch.iloc[:0]
+
+        # Fill the reservoir first
+        need = k - len(reservoir)
+        if need > 0:
+            reservoir = pd.concat([reservoir, batch.iloc[:need]], ignore_index=True)
+            seen += min(need, len(batch))
+            batch = batch.iloc[need:]
+
+        if len(batch):
+            # Row i of the stream replaces slot j ~ U[0, i] when j < k; later
+            # rows win on duplicate slots, as in the sequential algorithm
+            positions = np.arange(seen, seen + len(batch))
+            slots = (rng.random(len(batch)) * (positions + 1)).astype(np.int64)
+            keep = slots < k
+            reservoir.iloc[slots[keep]] = batch[keep].to_numpy()
+            seen += len(batch)
+
+    return reservoir if reservoir is not None else pd.DataFrame()
+
+
+def validate_sample(handle, sample_size=VALIDATION_SAMPLE_SIZE, max_row_groups=VALIDATION_SAMPLE_ROW_GROUPS):
+    """
+    Instant verdict from a sample of a staged upload: rows are reservoir-sampled
+    from up to max_row_groups randomly chosen row groups, so large files are
+    not read in full (the exhaustive check is validate_staged_upload)
+    Returns: dict with is_valid, report and per-check estimates
+             (rate, 95% interval, estimated rows)
+    """
+    from etl.staging import iter_sampled_row_groups
+
+    columns = [c for c in ('created_at', 'text') if c in handle['columns']]
+    sample = reservoir_sample(
+        iter_sampled_row_groups(handle, max_row_groups, columns=columns), sample_size
+    )
+    counts = count_issues(sample)
+    n, total = counts['rows'], handle['row_count']
+
+    estimates = {}
+    for key, severity, _ in ROW_CHECKS:
+        low, high = _proportion_interval(counts[key], n)
+        estimates[key] = {
+            'severity': severity,
+            'sample_count': counts[key],
+            'rate': counts[key] / n if n else 0.0,
+            'rate_low': low,
+            'rate_high': high,
+            'estimated_rows': round(counts[key] / n * total) if n else 0
+        }
+
+    is_valid, report = _report_from_counts(handle['columns'], counts)
+    return {
+        'is_valid': is_valid,
+        'report': report,
+        'sample_size': n,
+        'row_count': total,
+        'estimates': estimates
+    }
+
+
+def _memo_path(key):
+    from etl.staging import get_sidecar_path
+    return get_sidecar_path(key, 'validation.json')
+
+
+def get_cached_validation(handle):
+    """
+    Full validation result memoized by content hash
+    Returns: dict (is_valid, report, counts) or None if not validated yet
+    """
+    key = handle['key']
+    with _validation_lock:
+        result = _lru_get(_validation_memo, key)
+    if result is not None:
+        return result
+
+    path = _memo_path(key)
+    if os.path.exists(path):
+        with open(path) as f:
+            result = json.load(f)
+        with _validation_lock:
+            _lru_put(_validation_memo, key, result)
+        return result
+    return None
+
+
+def validate_staged_upload(handle, progress=None):
+    """
+    Exhaustive chunked validation of a staged upload, memoized by content hash
+    progress: optional dict updated in place with rows_done and running counts
+    Returns: dict (is_valid, report, counts)
+    """
+    from etl.staging import iter_staged_batches
+
+    cached = get_cached_validation(handle)
+    if cached is not None:
+        return cached
+
+    columns = [c for c in ('created_at', 'text') if c in handle['columns']]
+    totals = {}
+    for batch in iter_staged_batches(handle, VALIDATION_BATCH_ROWS, columns=columns):
+        _merge_counts(totals, count_issues(batch))
+        if progress is not None:
+            progress['rows_done'] = totals['rows']
+            progress['counts'] = dict(totals)
+
+    is_valid, report = _report_from_counts(handle['columns'], totals)
+    result = {'is_valid': is_valid, 'report': report, 'counts': totals}
+
+    path = _memo_path(handle['key'])
+    tmp_path = f"{path}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(result, f)
+    os.replace(tmp_path, path)
+    with _validation_lock:
+        _lru_put(_validation_memo, handle['key'], result)
+    return result
+
+
+def start_full_validation(handle):
+    """
+    Run the exhaustive validation in a background thread; sessions validating
+    the same file share one run
+    Returns: progress dict (status, rows_done, row_count, counts, result, error)
+    """
+    key = handle['key']
+    with _validation_lock:
+        run = _lru_get(_validation_runs, key)
+        if run is not None and run['status'] != 'failed':
+            return run
+
+        run = {
+            'status': 'running',
+            'rows_done': 0,
+            'row_count': handle['row_count'],
+            'counts': {},
+            'result': None,
+            'error': None
+        }
+        _lru_put(_validation_runs, key, run)
+
+    def _run():
+        try:
+            run['result'] = validate_staged_upload(handle, progress=run)
+            run['rows_done'] = run['row_count']
+            run['status'] = 'completed'
+        except Exception as e:
+            logger.error(f"Background validation failed: {e}")
+            run['error'] = str(e)
+            run['status'] = 'failed'
+
+    cached = get_cached_validation(handle)
+    if cached is not None:
+        run.update(status='completed', rows_done=handle['row_count'],
+                   counts=cached['counts'], result=cached)
+    else:
+        _validation_executor.submit(_run)
+    return run
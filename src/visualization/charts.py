@@ -0,0 +1,70 @@
+"""
+Plotly figures for the dashboard
+
+Figures are built only from pre-aggregated, downsampled frames produced by
+visualization.timeseries, so their size is bounded by the point budget.
+"""
+from utils.lazy import lazy_import
+
+go = lazy_import('plotly.graph_objects')
+
+SEVERITY_COLORSCALE = 'YlOrRd'
+
+
+def volume_figure(df, bucket_label=None, title="Ticket volume"):
+    """
+    Line chart of tickets per bucket, one trace per series
+    df: output of get_volume_series
+    """
+    fig = go.Figure()
+    for series, group in df.groupby('series', sort=False):
+        # WebGL traces keep panning smooth even at the full point budget
+        fig.add_trace(go.Scattergl(
+            x=group['bucket'],
+            y=group['tickets'],
+            mode='lines',
+            name=str(series),
+            customdata=group[['avg_severity']].to_numpy(),
+            hovertemplate=(
+                "%{x}<br>%{y:,} tickets<br>Avg severity %{customdata[0]:.2f}"
+                f"<extra>{series}</extra>"
+            )
+        ))
+
+    fig.update_layout(
+        title=title,
+        xaxis_title=f"Created ({bucket_label} buckets)" if bucket_label else "Created",
+        yaxis_title="Tickets",
+        hovermode='x unified',
+        legend=dict(orientation='h', yanchor='bottom', y=1.02, x=0),
+        margin=dict(l=40, r=20, t=60, b=40)
+    )
+    return fig
+
+
+def theme_totals_figure(df, title="Tickets by theme"):
+    """
+    Horizontal bar chart of ticket counts per theme, colored by average severity
+    df: output of get_theme_totals
+    """
+    df = df.iloc[::-1]  # Largest theme at the top
+    fig = go.Figure(go.Bar(
+        x=df['tickets'],
+        y=df['theme'],
+        orientation='h',
+        marker=dict(
+            color=df['avg_severity'],
+            colorscale=SEVERITY_COLORSCALE,
+            cmin=1,
+            cmax=5,
+            colorbar=dict(title="Avg severity")
+        ),
+        hovertemplate="%{y}<br>%{x:,} tickets<extra></extra>"
+    ))
+    fig.update_layout(
+        title=title,
+        xaxis_title="Tickets",
+        margin=dict(l=40, r=20, t=60, b=40),
+        height=max(300, 28 * len(df) + 120)
+    )
+    return fig
@@ -0,0 +1,267 @@
+"""
+Chart data layer: SQL time bucketing and LTTB downsampling
+
+Time-series charts never receive per-ticket rows. The bucket width is picked
+from the viewport so the database returns at most a few thousand buckets per
+series, and long series are then reduced with Largest-Triangle-Three-Buckets,
+which keeps peaks and dips that plain striding would drop. Every payload stays
+within CHART_MAX_POINTS regardless of how many tickets are in range.
+
+Charts read the tickets table only: tickets of archived uploads (see
+etl/archive.py) are not included. Theme trend metrics are unaffected, they
+come from theme_daily_counts, which is kept when an upload is archived.
+"""
+import logging
+
+from utils.config import CHART_MAX_POINTS, CHART_MAX_SERIES, CHART_OVERSAMPLE
+from utils.lazy import lazy_import
+
+# Loaded on first use to keep them off the page startup path
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+
+logger = logging.getLogger(__name__)
+
+# Bucket ladder, finest first: label, approximate width in seconds,
+# date_trunc unit (None = fixed-width epoch buckets) and pandas frequency
+BUCKETS = [
+    {'label': '1 minute', 'seconds': 60, 'trunc': 'minute', 'freq': 'min'},
+    {'label': '5 minutes', 'seconds': 300, 'trunc': None, 'freq': '5min'},
+    {'label': '15 minutes', 'seconds': 900, 'trunc': None, 'freq': '15min'},
+    {'label': '1 hour', 'seconds': 3600, 'trunc': 'hour', 'freq': '60min'},
+    {'label': '6 hours', 'seconds': 21600, 'trunc': None, 'freq': '360min'},
+    {'label': '1 day', 'seconds': 86400, 'trunc': 'day', 'freq': 'D'},
+    {'label': '1 week', 'seconds': 604800, 'trunc': 'week', 'freq': 'W-MON'},
+    {'label': '1 month', 'seconds': 2629746, 'trunc': 'month', 'freq': 'MS'},
+    {'label': '1 quarter', 'seconds': 7889238, 'trunc': 'quarter', 'freq': 'QS'},
+    {'label': '1 year', 'seconds': 31556952, 'trunc': 'year', 'freq': 'YS'}
+]
+
+
+def choose_bucket(start, end, max_buckets=CHART_MAX_POINTS * CHART_OVERSAMPLE):
+    """Finest bucket that splits [start, end] into at most max_buckets buckets"""
+    span = (pd.Timestamp(end) - pd.Timestamp(start)).total_seconds()
+    for bucket in BUCKETS:
+        if span / bucket['seconds'] <= max_buckets:
+            return bucket
+    return BUCKETS[-1]
+
+
+def _bucket_sql(bucket, column='created_at', dialect='postgresql'):
+    if bucket['trunc']:
+        return f"date_trunc('{bucket['trunc']}', {column})"
+    seconds = bucket['seconds']
+    if dialect == 'duckdb':
+        # Bucket widths divide a day, so these line up with the epoch buckets
+        return f"time_bucket(INTERVAL '{seconds} seconds', {column})"
+    return (
+        f"TIMESTAMP 'epoch' + floor(extract(epoch FROM {column}) / {seconds}) "
+        f"* {seconds} * INTERVAL '1 second'"
+    )
+
+
+def _build_filters(start=None, end=None, upload_id=None, theme=None):
+    conditions = []
+    params = {}
+
+    if start is not None:
+        conditions.append("created_at >= :start")
+        params['start'] = start
+    if end is not None:
+        conditions.append("created_at < :end")
+        params['end'] = end
+    if upload_id is not None:
+        conditions.append("upload_id = :upload_id")
+        params['upload_id'] = upload_id
+    if theme:
+        conditions.append("assigned_theme_name = :theme")
+        params['theme'] = theme
+
+    where = " WHERE " + " AND ".join(conditions) if conditions else ""
+    return where, params
+
+
+def get_time_bounds(db_manager, upload_id=None, theme=None):
+    """Returns: (first, last) created_at for the filters, or (None, None)"""
+    where, params = _build_filters(upload_id=upload_id, theme=theme)
+    rows = db_manager.execute_query(f"SELECT MIN(created_at), MAX(created_at) FROM tickets{where}", params)
+    return rows[0][0], rows[0][1]
+
+
+def aggregate_ticket_volume(db_manager, bucket, start=None, end=None, upload_id=None,
+                            theme=None, by_theme=False, max_series=CHART_MAX_SERIES):
+    """
+    Ticket counts and average severity per time bucket, computed in SQL
+    With by_theme, the largest max_series themes in range get their own series
+    and the rest are folded into 'Other'.
+    Returns: DataFrame with bucket, series, tickets, avg_severity
+    """
+    where, params = _build_filters(start, end, upload_id, theme)
+    bucket_expr = _bucket_sql(bucket, dialect=db_manager.dialect)
+
+    if by_theme:
+        params['max_series'] = max_series
+        query = f"""
+        WITH filtered AS (
+            SELECT created_at, severity_score, COALESCE(assigned_theme_name, 'Unassigned') AS theme
+            FROM tickets{where}
+        ),
+        top_themes AS (
+            SELECT theme FROM filtered
+            GROUP BY theme
+            ORDER BY COUNT(*) DESC
+            LIMIT :max_series
+        )
+        SELECT {bucket_expr} AS bucket,
+               CASE WHEN f.theme IN (SELECT theme FROM top_themes) THEN f.theme ELSE 'Other' END AS series,
+               COUNT(*) AS tickets,
+               AVG(severity_score) AS avg_severity
+        FROM filtered f
+        GROUP BY 1, 2
+        ORDER BY 2, 1
+        """
+    else:
+        query = f"""
+        SELECT {bucket_expr} AS bucket,
+               'All tickets' AS series,
+               COUNT(*) AS tickets,
+               AVG(severity_score) AS avg_severity
+        FROM tickets{where}
+        GROUP BY 1
+        ORDER BY 1
+        """
+
+    try:
+        rows = db_manager.execute_query(query, params)
+    except Exception as e:
+        logger.error(f"Failed to aggregate ticket volume: {e}")
+        raise
+
+    df = pd.DataFrame(rows, columns=['bucket', 'series', 'tickets', 'avg_severity'])
+    df['bucket'] = pd.to_datetime(df['bucket'])
+    df['tickets'] = df['tickets'].astype('int64')
+    df['avg_severity'] = pd.to_numeric(df['avg_severity'], errors='coerce')
+    return df
+
+
+def fill_empty_buckets(df, bucket):
+    """Insert zero-count rows for buckets with no tickets so lines drop to zero"""
+    filled = []
+    for series, group in df.groupby('series', sort=False):
+        index = pd.date_range(group['bucket'].min(), group['bucket'].max(), freq=bucket['freq'])
+        if len(index) <= len(group):
+            filled.append(group)
+            continue
+        group = group.set_index('bucket').reindex(index.union(pd.DatetimeIndex(group['bucket'])))
+        group['series'] = series
+        group['tickets'] = group['tickets'].fillna(0).astype('int64')
+        filled.append(group.rename_axis('bucket').reset_index())
+    if not filled:
+        return df
+    return pd.concat(filled, ignore_index=True)
+
+
+def lttb(x, y, n_out):
+    """
+    Largest-Triangle-Three-Buckets downsampling
+    x must be increasing (numeric). Returns: sorted array of kept indices,
+    always including the first and last point.
+    """
+    n = len(x)
+    if n_out >= n:
+        return np.arange(n)
+    if n_out < 3:
+        return np.array([0, n - 1])
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+
+    kept = np.empty(n_out, dtype=np.int64)
+    kept[0], kept[-1] = 0, n - 1
+    prev = 0
+
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        # Average of the next bucket (or the last point for the final bucket)
+        next_lo, next_hi = hi, edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[next_lo:next_hi].mean()
+        avg_y = y[next_lo:next_hi].mean()
+
+        area = np.abs(
+            (x[prev] - avg_x) * (y[lo:hi] - y[prev])
+            - (x[prev] - x[lo:hi]) * (avg_y - y[prev])
+        )
+        prev = lo + int(np.argmax(area))
+        kept[i + 1] = prev
+
+    return kept
+
+
+def downsample(df, max_points=CHART_MAX_POINTS, value_column='tickets'):
+    """
+    Reduce every series with LTTB so the whole frame has at most max_points rows
+    The budget is split evenly across series.
+    """
+    n_series = df['series'].nunique()
+    if n_series == 0 or len(df) <= max_points:
+        return df
+
+    per_series = max(max_points // n_series, 3)
+    parts = []
+    for _, group in df.groupby('series', sort=False):
+        group = group.sort_values('bucket')
+        x = group['bucket'].to_numpy(dtype='datetime64[s]').astype(np.int64)
+        idx = lttb(x, group[value_column].to_numpy(), per_series)
+        parts.append(group.iloc[idx])
+    return pd.concat(parts, ignore_index=True)
+
+
+def get_volume_series(db_manager, start=None, end=None, upload_id=None, theme=None,
+                      by_theme=False, max_points=CHART_MAX_POINTS):
+    """
+    Chart-ready ticket volume for a viewport
+    Missing bounds default to the data's own range.
+    Returns: (DataFrame with bucket, series, tickets, avg_severity; bucket label)
+    """
+    if start is None or end is None:
+        first, last = get_time_bounds(db_manager, upload_id, theme)
+        if first is None:
+            return pd.DataFrame(columns=['bucket', 'series', 'tickets', 'avg_severity']), None
+        start = start if start is not None else first
+        end = end if end is not None else last + pd.Timedelta(seconds=1)
+
+    bucket = choose_bucket(start, end, max_points * CHART_OVERSAMPLE)
+    df = aggregate_ticket_volume(
+        db_manager, bucket, start, end, upload_id, theme, by_theme=by_theme
+    )
+    raw_points = len(df)
+    df = downsample(fill_empty_buckets(df, bucket), max_points)
+
+    logger.info(
+        f"Volume chart: {raw_points} buckets of {bucket['label']} -> {len(df)} points "
+        f"(budget {max_points})"
+    )
+    return df, bucket['label']
+
+
+def get_theme_totals(db_manager, start=None, end=None, upload_id=None, limit=CHART_MAX_SERIES * 2):
+    """
+    Ticket count and average severity per theme, largest first
+    Returns: DataFrame with theme, tickets, avg_severity
+    """
+    where, params = _build_filters(start, end, upload_id)
+    params['limit'] = limit
+    query = f"""
+    SELECT COALESCE(assigned_theme_name, 'Unassigned') AS theme,
+           COUNT(*) AS tickets,
+           AVG(severity_score) AS avg_severity
+    FROM tickets{where}
+    GROUP BY 1
+    ORDER BY 2 DESC
+    LIMIT :limit
+    """
+    rows = db_manager.execute_query(query, params)
+    df = pd.DataFrame(rows, columns=['theme', 'tickets', 'avg_severity'])
+    df['avg_severity'] = pd.to_numeric(df['avg_severity'], errors='coerce')
+    return df
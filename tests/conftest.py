@@ -0,0 +1,12 @@
+"""
+Shared test setup: make the application packages (src/) and the scripts
+package importable, as the pages and scripts do with sys.path.append('src')
+"""
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+for path in (ROOT, os.path.join(ROOT, 'src')):
+    if path not in sys.path:
+        sys.path.insert(0, path)
@@ -0,0 +1,112 @@
+"""Tests for streaming EWMA volume anomaly scoring (analysis.anomalies)"""
+import pytest
+
+pytest.importorskip('dotenv')
+pytest.importorskip('sqlalchemy')
+np = pytest.importorskip('numpy')
+pd = pytest.importorskip('pandas')
+
+from analysis.anomalies import STATE_COLUMNS, advance_states  # noqa: E402
+
+PARAMS = {'alpha': 0.1, 'threshold': 4.0, 'warmup': 14, 'min_count': 5, 'min_std': 1.0}
+START = pd.Timestamp('2024-01-01')
+
+
+def daily(values, first_day=0, key='email'):
+    days = pd.date_range(START + pd.Timedelta(days=first_day), periods=len(values), freq='D')
+    return pd.DataFrame({
+        'dimension': 'channel',
+        'series_key': key,
+        'bucket_date': days.date,
+        'ticket_count': values
+    })
+
+
+def no_state():
+    return pd.DataFrame(columns=STATE_COLUMNS)
+
+
+def day(n):
+    return (START + pd.Timedelta(days=n)).date()
+
+
+def test_spike_after_warmup_is_flagged():
+    values = [10] * 30
+    values[25] = 60
+    result = advance_states(no_state(), daily(values), **PARAMS)
+
+    anomalies = result['anomalies']
+    assert len(anomalies) == 1
+    spike = anomalies.iloc[0]
+    assert spike['bucket_date'] == day(25)
+    assert spike['direction'] == 'spike'
+    assert spike['observed'] == 60
+    assert spike['expected'] == pytest.approx(10.0)
+    assert spike['z_score'] == pytest.approx(50.0)
+
+
+def test_spike_during_warmup_is_not_flagged():
+    values = [10] * 30
+    values[5] = 60
+    assert advance_states(no_state(), daily(values), **PARAMS)['anomalies'].empty
+
+
+def test_last_day_stays_open():
+    result = advance_states(no_state(), daily([10] * 30), **PARAMS)
+    state = result['states'].iloc[0]
+    assert state['open_bucket'] == day(29)
+    assert state['open_count'] == 10
+    assert state['n_buckets'] == 29
+    assert state['ewma_mean'] == pytest.approx(10.0)
+    assert state['ewma_var'] == pytest.approx(0.0)
+
+
+def test_state_carries_over_between_uploads():
+    rng = np.random.default_rng(3)
+    values = rng.poisson(10, size=30)
+    values[19] = max(values[19], 5)
+
+    whole = advance_states(no_state(), daily(values), **PARAMS)['states'].iloc[0]
+
+    # The open day (19) gets tickets from both uploads
+    first = daily(values[:20])
+    first.loc[19, 'ticket_count'] -= 3
+    states = advance_states(no_state(), first, **PARAMS)['states']
+    second = daily([3] + list(values[20:]), first_day=19)
+    split = advance_states(states, second, **PARAMS)['states'].iloc[0]
+
+    assert split['open_bucket'] == whole['open_bucket']
+    assert split['open_count'] == whole['open_count']
+    assert split['n_buckets'] == whole['n_buckets']
+    assert split['ewma_mean'] == pytest.approx(whole['ewma_mean'])
+    assert split['ewma_var'] == pytest.approx(whole['ewma_var'])
+
+
+def test_open_day_drop_is_cleared_when_more_tickets_arrive():
+    values = [20] * 20
+    values[19] = 2
+    first = advance_states(no_state(), daily(values), **PARAMS)
+    drop = first['anomalies'].iloc[0]
+    assert (drop['bucket_date'], drop['direction']) == (day(19), 'drop')
+
+    second = advance_states(first['states'], daily([18], first_day=19), **PARAMS)
+    assert second['anomalies'].empty
+    assert second['cleared'][['series_key', 'bucket_date']].values.tolist() == [['email', day(19)]]
+
+
+def test_tickets_for_closed_days_are_counted_as_late():
+    states = advance_states(no_state(), daily([10] * 20), **PARAMS)['states']
+    result = advance_states(states, daily([7], first_day=9), **PARAMS)
+    assert result['late_tickets'] == 7
+    assert result['states'].empty
+
+
+def test_series_are_scored_independently():
+    quiet = [10] * 30
+    busy = [10] * 30
+    busy[25] = 80
+    counts = pd.concat([daily(quiet, key='chat'), daily(busy, key='email')], ignore_index=True)
+    result = advance_states(no_state(), counts, **PARAMS)
+
+    assert result['anomalies']['series_key'].tolist() == ['email']
+    assert sorted(result['states']['series_key']) == ['chat', 'email']
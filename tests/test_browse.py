@@ -0,0 +1,64 @@
+"""Tests for keyset pagination cursors (analysis.browse)"""
+from datetime import datetime
+
+import pytest
+
+pytest.importorskip('dotenv')
+pytest.importorskip('sqlalchemy')
+
+from analysis.browse import build_browse_query, decode_cursor, encode_cursor  # noqa: E402
+from utils.config import HIGH_SEVERITY_THRESHOLD  # noqa: E402
+
+ROW = {
+    'ticket_id': 'TKT-0000000042',
+    'priority_rank': 17,
+    'severity_score': 5,
+    'created_at': datetime(2024, 3, 9, 14, 30, 5),
+    'product': 'Mobile app'
+}
+
+
+@pytest.mark.parametrize('sort, key', [
+    ('priority', [17, 'TKT-0000000042']),
+    ('severity', [5, datetime(2024, 3, 9, 14, 30, 5), 'TKT-0000000042']),
+    ('newest', [datetime(2024, 3, 9, 14, 30, 5), 'TKT-0000000042'])
+])
+def test_cursor_round_trips_the_sort_key(sort, key):
+    assert decode_cursor(sort, encode_cursor(sort, ROW)) == key
+
+
+def test_cursor_is_url_safe():
+    cursor = encode_cursor('severity', dict(ROW, ticket_id='a/b+c?' * 10))
+    assert not set(cursor) & set('+/?&')
+
+
+def test_cursor_of_another_sort_is_rejected():
+    with pytest.raises(ValueError, match="sort 'priority'"):
+        decode_cursor('newest', encode_cursor('priority', ROW))
+
+
+def test_malformed_cursor_is_rejected():
+    with pytest.raises(ValueError, match="Invalid page cursor"):
+        decode_cursor('priority', 'not a cursor')
+
+
+def test_ascending_sort_continues_after_the_cursor():
+    query, params = build_browse_query('priority', encode_cursor('priority', ROW), page_size=50)
+    assert "(priority_rank, ticket_id) > (:k0, :k1)" in query
+    assert (params['k0'], params['k1']) == (17, 'TKT-0000000042')
+    assert params['limit'] == 51
+
+
+def test_descending_sort_continues_before_the_cursor():
+    query, params = build_browse_query('newest', encode_cursor('newest', ROW), high_severity_only=True)
+    assert "(created_at, ticket_id) < (:k0, :k1)" in query
+    assert params['k0'] == datetime(2024, 3, 9, 14, 30, 5)
+    # A literal, so the planner can match the partial index
+    assert f"severity_score >= {int(HIGH_SEVERITY_THRESHOLD)}" in query
+    assert "ORDER BY created_at DESC, ticket_id DESC" in query
+
+
+def test_first_page_has_no_keyset_condition():
+    query, params = build_browse_query('severity')
+    assert "severity_score IS NOT NULL" in query
+    assert not any(name.startswith('k') for name in params)
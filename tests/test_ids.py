@@ -0,0 +1,78 @@
+"""Tests for generated ticket ID ranges (etl.ids)"""
+import pytest
+
+pytest.importorskip('dotenv')
+np = pytest.importorskip('numpy')
+pd = pytest.importorskip('pandas')
+
+from etl.ids import (  # noqa: E402
+    ID_DIGITS,
+    format_ticket_ids,
+    merge_ranges,
+    range_size,
+    reserve_ticket_ids,
+    split_ranges,
+    take_ids
+)
+
+
+class SequenceStub:
+    """Answers the block reservation query like ticket_id_seq would"""
+
+    def __init__(self, starts):
+        self.starts = starts
+
+    def execute_query(self, query, params):
+        assert params['blocks'] == len(self.starts)
+        return [(start,) for start in self.starts]
+
+
+def test_reserve_merges_adjacent_blocks():
+    # A concurrent upload took the block at 2001
+    db = SequenceStub([1, 3001, 1001])
+    ranges = reserve_ticket_ids(db, 2500, block_size=1000)
+    assert ranges == [(1, 2001), (3001, 4001)]
+    assert range_size(ranges) == 3000
+
+
+def test_reserve_nothing_for_no_rows():
+    assert reserve_ticket_ids(SequenceStub([]), 0) == []
+
+
+def test_merge_ranges_sorts_and_coalesces():
+    assert merge_ranges([(20, 30), (0, 10), (10, 20), (40, 50)]) == [(0, 30), (40, 50)]
+
+
+def test_split_ranges_hands_out_disjoint_parts_in_order():
+    ranges = [(1, 11), (21, 26)]
+    parts = split_ranges(ranges, [4, 8, 3])
+    assert parts == [[(1, 5)], [(5, 11), (21, 23)], [(23, 26)]]
+
+    numbers = [n for part in parts for start, stop in part for n in range(start, stop)]
+    assert numbers == list(range(1, 11)) + list(range(21, 26))
+
+
+def test_split_ranges_leaves_the_rest_unused():
+    assert split_ranges([(1, 101)], [10, 0, 5]) == [[(1, 11)], [], [(11, 16)]]
+
+
+def test_split_ranges_rejects_more_than_reserved():
+    with pytest.raises(ValueError):
+        split_ranges([(1, 11)], [6, 6])
+
+
+def test_take_ids_spans_ranges():
+    ids = take_ids([(1, 4), (10, 20)], 5)
+    assert ids.dtype == np.int64
+    assert ids.tolist() == [1, 2, 3, 10, 11]
+
+
+def test_format_ticket_ids_zero_pads_to_sort_in_order():
+    ids = format_ticket_ids(np.array([7, 1234567, 42]), prefix='TKT-G')
+    assert ids.tolist() == [
+        'TKT-G' + '7'.zfill(ID_DIGITS),
+        'TKT-G' + '1234567'.zfill(ID_DIGITS),
+        'TKT-G' + '42'.zfill(ID_DIGITS)
+    ]
+    assert sorted(ids) == [ids[0], ids[2], ids[1]]
+    assert all(len(ticket_id) == len('TKT-G') + ID_DIGITS for ticket_id in ids)
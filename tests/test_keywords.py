@@ -0,0 +1,97 @@
+"""Tests for c-TF-IDF theme keywords (analysis.keywords)"""
+import pytest
+
+pytest.importorskip('dotenv')
+pytest.importorskip('sqlalchemy')
+pytest.importorskip('scipy')
+pytest.importorskip('sklearn')
+np = pytest.importorskip('numpy')
+
+from scipy import sparse  # noqa: E402
+
+from analysis.keywords import (  # noqa: E402
+    _build_min_df,
+    build_term_matrix,
+    class_tfidf,
+    extract_keywords
+)
+from utils.config import KEYWORD_MIN_DF, KEYWORD_PRUNE_MIN_DOCS  # noqa: E402
+
+TICKETS = [
+    "refund not received for my card payment",
+    "card payment failed, please refund",
+    "refund the double card payment",
+    "cannot login, password reset email missing",
+    "password reset link expired, cannot login",
+    "login fails after password reset",
+]
+THEMES = np.array([0, 0, 0, 1, 1, 1])
+
+
+def test_class_tfidf_weights_terms_by_class():
+    # Term 0 only occurs in class 0; term 1 in both
+    counts = sparse.csr_matrix(np.array([[2, 1], [0, 1]]))
+    scores = class_tfidf(counts, np.array([0, 1]), 2).toarray()
+
+    # tf = count / class size, idf = log(1 + average class size / term total)
+    idf = np.log1p(2.0 / 2.0)
+    np.testing.assert_allclose(scores, [[2 / 3 * idf, 1 / 3 * idf], [0.0, idf]], rtol=1e-5)
+
+
+def test_class_tfidf_sums_documents_of_a_class():
+    counts = sparse.csr_matrix(np.array([[1, 0], [1, 0], [0, 3]]))
+    scores = class_tfidf(counts, np.array([0, 0, 1]), 2).toarray()
+    assert scores[0, 1] == 0.0 and scores[1, 0] == 0.0
+    assert scores[0, 0] > 0.0 and scores[1, 1] > 0.0
+
+
+def test_term_matrix_describes_its_terms():
+    matrix = build_term_matrix(TICKETS, max_ngram=2)
+    terms = list(matrix['terms'])
+
+    assert matrix['counts'].shape == (len(TICKETS), len(terms))
+    assert matrix['doc_freq'][terms.index('refund')] == 3
+    assert matrix['ngram_len'][terms.index('password reset')] == 2
+    # Stop words and numbers are not terms
+    assert 'the' not in terms and 'not' not in terms
+
+
+def test_extract_keywords_finds_each_theme_terms():
+    matrix = build_term_matrix(TICKETS, max_ngram=1)
+    keywords = extract_keywords(matrix, THEMES, 2, top_n=3, min_df=2, max_df=0.6, max_ngram=1)
+
+    assert set(keywords[0]) == {'refund', 'card', 'payment'}
+    assert set(keywords[1]) == {'login', 'password', 'reset'}
+
+
+def test_extract_keywords_applies_limits_to_the_cached_matrix():
+    matrix = build_term_matrix(TICKETS, max_ngram=2)
+
+    unigrams = extract_keywords(matrix, THEMES, 2, top_n=20, min_df=1, max_df=1.0, max_ngram=1)
+    assert all(' ' not in term for terms in unigrams for term in terms)
+
+    frequent = extract_keywords(matrix, THEMES, 2, top_n=20, min_df=3, max_df=1.0, max_ngram=2)
+    assert 'expired' not in frequent[1]
+    assert 'password reset' in frequent[1]
+
+
+def test_extract_keywords_ignores_unthemed_tickets():
+    matrix = build_term_matrix(TICKETS, max_ngram=1)
+    labels = np.array([0, 0, 0, -1, -1, -1])
+    keywords = extract_keywords(matrix, labels, 1, top_n=10, min_df=1, max_df=1.0, max_ngram=1)
+    assert 'password' not in keywords[0]
+    assert 'refund' in keywords[0]
+
+
+def test_empty_vocabulary_gives_empty_keywords():
+    matrix = build_term_matrix(["the and of", "12 34", ""], max_ngram=2)
+    assert matrix['counts'].shape == (3, 0)
+
+    keywords = extract_keywords(matrix, np.array([0, 1, 1]), 2, min_df=1)
+    assert keywords == [[], []]
+
+
+def test_large_corpora_are_pruned_only_down_to_the_requested_min_df():
+    assert _build_min_df(KEYWORD_PRUNE_MIN_DOCS - 1, 5) == 1
+    assert _build_min_df(KEYWORD_PRUNE_MIN_DOCS, 5) == KEYWORD_MIN_DF
+    assert _build_min_df(KEYWORD_PRUNE_MIN_DOCS, 1) == 1
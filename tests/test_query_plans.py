@@ -0,0 +1,86 @@
+"""
+EXPLAIN checks for the ticket browser views (see scripts/check_query_plans.py)
+
+Runs against the PostgreSQL database in TEST_DATABASE_URL, creating the
+schema if needed, and is skipped without one. Sequential scans, bitmap scans
+and sorts are disabled for the session, so every view has to be answered by
+walking its triage index in order; a missing or unusable index fails even
+on an empty table.
+"""
+import os
+from datetime import datetime
+
+import pytest
+
+TEST_DATABASE_URL = os.getenv('TEST_DATABASE_URL', '')
+
+if not TEST_DATABASE_URL.startswith('postgresql'):
+    pytest.skip("set TEST_DATABASE_URL to a PostgreSQL database", allow_module_level=True)
+
+pytest.importorskip('sqlalchemy')
+
+from sqlalchemy import text  # noqa: E402
+
+from analysis.browse import build_browse_query, encode_cursor  # noqa: E402
+from database.schema import HIGH_SEVERITY_INDEX  # noqa: E402
+from scripts.check_query_plans import VIEWS, explain, check_plan, check_high_severity_index  # noqa: E402
+
+EXPECTED_INDEXES = {
+    'priority': 'idx_triage_priority',
+    'priority by theme': 'idx_triage_theme_priority',
+    'priority by upload': 'idx_triage_upload_priority',
+    'severity': 'idx_triage_severity',
+    'severity by theme': 'idx_triage_theme_severity',
+    'high-severity queue': HIGH_SEVERITY_INDEX,
+    'newest': 'idx_triage_newest'
+}
+
+# Filter values and a cursor row; the table may be empty
+SAMPLE_FILTERS = {'theme': 'Billing', 'upload_id': 1}
+SAMPLE_ROW = {
+    'priority_rank': 500,
+    'severity_score': 4,
+    'created_at': datetime(2024, 1, 15, 12, 0),
+    'ticket_id': 'TKT-000500'
+}
+
+PLANNER_SETTINGS = ['enable_seqscan', 'enable_bitmapscan', 'enable_sort', 'enable_incremental_sort']
+
+
+@pytest.fixture(scope='module')
+def conn():
+    from database.connection import DatabaseManager
+    from database.schema import create_schema
+
+    db = DatabaseManager(database_url=TEST_DATABASE_URL)
+    create_schema(db)
+    try:
+        with db.get_connection() as connection:
+            for setting in PLANNER_SETTINGS:
+                connection.execute(text(f"SET {setting} = off"))
+            yield connection
+            connection.rollback()
+    finally:
+        db.close()
+
+
+def test_every_view_is_covered():
+    assert set(EXPECTED_INDEXES) == set(VIEWS)
+
+
+def test_high_severity_index_matches_threshold(conn):
+    assert check_high_severity_index(conn) is None
+
+
+@pytest.mark.parametrize('deep', [False, True], ids=['first page', 'deep page'])
+@pytest.mark.parametrize('view', list(EXPECTED_INDEXES))
+def test_view_walks_its_index(conn, view, deep):
+    sort, filters = VIEWS[view]
+    filters = {name: SAMPLE_FILTERS.get(name, value) for name, value in filters.items()}
+    cursor = encode_cursor(sort, SAMPLE_ROW) if deep else None
+    query, params = build_browse_query(sort, cursor, **filters)
+
+    problems, indexes = check_plan(explain(conn, query, params, analyze=False))
+
+    assert problems == []
+    assert EXPECTED_INDEXES[view] in indexes
@@ -0,0 +1,71 @@
+"""Tests for LTTB downsampling of chart series (visualization.timeseries)"""
+import pytest
+
+pytest.importorskip('dotenv')
+np = pytest.importorskip('numpy')
+pd = pytest.importorskip('pandas')
+
+from visualization.timeseries import downsample, lttb  # noqa: E402
+
+
+def test_short_series_are_kept_whole():
+    assert lttb(np.arange(5), np.ones(5), 10).tolist() == [0, 1, 2, 3, 4]
+
+
+def test_tiny_budgets_keep_the_end_points():
+    assert lttb(np.arange(100), np.ones(100), 2).tolist() == [0, 99]
+
+
+def test_lttb_keeps_n_out_sorted_points_including_the_ends():
+    rng = np.random.default_rng(0)
+    y = rng.normal(size=1000).cumsum()
+    kept = lttb(np.arange(1000), y, 60)
+
+    assert len(kept) == 60
+    assert kept[0] == 0 and kept[-1] == 999
+    assert (np.diff(kept) > 0).all()
+
+
+def test_lttb_keeps_spikes_and_dips():
+    y = np.full(1000, 10.0)
+    y[537] = 500.0
+    y[212] = -300.0
+    kept = lttb(np.arange(1000), y, 50)
+    assert 537 in kept
+    assert 212 in kept
+
+
+def test_lttb_takes_one_point_per_bucket():
+    n, n_out = 1000, 40
+    kept = lttb(np.arange(n), np.sin(np.arange(n) / 15.0), n_out)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    for i, index in enumerate(kept[1:-1]):
+        assert edges[i] <= index < edges[i + 1]
+
+
+def test_downsample_splits_the_budget_across_series():
+    buckets = pd.date_range('2024-01-01', periods=1000, freq='h')
+    tickets = np.full(1000, 5)
+    tickets[400] = 90
+    df = pd.concat([
+        pd.DataFrame({'bucket': buckets, 'series': 'Billing', 'tickets': tickets}),
+        pd.DataFrame({'bucket': buckets, 'series': 'Login', 'tickets': np.arange(1000) % 7})
+    ], ignore_index=True)
+
+    reduced = downsample(df, max_points=100)
+
+    assert len(reduced) <= 100
+    assert reduced.groupby('series').size().to_dict() == {'Billing': 50, 'Login': 50}
+    billing = reduced[reduced['series'] == 'Billing']
+    assert billing['bucket'].iloc[0] == buckets[0]
+    assert billing['bucket'].iloc[-1] == buckets[-1]
+    assert billing['tickets'].max() == 90
+
+
+def test_downsample_leaves_small_frames_alone():
+    df = pd.DataFrame({
+        'bucket': pd.date_range('2024-01-01', periods=10, freq='D'),
+        'series': 'All',
+        'tickets': range(10)
+    })
+    assert downsample(df, max_points=100) is df
@@ -0,0 +1,74 @@
+"""Tests for the sampling statistics behind validate_sample"""
+import pytest
+
+pytest.importorskip('dotenv')
+np = pytest.importorskip('numpy')
+pd = pytest.importorskip('pandas')
+
+from utils.validators import reservoir_sample, _proportion_interval  # noqa: E402
+
+
+def chunks(n_rows, chunk_size):
+    for start in range(0, n_rows, chunk_size):
+        yield pd.DataFrame({'row': np.arange(start, min(start + chunk_size, n_rows))})
+
+
+def test_reservoir_keeps_a_short_stream_whole():
+    sample = reservoir_sample(chunks(7, 3), k=10)
+    assert sorted(sample['row']) == list(range(7))
+
+
+def test_reservoir_returns_k_distinct_rows_from_the_stream():
+    sample = reservoir_sample(chunks(10000, 999), k=50, seed=1)
+    assert len(sample) == 50
+    assert sample['row'].is_unique
+    assert sample['row'].between(0, 9999).all()
+
+
+def test_reservoir_is_reproducible_for_a_seed():
+    first = reservoir_sample(chunks(1000, 128), k=25, seed=7)
+    second = reservoir_sample(chunks(1000, 128), k=25, seed=7)
+    assert first['row'].tolist() == second['row'].tolist()
+
+
+def test_reservoir_sample_is_uniform_over_the_stream():
+    # Every row should be kept with probability k / n: early rows (which fill
+    # the reservoir) must not be favoured over late ones
+    n_rows, k, runs = 200, 20, 200
+    kept = np.zeros(n_rows)
+    for seed in range(runs):
+        rows = reservoir_sample(chunks(n_rows, 37), k=k, seed=seed)['row'].astype(int)
+        kept[rows.to_numpy()] += 1
+    rate = kept / runs
+    assert rate[:n_rows // 2].mean() == pytest.approx(k / n_rows, abs=0.01)
+    assert rate[n_rows // 2:].mean() == pytest.approx(k / n_rows, abs=0.01)
+
+
+def test_reservoir_of_an_empty_stream_is_empty():
+    assert reservoir_sample(iter(()), k=5).empty
+
+
+def test_wilson_interval_matches_reference_values():
+    low, high = _proportion_interval(5, 100)
+    assert low == pytest.approx(0.02154, abs=1e-5)
+    assert high == pytest.approx(0.11175, abs=1e-5)
+
+
+def test_wilson_interval_stays_within_bounds_at_the_extremes():
+    low, high = _proportion_interval(0, 50)
+    assert low == pytest.approx(0.0, abs=1e-12)
+    assert 0.0 < high < 0.1
+
+    low, high = _proportion_interval(50, 50)
+    assert 0.9 < low < 1.0
+    assert high == pytest.approx(1.0, abs=1e-12)
+
+
+def test_wilson_interval_narrows_with_more_rows():
+    small = _proportion_interval(10, 100)
+    large = _proportion_interval(1000, 10000)
+    assert small[0] < large[0] < 0.1 < large[1] < small[1]
+
+
+def test_wilson_interval_without_rows_is_uninformative():
+    assert _proportion_interval(0, 0) == (0.0, 1.0)